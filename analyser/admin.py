@@ -1,22 +1,58 @@
 # analyser/admin.py
 
 from django.contrib import admin
-from .models import ModeloAnalise, ResultadoAnalise, LogAnalise
+from .cache_respostas import invalidar_respostas
+from .fila import cancelar_analise
+from .models import ModeloAnalise, ResultadoAnalise, LogAnalise, ExtracaoTexto, RespostaLLM, ArquivoGemini
 
 @admin.register(ModeloAnalise)
 class ModeloAnaliseAdmin(admin.ModelAdmin):
     list_display = ['nome', 'cliente', 'produto', 'ativo', 'data_criacao']
     list_filter = ['ativo', 'cliente', 'produto']
     search_fields = ['nome', 'descricao']
+    actions = ['limpar_cache_respostas']
+
+    @admin.action(description="Limpar respostas da IA em cache")
+    def limpar_cache_respostas(self, request, queryset):
+        total = sum(invalidar_respostas(modelo) for modelo in queryset)
+        self.message_user(request, f"{total} resposta(s) removida(s) do cache.")
 
 @admin.register(ResultadoAnalise)
 class ResultadoAnaliseAdmin(admin.ModelAdmin):
-    list_display = ['id', 'caso', 'status', 'aplicado_ao_caso', 'data_criacao']
+    list_display = ['id', 'caso', 'status', 'criado_por', 'aplicado_ao_caso', 'data_criacao', 'iniciado_em']
     list_filter = ['status', 'aplicado_ao_caso', 'data_criacao']
-    readonly_fields = ['criado_por', 'data_criacao', 'tempo_processamento']
+    readonly_fields = ['criado_por', 'data_criacao', 'iniciado_em', 'tempo_processamento', 'task_id']
+    actions = ['cancelar']
+
+    @admin.action(description="Cancelar análises na fila ou em execução")
+    def cancelar(self, request, queryset):
+        total = sum(cancelar_analise(resultado) for resultado in queryset.filter(status__in=ResultadoAnalise.STATUS_ATIVOS))
+        self.message_user(request, f"{total} análise(s) cancelada(s).")
 
 @admin.register(LogAnalise)
 class LogAnaliseAdmin(admin.ModelAdmin):
     list_display = ['timestamp', 'resultado', 'nivel', 'mensagem']
     list_filter = ['nivel', 'timestamp']
-    readonly_fields = ['timestamp']
\ No newline at end of file
+    readonly_fields = ['timestamp']
+
+@admin.register(ExtracaoTexto)
+class ExtracaoTextoAdmin(admin.ModelAdmin):
+    list_display = ['sha256', 'formato', 'versao_conversor', 'tamanho', 'acessos', 'ultimo_uso_em']
+    list_filter = ['formato', 'versao_conversor']
+    search_fields = ['sha256']
+    readonly_fields = ['sha256', 'formato', 'versao_conversor', 'tamanho', 'acessos', 'criado_em', 'ultimo_uso_em']
+    exclude = ['paginas']
+
+@admin.register(RespostaLLM)
+class RespostaLLMAdmin(admin.ModelAdmin):
+    list_display = ['chave', 'modelo_analise', 'modelo_llm', 'acessos', 'criado_em', 'expira_em']
+    list_filter = ['modelo_llm', 'modelo_analise']
+    search_fields = ['chave']
+    readonly_fields = ['chave', 'modelo_analise', 'modelo_llm', 'resposta', 'acessos', 'criado_em', 'expira_em']
+
+@admin.register(ArquivoGemini)
+class ArquivoGeminiAdmin(admin.ModelAdmin):
+    list_display = ['nome', 'mime_type', 'tamanho', 'usos', 'criado_em', 'expira_em']
+    list_filter = ['mime_type']
+    search_fields = ['sha256', 'nome']
+    readonly_fields = ['sha256', 'mime_type', 'nome', 'uri', 'tamanho', 'usos', 'criado_em', 'expira_em']
@@ -0,0 +1,92 @@
+# analyser/arquivos_gemini.py
+import io
+import time
+import hashlib
+import logging
+from datetime import timedelta
+from typing import Tuple
+
+import google.generativeai as genai
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from .models import ArquivoGemini
+
+logger = logging.getLogger(__name__)
+
+# O File API guarda os arquivos por 48h; o handle é descartado um pouco antes
+MARGEM_EXPIRACAO = timedelta(hours=1)
+VALIDADE_PADRAO = timedelta(hours=48)
+# Tempo máximo esperando o Gemini terminar de processar um arquivo enviado
+ESPERA_PROCESSAMENTO_MAX = 120
+
+
+def usar_file_api(arquivo: dict) -> bool:
+    """Documentos pequenos vão inline: o envio separado não compensa."""
+    return settings.GEMINI_FILE_API and len(arquivo['data']) >= settings.GEMINI_FILE_API_MIN_KB * 1024
+
+
+def referencia_arquivo(arquivo: dict, nome_exibicao: str = '') -> Tuple[genai.protos.FileData, bool]:
+    """
+    Referência ao documento no File API do Gemini, para usar no lugar do
+    conteúdo inline. O conteúdo só é enviado se ainda não houver um handle
+    válido para ele (mesmo SHA-256 e MIME type).
+
+    :param arquivo: Dict com 'mime_type' e 'data', como enviado ao Gemini.
+    :return: Tuple (referência, enviado_agora)
+    """
+    sha256 = hashlib.sha256(arquivo['data']).hexdigest()
+    handles = ArquivoGemini.objects.filter(
+        sha256=sha256, mime_type=arquivo['mime_type'], expira_em__gt=timezone.now()
+    )
+    uri = handles.values_list('uri', flat=True).first()
+    if uri:
+        handles.update(usos=F('usos') + 1)
+        return genai.protos.FileData(mime_type=arquivo['mime_type'], file_uri=uri), False
+
+    inicio = time.monotonic()
+    enviado = genai.upload_file(
+        io.BytesIO(arquivo['data']),
+        mime_type=arquivo['mime_type'],
+        display_name=(nome_exibicao or sha256)[:128],
+    )
+    enviado = _aguardar_processamento(enviado)
+    expiracao = enviado.expiration_time or (timezone.now() + VALIDADE_PADRAO)
+
+    agora = timezone.now()
+    ArquivoGemini.objects.filter(expira_em__lte=agora).delete()
+    ArquivoGemini.objects.update_or_create(
+        sha256=sha256,
+        mime_type=arquivo['mime_type'],
+        defaults={
+            'nome': enviado.name,
+            'uri': enviado.uri,
+            'tamanho': len(arquivo['data']),
+            'usos': 1,
+            'expira_em': expiracao - MARGEM_EXPIRACAO,
+        },
+    )
+    logger.info(f"📎 '{nome_exibicao or sha256[:12]}' enviado ao File API do Gemini como {enviado.name} "
+                f"({len(arquivo['data']) // 1024} KB em {time.monotonic() - inicio:.1f}s)")
+    return genai.protos.FileData(mime_type=arquivo['mime_type'], file_uri=enviado.uri), True
+
+
+def _aguardar_processamento(enviado):
+    """Espera o arquivo sair do estado PROCESSING (o Gemini recusa arquivos ainda em processamento)."""
+    limite = time.monotonic() + ESPERA_PROCESSAMENTO_MAX
+    while enviado.state.name == 'PROCESSING':
+        if time.monotonic() > limite:
+            raise TimeoutError(f"Arquivo {enviado.name} ainda em processamento no Gemini após {ESPERA_PROCESSAMENTO_MAX}s")
+        time.sleep(2)
+        enviado = genai.get_file(enviado.name)
+    if enviado.state.name == 'FAILED':
+        raise ValueError(f"O Gemini não conseguiu processar o arquivo {enviado.name}")
+    return enviado
+
+
+def descartar_referencia(arquivo: dict):
+    """Esquece o handle do documento (ex: o Gemini respondeu que o arquivo não existe mais)."""
+    ArquivoGemini.objects.filter(
+        sha256=hashlib.sha256(arquivo['data']).hexdigest(), mime_type=arquivo['mime_type']
+    ).delete()
@@ -0,0 +1,82 @@
+# analyser/cache_extracao.py
+import time
+import hashlib
+import logging
+import threading
+from typing import List, Tuple
+
+from django.conf import settings
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .document_converter import DocumentConverter
+from .models import ExtracaoTexto
+
+logger = logging.getLogger(__name__)
+
+# Intervalo mínimo entre duas verificações do tamanho total do cache
+INTERVALO_LIMPEZA = 5 * 60
+
+_lock_limpeza = threading.Lock()
+_ultima_limpeza = 0.0
+
+
+def extrair_paginas(conteudo: bytes, mime_type: str, nome_arquivo: str) -> Tuple[List[str], str, bool]:
+    """
+    Texto do documento por página, do cache de extrações quando este mesmo
+    conteúdo (SHA-256) já foi convertido pela versão atual do conversor.
+
+    :return: Tuple (páginas, formato, veio_do_cache)
+    """
+    formato = DocumentConverter.get_format_type(mime_type)
+    if not formato:
+        raise ValueError(f"❌ Formato não suportado: {mime_type}")
+    sha256 = hashlib.sha256(conteudo).hexdigest()
+    chave = {'sha256': sha256, 'formato': formato, 'versao_conversor': DocumentConverter.VERSAO}
+
+    paginas = ExtracaoTexto.objects.filter(**chave).values_list('paginas', flat=True).first()
+    if paginas is not None:
+        ExtracaoTexto.objects.filter(**chave).update(ultimo_uso_em=timezone.now(), acessos=F('acessos') + 1)
+        logger.debug(f"⚡ Texto de '{nome_arquivo}' servido do cache de extrações ({sha256[:12]})")
+        return paginas, formato, True
+
+    paginas, formato = DocumentConverter.convert_to_pages(conteudo, mime_type, nome_arquivo)
+    # ignore_conflicts: outra análise pode ter convertido o mesmo arquivo ao mesmo tempo
+    ExtracaoTexto.objects.bulk_create(
+        [ExtracaoTexto(**chave, paginas=paginas, tamanho=sum(len(pagina.encode('utf-8')) for pagina in paginas))],
+        ignore_conflicts=True,
+    )
+    aplicar_limite()
+    return paginas, formato, False
+
+
+def aplicar_limite(forcar: bool = False) -> int:
+    """
+    Remove as extrações usadas há mais tempo enquanto o total passar de
+    ANALISE_EXTRACAO_CACHE_MB.
+
+    :return: Quantidade de extrações removidas.
+    """
+    global _ultima_limpeza
+    if not forcar and time.monotonic() - _ultima_limpeza < INTERVALO_LIMPEZA:
+        return 0
+    if not _lock_limpeza.acquire(blocking=False):
+        return 0  # Outra thread já está limpando
+    try:
+        _ultima_limpeza = time.monotonic()
+        limite = settings.ANALISE_EXTRACAO_CACHE_MB * 1024 * 1024
+        total = ExtracaoTexto.objects.aggregate(total=Sum('tamanho'))['total'] or 0
+        if total <= limite:
+            return 0
+
+        remover = []
+        for extracao_id, tamanho in ExtracaoTexto.objects.order_by('ultimo_uso_em').values_list('id', 'tamanho').iterator():
+            if total <= limite * 0.9:  # Folga para não limpar a cada extração nova
+                break
+            remover.append(extracao_id)
+            total -= tamanho
+        removidas, _ = ExtracaoTexto.objects.filter(id__in=remover).delete()
+        logger.info(f"🧹 {removidas} extração(ões) removida(s) do cache de textos")
+        return removidas
+    finally:
+        _lock_limpeza.release()
@@ -0,0 +1,67 @@
+# analyser/cache_respostas.py
+import json
+import hashlib
+import logging
+from datetime import timedelta
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from .models import RespostaLLM
+
+logger = logging.getLogger(__name__)
+
+
+def chave_resposta(modelo_llm: str, config_geracao: Dict, prompt: str, arquivos: List[dict],
+                   modelo_analise_id: Optional[int] = None) -> str:
+    """Hash da requisição ao Gemini: modelo, configuração de geração, prompt e SHA-256 de cada documento."""
+    documentos = [
+        {'mime_type': arquivo.get('mime_type'), 'sha256': hashlib.sha256(arquivo['data']).hexdigest()}
+        for arquivo in arquivos
+    ]
+    requisicao = {
+        'modelo_llm': modelo_llm,
+        'config': config_geracao,
+        'prompt': prompt,
+        'documentos': documentos,
+        'modelo_analise': modelo_analise_id,
+    }
+    return hashlib.sha256(json.dumps(requisicao, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def obter_resposta(chave: str) -> Optional[str]:
+    """Resposta em cache ainda válida para a chave, ou None."""
+    if not settings.GEMINI_CACHE_TTL_HORAS:
+        return None
+    respostas = RespostaLLM.objects.filter(chave=chave, expira_em__gt=timezone.now())
+    resposta = respostas.values_list('resposta', flat=True).first()
+    if resposta is not None:
+        respostas.update(acessos=F('acessos') + 1)
+    return resposta
+
+
+def guardar_resposta(chave: str, resposta: str, modelo_llm: str, modelo_analise=None):
+    """Guarda a resposta por GEMINI_CACHE_TTL_HORAS (e remove as que já expiraram)."""
+    if not settings.GEMINI_CACHE_TTL_HORAS:
+        return
+    agora = timezone.now()
+    RespostaLLM.objects.filter(expira_em__lte=agora).delete()
+    RespostaLLM.objects.update_or_create(
+        chave=chave,
+        defaults={
+            'resposta': resposta,
+            'modelo_llm': modelo_llm,
+            'modelo_analise': modelo_analise,
+            'expira_em': agora + timedelta(hours=settings.GEMINI_CACHE_TTL_HORAS),
+        },
+    )
+
+
+def invalidar_respostas(modelo_analise) -> int:
+    """Apaga as respostas em cache de um modelo de análise (ex: após ajustar as instruções)."""
+    removidas, _ = RespostaLLM.objects.filter(modelo_analise=modelo_analise).delete()
+    if removidas:
+        logger.info(f"🧹 {removidas} resposta(s) da IA removida(s) do cache do modelo '{modelo_analise.nome}'")
+    return removidas
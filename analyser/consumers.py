@@ -17,10 +17,18 @@ class AnalysisConsumer(WebsocketConsumer):
             self.room_group_name,
             self.channel_name
         )
-        
+
         # Aceita a conexão WebSocket. Se você não chamar isso, a conexão é rejeitada.
         self.accept()
 
+        # Estado atual (status e posição na fila), para a página não depender da próxima mensagem
+        # (imports aqui: este módulo é carregado pelo asgi.py antes do setup do Django)
+        from .fila import estado_analise
+        from .models import ResultadoAnalise
+        resultado = ResultadoAnalise.objects.filter(pk=self.resultado_id).first()
+        if resultado:
+            self.send(text_data=json.dumps({'type': 'status', 'data': estado_analise(resultado)}))
+
     def disconnect(self, close_code):
         # Quando o usuário fecha a aba, o consumidor sai da sala.
         async_to_sync(self.channel_layer.group_discard)(
@@ -28,9 +36,31 @@ class AnalysisConsumer(WebsocketConsumer):
             self.channel_name
         )
 
+    def receive(self, text_data=None, bytes_data=None):
+        # Única ação aceita do navegador: {"acao": "cancelar"}
+        try:
+            acao = json.loads(text_data or '{}').get('acao')
+        except (ValueError, AttributeError):
+            return
+        if acao != 'cancelar':
+            return
+
+        from .fila import cancelar_analise
+        from .models import ResultadoAnalise
+        user = self.scope.get('user')
+        resultado = ResultadoAnalise.objects.filter(pk=self.resultado_id).first()
+        if not resultado or not user or not user.is_authenticated:
+            return
+        if resultado.criado_por_id != user.id and not user.is_staff:
+            self.send(text_data=json.dumps({'type': 'log', 'data': {
+                'level': 'ERROR', 'message': '❌ Só quem iniciou a análise pode cancelá-la.'
+            }}))
+            return
+        cancelar_analise(resultado)
+
     # Este método é chamado quando o AnalyserService envia uma mensagem para a sala.
     # O nome do método (analysis_update) corresponde ao 'type' que vamos definir no service.
     def analysis_update(self, event):
         message = event['message']
         # Envia a mensagem para o navegador do usuário através do WebSocket.
-        self.send(text_data=json.dumps(message))
\ No newline at end of file
+        self.send(text_data=json.dumps(message))
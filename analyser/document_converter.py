@@ -2,7 +2,9 @@
 
 import logging
 import io
-from typing import Tuple, Optional
+import re
+import unicodedata
+from typing import List, Tuple, Optional
 from docx import Document as DocxDocument
 from openpyxl import load_workbook
 from PyPDF2 import PdfReader
@@ -10,9 +12,19 @@ from PyPDF2 import PdfReader
 logger = logging.getLogger(__name__)
 
 
+def normalizar_texto(texto: str) -> str:
+    """Unicode NFC, quebras de linha Unix, sem espaços no fim das linhas nem linhas em branco repetidas."""
+    texto = unicodedata.normalize('NFC', texto).replace('\r\n', '\n').replace('\r', '\n')
+    texto = '\n'.join(linha.rstrip() for linha in texto.split('\n'))
+    return re.sub(r'\n{3,}', '\n\n', texto).strip()
+
+
 class DocumentConverter:
     """Conversor de documentos para extrair conteúdo em diferentes formatos."""
     
+    # Versão da extração: aumente ao mudar o texto gerado (invalida o cache de extrações)
+    VERSAO = 1
+    
     # Formatos suportados
     FORMATOS_SUPORTADOS = {
         'application/pdf': 'PDF',
@@ -61,51 +73,54 @@ class DocumentConverter:
             raise
     
     @staticmethod
-    def extract_text_from_xlsx(content: bytes) -> str:
-        """Extrai dados de um arquivo XLSX."""
+    def extract_pages_from_xlsx(content: bytes) -> List[str]:
+        """Extrai os dados de cada planilha de um arquivo XLSX (uma "página" por planilha)."""
         logger.info("📊 Extraindo dados de XLSX...")
         try:
             wb = load_workbook(io.BytesIO(content))
-            texto = []
+            paginas = []
             
             for sheet_name in wb.sheetnames:
                 sheet = wb[sheet_name]
-                texto.append(f"\n=== Planilha: {sheet_name} ===\n")
+                texto = [f"=== Planilha: {sheet_name} ===\n"]
                 
                 for row in sheet.iter_rows(values_only=True):
                     row_text = [str(cell) if cell is not None else '' for cell in row]
                     if any(row_text):
                         texto.append(' | '.join(row_text))
+                paginas.append('\n'.join(texto))
             
-            resultado = '\n'.join(texto)
-            logger.info(f"✅ Extraído {len(resultado)} caracteres do XLSX")
-            return resultado
+            logger.info(f"✅ Extraídas {len(paginas)} planilha(s) do XLSX")
+            return paginas
         
         except Exception as e:
             logger.error(f"❌ Erro ao extrair XLSX: {e}")
             raise
     
     @staticmethod
-    def extract_text_from_pdf(content: bytes) -> str:
-        """Extrai texto de um arquivo PDF."""
+    def extract_text_from_xlsx(content: bytes) -> str:
+        """Extrai dados de um arquivo XLSX."""
+        return DocumentConverter.juntar_paginas(DocumentConverter.extract_pages_from_xlsx(content), 'XLSX')
+    
+    @staticmethod
+    def extract_pages_from_pdf(content: bytes) -> List[str]:
+        """Extrai o texto de cada página de um arquivo PDF."""
         logger.info("📕 Extraindo texto de PDF...")
         try:
             pdf_reader = PdfReader(io.BytesIO(content))
-            texto = []
-            
-            for page_num, page in enumerate(pdf_reader.pages, 1):
-                page_text = page.extract_text()
-                if page_text.strip():
-                    texto.append(f"--- Página {page_num} ---\n{page_text}")
-            
-            resultado = '\n'.join(texto)
-            logger.info(f"✅ Extraído {len(resultado)} caracteres do PDF")
-            return resultado
+            paginas = [page.extract_text() or '' for page in pdf_reader.pages]
+            logger.info(f"✅ Extraídas {len(paginas)} páginas do PDF")
+            return paginas
         
         except Exception as e:
             logger.error(f"❌ Erro ao extrair PDF: {e}")
             raise
     
+    @staticmethod
+    def extract_text_from_pdf(content: bytes) -> str:
+        """Extrai texto de um arquivo PDF."""
+        return DocumentConverter.juntar_paginas(DocumentConverter.extract_pages_from_pdf(content), 'PDF')
+    
     @staticmethod
     def extract_text_from_doc(content: bytes) -> str:
         """Extrai texto de um arquivo DOC (tentando como DOCX primeiro)."""
@@ -123,14 +138,12 @@ class DocumentConverter:
                 raise
     
     @staticmethod
-    def convert_to_text(file_content: bytes, mime_type: str, file_name: str) -> Tuple[str, str]:
+    def convert_to_pages(file_content: bytes, mime_type: str, file_name: str) -> Tuple[List[str], str]:
         """
-        Converte documento para texto.
+        Converte documento para texto normalizado, página a página (no PDF, as
+        páginas; no XLSX, as planilhas; nos demais, uma página só).
         
-        :param file_content: Conteúdo binário do arquivo
-        :param mime_type: MIME type do arquivo
-        :param file_name: Nome do arquivo (para logging)
-        :return: Tuple (texto_extraído, formato)
+        :return: Tuple (páginas, formato)
         """
         
         logger.info(f"🔄 Convertendo arquivo: {file_name} (MIME: {mime_type})")
@@ -142,23 +155,42 @@ class DocumentConverter:
         
         # Roteia para o método apropriado
         if formato == 'PDF':
-            texto = DocumentConverter.extract_text_from_pdf(file_content)
+            paginas = DocumentConverter.extract_pages_from_pdf(file_content)
         elif formato == 'DOCX':
-            texto = DocumentConverter.extract_text_from_docx(file_content)
+            paginas = [DocumentConverter.extract_text_from_docx(file_content)]
         elif formato == 'DOC':
-            texto = DocumentConverter.extract_text_from_doc(file_content)
-        elif formato == 'XLSX':
-            texto = DocumentConverter.extract_text_from_xlsx(file_content)
-        elif formato == 'XLS':
+            paginas = [DocumentConverter.extract_text_from_doc(file_content)]
+        elif formato in ('XLSX', 'XLS'):
             # XLS antigo - tenta como XLSX
-            texto = DocumentConverter.extract_text_from_xlsx(file_content)
+            paginas = DocumentConverter.extract_pages_from_xlsx(file_content)
         elif formato == 'TXT':
-            texto = file_content.decode('utf-8', errors='ignore')
+            paginas = [file_content.decode('utf-8', errors='ignore')]
         else:
             raise ValueError(f"❌ Formato não implementado: {formato}")
         
-        logger.info(f"✅ Conversão concluída: {formato} -> Texto ({len(texto)} caracteres)")
-        return texto, formato
+        paginas = [normalizar_texto(pagina) for pagina in paginas]
+        logger.info(f"✅ Conversão concluída: {formato} -> {len(paginas)} página(s)")
+        return paginas, formato
+    
+    @staticmethod
+    def juntar_paginas(paginas: List[str], formato: str) -> str:
+        """Texto único do documento a partir das páginas (no PDF, com o número de cada página)."""
+        if formato == 'PDF':
+            return '\n'.join(f"--- Página {num} ---\n{pagina}" for num, pagina in enumerate(paginas, 1) if pagina.strip())
+        return '\n\n'.join(pagina for pagina in paginas if pagina.strip())
+    
+    @staticmethod
+    def convert_to_text(file_content: bytes, mime_type: str, file_name: str) -> Tuple[str, str]:
+        """
+        Converte documento para texto.
+        
+        :param file_content: Conteúdo binário do arquivo
+        :param mime_type: MIME type do arquivo
+        :param file_name: Nome do arquivo (para logging)
+        :return: Tuple (texto_extraído, formato)
+        """
+        paginas, formato = DocumentConverter.convert_to_pages(file_content, mime_type, file_name)
+        return DocumentConverter.juntar_paginas(paginas, formato), formato
 
 
 # Exemplo de uso:
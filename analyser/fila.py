@@ -0,0 +1,207 @@
+# analyser/fila.py
+import time
+import uuid
+import logging
+from contextlib import contextmanager
+from datetime import timedelta
+from typing import Callable, Dict, Optional
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ResultadoAnalise
+
+logger = logging.getLogger(__name__)
+
+# Resultado de `reservar_execucao`
+RESERVADA = 'RESERVADA'
+AGUARDAR = 'AGUARDAR'
+IGNORAR = 'IGNORAR'
+
+# Vagas da etapa MAP compartilhadas entre os processos do worker (ver `vaga_map`)
+PREFIXO_VAGA_MAP = 'analises:map:vaga'
+ESPERA_VAGA_MAP = 0.5
+
+
+class LimiteAnalisesExcedido(Exception):
+    """O usuário já tem o máximo de análises na fila."""
+
+
+def enviar_atualizacao(resultado_id: int, tipo: str, dados: Dict):
+    """Envia uma mensagem para a sala WebSocket da análise (ver AnalysisConsumer)."""
+    try:
+        async_to_sync(get_channel_layer().group_send)(
+            f'analise_{resultado_id}',
+            {'type': 'analysis.update', 'message': {'type': tipo, 'data': dados}}
+        )
+    except Exception as e:
+        logger.warning(f"Aviso ao enviar update via WebSocket: {e}")
+
+
+# ==================================
+# Consultas
+# ==================================
+
+def _em_execucao():
+    """Análises rodando agora (as que passaram do tempo máximo são de um worker que morreu)."""
+    limite = timezone.now() - timedelta(minutes=settings.ANALISE_TEMPO_MAX_MINUTOS)
+    return ResultadoAnalise.objects.filter(status='PROCESSANDO', iniciado_em__gte=limite)
+
+
+def posicao_na_fila(resultado: ResultadoAnalise) -> Optional[int]:
+    """Posição da análise na fila (1 = a próxima), ou None se ela não está na fila."""
+    if resultado.status != 'NA_FILA':
+        return None
+    return ResultadoAnalise.objects.filter(status='NA_FILA', id__lte=resultado.id).count()
+
+
+def estado_analise(resultado: ResultadoAnalise) -> Dict:
+    return {
+        'status': resultado.status,
+        'status_display': resultado.get_status_display(),
+        'posicao': posicao_na_fila(resultado),
+        'cancelamento_solicitado': resultado.cancelamento_solicitado,
+    }
+
+
+def notificar_fila():
+    """Atualiza a posição na fila de todas as análises que estão esperando."""
+    ids = ResultadoAnalise.objects.filter(status='NA_FILA').order_by('id').values_list('id', flat=True)
+    for posicao, resultado_id in enumerate(ids, start=1):
+        enviar_atualizacao(resultado_id, 'queue_position', {'status': 'NA_FILA', 'posicao': posicao})
+
+
+# ==================================
+# Envio e execução
+# ==================================
+
+def verificar_limite_usuario(usuario):
+    """Levanta LimiteAnalisesExcedido se o usuário já tem análises demais esperando ou rodando."""
+    ativas = ResultadoAnalise.objects.filter(criado_por=usuario, status__in=ResultadoAnalise.STATUS_ATIVOS).count()
+    if ativas >= settings.ANALISE_MAX_NA_FILA_POR_USUARIO:
+        raise LimiteAnalisesExcedido(
+            f"Você já tem {ativas} análise(s) em andamento. Aguarde alguma terminar ou cancele uma delas."
+        )
+
+
+def enfileirar_analise(resultado: ResultadoAnalise):
+    """
+    Coloca a análise na fila do Celery depois do commit. O ID da tarefa é
+    gravado antes, para que a análise possa ser cancelada mesmo ainda na fila.
+    """
+    resultado.task_id = str(uuid.uuid4())
+    resultado.status = 'NA_FILA'
+    resultado.save(update_fields=['task_id', 'status'])
+    resultado_id, task_id = resultado.id, resultado.task_id
+    transaction.on_commit(lambda: _publicar(resultado_id, task_id))
+
+
+def _publicar(resultado_id: int, task_id: str):
+    from .tasks import executar_analise
+    try:
+        executar_analise.apply_async(args=[resultado_id], task_id=task_id)
+    except Exception as e:
+        logger.error(f"❌ [Análise #{resultado_id}] Não foi possível enviar para a fila: {e}")
+        ResultadoAnalise.objects.filter(pk=resultado_id, status='NA_FILA').update(
+            status='ERRO', mensagem_erro=f"Fila de análises indisponível: {e}"
+        )
+        enviar_atualizacao(resultado_id, 'analysis_error', {'message': 'Fila de análises indisponível.'})
+        return
+    notificar_fila()
+
+
+def reservar_execucao(resultado_id: int, retomar: bool = False) -> str:
+    """
+    Passa a análise de NA_FILA para PROCESSANDO se o usuário ainda tem vaga
+    (ANALISE_MAX_SIMULTANEAS_POR_USUARIO).
+
+    :param retomar: A tarefa foi reentregue (o worker anterior morreu no meio);
+                    aceita a análise mesmo já marcada como PROCESSANDO.
+    :return: RESERVADA, AGUARDAR (sem vaga) ou IGNORAR (cancelada, terminada ou inexistente).
+    """
+    with transaction.atomic():
+        resultado = ResultadoAnalise.objects.select_for_update().filter(pk=resultado_id).first()
+        if resultado is None or resultado.status not in (('NA_FILA', 'PROCESSANDO') if retomar else ('NA_FILA',)):
+            return IGNORAR
+
+        if resultado.criado_por_id and resultado.status == 'NA_FILA':
+            # Trava o usuário: duas reservas simultâneas dele não passam juntas do limite
+            User.objects.select_for_update().filter(pk=resultado.criado_por_id).first()
+            rodando = _em_execucao().filter(criado_por_id=resultado.criado_por_id).count()
+            if rodando >= settings.ANALISE_MAX_SIMULTANEAS_POR_USUARIO:
+                return AGUARDAR
+
+        resultado.status = 'PROCESSANDO'
+        resultado.iniciado_em = timezone.now()
+        resultado.save(update_fields=['status', 'iniciado_em'])
+    return RESERVADA
+
+
+def cancelar_analise(resultado: ResultadoAnalise) -> bool:
+    """
+    Cancela uma análise ativa. Se ainda está na fila, sai na hora; se já está
+    rodando, para no próximo ponto de verificação (entre um arquivo e outro).
+
+    :return: False se a análise já tinha terminado.
+    """
+    if ResultadoAnalise.objects.filter(pk=resultado.pk, status='NA_FILA').update(
+        status='CANCELADO', cancelamento_solicitado=True
+    ):
+        if resultado.task_id:
+            from gestao_casos.celery import app
+            try:
+                app.control.revoke(resultado.task_id)
+            except Exception as e:
+                # Sem problema: o worker vê o status CANCELADO e descarta a tarefa
+                logger.warning(f"[Análise #{resultado.pk}] Não foi possível revogar a tarefa: {e}")
+        logger.info(f"🛑 [Análise #{resultado.pk}] Cancelada antes de começar.")
+        enviar_atualizacao(resultado.pk, 'analysis_complete', {'status': 'CANCELADO'})
+        notificar_fila()
+        return True
+
+    if ResultadoAnalise.objects.filter(pk=resultado.pk, status='PROCESSANDO').update(cancelamento_solicitado=True):
+        logger.info(f"🛑 [Análise #{resultado.pk}] Cancelamento solicitado durante a execução.")
+        enviar_atualizacao(resultado.pk, 'log', {'level': 'WARNING', 'message': '🛑 Cancelamento solicitado...'})
+        return True
+    return False
+
+
+# ==================================
+# Vagas da etapa MAP
+# ==================================
+
+@contextmanager
+def vaga_map(verificar: Optional[Callable[[], None]] = None):
+    """
+    Ocupa uma das ANALISE_MAP_CONCORRENCIA_GLOBAL vagas da etapa MAP, somando
+    todas as análises de todos os processos do worker (o pool prefork roda uma
+    tarefa por processo, então um semáforo em memória não limitaria nada).
+
+    Cada vaga é uma chave no cache compartilhado (Redis), ocupada com
+    `cache.add`; a validade de ANALISE_TEMPO_MAX_MINUTOS libera a vaga de um
+    processo que morreu no meio. `verificar` roda enquanto espera (ex:
+    levantar AnaliseCancelada).
+    """
+    token = uuid.uuid4().hex
+    validade = settings.ANALISE_TEMPO_MAX_MINUTOS * 60
+    chave = None
+    while chave is None:
+        for vaga in range(max(1, settings.ANALISE_MAP_CONCORRENCIA_GLOBAL)):
+            if cache.add(f'{PREFIXO_VAGA_MAP}:{vaga}', token, validade):
+                chave = f'{PREFIXO_VAGA_MAP}:{vaga}'
+                break
+        else:
+            if verificar:
+                verificar()
+            time.sleep(ESPERA_VAGA_MAP)
+    try:
+        yield
+    finally:
+        # Só libera se a vaga ainda é nossa (pode ter expirado e sido ocupada por outro)
+        if cache.get(chave) == token:
+            cache.delete(chave)
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.7 on 2026-10-17 03:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyser', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resultadoanalise',
+            name='cancelamento_solicitado',
+            field=models.BooleanField(default=False, verbose_name='Cancelamento Solicitado'),
+        ),
+        migrations.AddField(
+            model_name='resultadoanalise',
+            name='iniciado_em',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Iniciado em'),
+        ),
+        migrations.AddField(
+            model_name='resultadoanalise',
+            name='task_id',
+            field=models.CharField(blank=True, default='', max_length=255, verbose_name='ID da Tarefa (Celery)'),
+        ),
+        migrations.AlterField(
+            model_name='resultadoanalise',
+            name='status',
+            field=models.CharField(choices=[('NA_FILA', 'Na Fila'), ('PROCESSANDO', 'Processando'), ('CONCLUIDO', 'Concluído'), ('ERRO', 'Erro'), ('CANCELADO', 'Cancelado')], default='NA_FILA', max_length=20, verbose_name='Status'),
+        ),
+        migrations.AddIndex(
+            model_name='resultadoanalise',
+            index=models.Index(fields=['status', 'id'], name='analise_fila_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-17 03:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyser', '0002_fila_analise'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExtracaoTexto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, verbose_name='SHA-256 do Arquivo')),
+                ('formato', models.CharField(max_length=10, verbose_name='Formato')),
+                ('versao_conversor', models.PositiveIntegerField(verbose_name='Versão do Conversor')),
+                ('paginas', models.JSONField(default=list, verbose_name='Texto por Página')),
+                ('tamanho', models.PositiveIntegerField(default=0, verbose_name='Tamanho do Texto (bytes)')),
+                ('acessos', models.PositiveIntegerField(default=0, verbose_name='Acessos')),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('ultimo_uso_em', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Último Uso')),
+            ],
+            options={
+                'verbose_name': 'Extração de Texto (Cache)',
+                'verbose_name_plural': 'Extrações de Texto (Cache)',
+                'constraints': [models.UniqueConstraint(fields=('sha256', 'formato', 'versao_conversor'), name='extracao_texto_unica')],
+            },
+        ),
+    ]
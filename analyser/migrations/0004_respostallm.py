@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-17 03:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyser', '0003_extracaotexto'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RespostaLLM',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chave', models.CharField(max_length=64, unique=True, verbose_name='Chave (SHA-256)')),
+                ('modelo_llm', models.CharField(max_length=100, verbose_name='Modelo de IA')),
+                ('resposta', models.TextField(verbose_name='Resposta')),
+                ('acessos', models.PositiveIntegerField(default=0, verbose_name='Acessos')),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('expira_em', models.DateTimeField(db_index=True, verbose_name='Expira em')),
+                ('modelo_analise', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='respostas_em_cache', to='analyser.modeloanalise', verbose_name='Modelo de Análise')),
+            ],
+            options={
+                'verbose_name': 'Resposta da IA (Cache)',
+                'verbose_name_plural': 'Respostas da IA (Cache)',
+            },
+        ),
+    ]
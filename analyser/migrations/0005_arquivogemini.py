@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-17 03:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyser', '0004_respostallm'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArquivoGemini',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, verbose_name='SHA-256 do Conteúdo')),
+                ('mime_type', models.CharField(max_length=150, verbose_name='MIME Type')),
+                ('nome', models.CharField(max_length=255, verbose_name='Nome no Gemini')),
+                ('uri', models.URLField(max_length=500, verbose_name='URI')),
+                ('tamanho', models.PositiveBigIntegerField(default=0, verbose_name='Tamanho (bytes)')),
+                ('usos', models.PositiveIntegerField(default=0, verbose_name='Usos')),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('expira_em', models.DateTimeField(db_index=True, verbose_name='Expira em')),
+            ],
+            options={
+                'verbose_name': 'Arquivo no Gemini (File API)',
+                'verbose_name_plural': 'Arquivos no Gemini (File API)',
+                'constraints': [models.UniqueConstraint(fields=('sha256', 'mime_type'), name='arquivo_gemini_unico')],
+            },
+        ),
+    ]
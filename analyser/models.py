@@ -118,10 +118,14 @@ class ResultadoAnalise(models.Model):
     """Resultado de uma análise."""
     
     STATUS_CHOICES = [
+        ('NA_FILA', 'Na Fila'),
         ('PROCESSANDO', 'Processando'),
         ('CONCLUIDO', 'Concluído'),
         ('ERRO', 'Erro'),
+        ('CANCELADO', 'Cancelado'),
     ]
+    # Status de análise que ainda não terminou
+    STATUS_ATIVOS = ('NA_FILA', 'PROCESSANDO')
     
     caso = models.ForeignKey(
         Caso,
@@ -157,9 +161,12 @@ class ResultadoAnalise(models.Model):
     status = models.CharField(
         max_length=20,
         choices=STATUS_CHOICES,
-        default='PROCESSANDO',
+        default='NA_FILA',
         verbose_name="Status"
     )
+    task_id = models.CharField(max_length=255, blank=True, default='', verbose_name="ID da Tarefa (Celery)")
+    cancelamento_solicitado = models.BooleanField(default=False, verbose_name="Cancelamento Solicitado")
+    iniciado_em = models.DateTimeField(null=True, blank=True, verbose_name="Iniciado em")
     mensagem_erro = models.TextField(blank=True, null=True, verbose_name="Mensagem de Erro")
     
     aplicado_ao_caso = models.BooleanField(default=False, verbose_name="Aplicado ao Caso")
@@ -188,6 +195,9 @@ class ResultadoAnalise(models.Model):
         verbose_name = "Resultado de Análise"
         verbose_name_plural = "Resultados de Análises"
         ordering = ['-data_criacao']
+        indexes = [
+            models.Index(fields=['status', 'id'], name='analise_fila_idx'),
+        ]
     
     def __str__(self):
         return f"Análise #{self.id} - Caso {self.caso.id} - {self.get_status_display()}"
@@ -222,4 +232,87 @@ class LogAnalise(models.Model):
         ordering = ['timestamp']
     
     def __str__(self):
-        return f"[{self.nivel}] {self.timestamp.strftime('%H:%M:%S')} - {self.mensagem[:50]}"
\ No newline at end of file
+        return f"[{self.nivel}] {self.timestamp.strftime('%H:%M:%S')} - {self.mensagem[:50]}"
+
+class ExtracaoTexto(models.Model):
+    """
+    Cache do texto extraído dos documentos (DOCX, XLSX, PDF...), por conteúdo:
+    o mesmo arquivo analisado de novo, em qualquer caso ou modelo, não é
+    convertido outra vez. A versão do conversor faz parte da chave, então
+    mudar a extração (DocumentConverter.VERSAO) invalida as entradas antigas.
+    """
+
+    sha256 = models.CharField(max_length=64, verbose_name="SHA-256 do Arquivo")
+    formato = models.CharField(max_length=10, verbose_name="Formato")
+    versao_conversor = models.PositiveIntegerField(verbose_name="Versão do Conversor")
+    paginas = models.JSONField(default=list, verbose_name="Texto por Página")
+    tamanho = models.PositiveIntegerField(default=0, verbose_name="Tamanho do Texto (bytes)")
+    acessos = models.PositiveIntegerField(default=0, verbose_name="Acessos")
+    criado_em = models.DateTimeField(auto_now_add=True)
+    ultimo_uso_em = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name="Último Uso")
+
+    class Meta:
+        verbose_name = "Extração de Texto (Cache)"
+        verbose_name_plural = "Extrações de Texto (Cache)"
+        constraints = [
+            models.UniqueConstraint(fields=['sha256', 'formato', 'versao_conversor'], name='extracao_texto_unica'),
+        ]
+
+    def __str__(self):
+        return f"{self.formato} {self.sha256[:12]}… v{self.versao_conversor} ({len(self.paginas)} pág.)"
+
+
+class RespostaLLM(models.Model):
+    """
+    Cache das respostas do Gemini. A chave é o hash do modelo de IA, da
+    configuração de geração, do prompt e do conteúdo dos documentos enviados:
+    a mesma pergunta sobre os mesmos documentos não é paga duas vezes.
+    """
+
+    chave = models.CharField(max_length=64, unique=True, verbose_name="Chave (SHA-256)")
+    modelo_analise = models.ForeignKey(
+        ModeloAnalise,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='respostas_em_cache',
+        verbose_name="Modelo de Análise"
+    )
+    modelo_llm = models.CharField(max_length=100, verbose_name="Modelo de IA")
+    resposta = models.TextField(verbose_name="Resposta")
+    acessos = models.PositiveIntegerField(default=0, verbose_name="Acessos")
+    criado_em = models.DateTimeField(auto_now_add=True)
+    expira_em = models.DateTimeField(db_index=True, verbose_name="Expira em")
+
+    class Meta:
+        verbose_name = "Resposta da IA (Cache)"
+        verbose_name_plural = "Respostas da IA (Cache)"
+
+    def __str__(self):
+        return f"{self.modelo_llm} {self.chave[:12]}… ({self.acessos} acesso(s))"
+
+
+class ArquivoGemini(models.Model):
+    """
+    Documento já enviado ao File API do Gemini. Enquanto o handle não expira,
+    as chamadas passam só a referência (URI) em vez do conteúdo inteiro.
+    """
+
+    sha256 = models.CharField(max_length=64, verbose_name="SHA-256 do Conteúdo")
+    mime_type = models.CharField(max_length=150, verbose_name="MIME Type")
+    nome = models.CharField(max_length=255, verbose_name="Nome no Gemini")
+    uri = models.URLField(max_length=500, verbose_name="URI")
+    tamanho = models.PositiveBigIntegerField(default=0, verbose_name="Tamanho (bytes)")
+    usos = models.PositiveIntegerField(default=0, verbose_name="Usos")
+    criado_em = models.DateTimeField(auto_now_add=True)
+    expira_em = models.DateTimeField(db_index=True, verbose_name="Expira em")
+
+    class Meta:
+        verbose_name = "Arquivo no Gemini (File API)"
+        verbose_name_plural = "Arquivos no Gemini (File API)"
+        constraints = [
+            models.UniqueConstraint(fields=['sha256', 'mime_type'], name='arquivo_gemini_unico'),
+        ]
+
+    def __str__(self):
+        return f"{self.nome} ({self.mime_type}, {self.sha256[:12]}…)"
@@ -5,24 +5,33 @@ import json
 import re
 from datetime import datetime
 from decimal import Decimal
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import requests
+from django.db import connection
 from django.utils import timezone
 from django.conf import settings
 import time
 import google.generativeai as genai
 from tenacity import retry, stop_after_attempt, wait_fixed, retry_if_exception_type
-from google.api_core.exceptions import ResourceExhausted
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
+from google.api_core.exceptions import NotFound, PermissionDenied, ResourceExhausted
 
 from .models import ResultadoAnalise, LogAnalise, ModeloAnalise
+from .fila import enviar_atualizacao, vaga_map
 from .document_converter import DocumentConverter  # ✅ NOVO IMPORT
+from .cache_extracao import extrair_paginas
+from .cache_respostas import chave_resposta, guardar_resposta, obter_resposta
+from .arquivos_gemini import descartar_referencia, referencia_arquivo, usar_file_api
 from campos_custom.models import CampoPersonalizado, ValorCampoPersonalizado
-from integrations.sharepoint import SharePoint
+from integrations.blobs import obter_cache_blobs
 
 logger = logging.getLogger(__name__)
 
 
+class AnaliseCancelada(Exception):
+    """O usuário cancelou a análise durante a execução."""
+
+
 class AnalyserService:
     """Serviço para análise de documentos com IA."""
     
@@ -32,7 +41,14 @@ class AnalyserService:
         self.arquivos_info = arquivos_selecionados
         self.usuario = usuario
         self.resultado_id = resultado_id
-        self.channel_layer = get_channel_layer()
+        self._cancelada = threading.Event()
+        # Acertos e falhas do cache de extração de texto nesta análise
+        self._cache_extracao = {'acertos': 0, 'falhas': 0}
+        # Respostas da IA reaproveitadas do cache / pedidas ao Gemini nesta análise
+        self._cache_respostas = {'acertos': 0, 'falhas': 0}
+        # Documentos enviados ao File API do Gemini / reaproveitados de envios anteriores
+        self._file_api = {'enviados': 0, 'reaproveitados': 0}
+        self._lock_contadores = threading.Lock()
         
         try:
             self.resultado = ResultadoAnalise.objects.get(id=self.resultado_id)
@@ -40,27 +56,83 @@ class AnalyserService:
             raise ValueError(f"ResultadoAnalise com ID {self.resultado_id} não encontrado.")
 
         genai.configure(api_key=settings.GEMINI_API_KEY)
+        self.nome_modelo_gemini = getattr(settings, 'GEMINI_MODEL', 'gemini-2.5-pro')
+        # Faz parte da chave do cache de respostas: mudar a configuração não reaproveita respostas antigas
+        self.config_geracao = {'temperature': settings.GEMINI_TEMPERATURE}
         self.gemini_model = genai.GenerativeModel(
-            model_name=getattr(settings, 'GEMINI_MODEL', 'gemini-2.5-pro')
+            model_name=self.nome_modelo_gemini,
+            generation_config=self.config_geracao,
         )
 
     def _send_update(self, event_type, data):
         """Envia mensagens via WebSocket."""
-        try:
-            room_group_name = f'analise_{self.resultado_id}'
-            message = {'type': event_type, 'data': data}
-            
-            async_to_sync(self.channel_layer.group_send)(
-                room_group_name,
-                {'type': 'analysis.update', 'message': message}
-            )
-        except Exception as e:
-            logger.warning(f"Aviso ao enviar update via WebSocket: {e}")
+        enviar_atualizacao(self.resultado_id, event_type, data)
+
+    def _verificar_cancelamento(self):
+        """Ponto de parada: interrompe a análise se o usuário pediu o cancelamento."""
+        if self._cancelada.is_set() or ResultadoAnalise.objects.filter(
+            pk=self.resultado_id, cancelamento_solicitado=True
+        ).exists():
+            self._cancelada.set()
+            raise AnaliseCancelada()
 
     # =========================================================================
     # CHAMADAS À API GEMINI
     # =========================================================================
     
+    def _gerar_conteudo(self, prompt: str, arquivo: dict = None, processar=str.strip):
+        """
+        Pede a resposta ao Gemini, ou a reaproveita do cache quando a mesma
+        requisição (modelo, configuração, prompt e documentos) já foi respondida.
+        Só vai para o cache a resposta que `processar` aceitou (ex: JSON válido).
+        
+        Returns:
+            Tuple (processar(texto_da_resposta), veio_do_cache)
+        """
+        chave = chave_resposta(
+            self.nome_modelo_gemini, self.config_geracao, prompt, [arquivo] if arquivo else [],
+            self.modelo.pk if self.modelo else None
+        )
+        texto = obter_resposta(chave)
+        if texto is not None:
+            with self._lock_contadores:
+                self._cache_respostas['acertos'] += 1
+            return processar(texto), True
+        
+        if not arquivo:
+            response = self.gemini_model.generate_content(prompt)
+        else:
+            try:
+                response = self.gemini_model.generate_content([prompt, self._parte_documento(arquivo)])
+            except (NotFound, PermissionDenied) as e:
+                if not usar_file_api(arquivo):
+                    raise
+                # O arquivo saiu do File API antes do previsto: envia de novo, uma vez
+                logger.warning(f"⚠️ Referência ao arquivo no Gemini inválida ({e}). Reenviando o documento...")
+                descartar_referencia(arquivo)
+                response = self.gemini_model.generate_content([prompt, self._parte_documento(arquivo)])
+        resultado = processar(response.text)
+        guardar_resposta(chave, response.text, self.nome_modelo_gemini, self.modelo)
+        with self._lock_contadores:
+            self._cache_respostas['falhas'] += 1
+        return resultado, False
+
+    def _parte_documento(self, arquivo: dict):
+        """
+        O documento como parte da requisição: referência ao File API do Gemini
+        (enviado uma vez e reaproveitado até expirar) ou, se pequeno, inline.
+        """
+        if not usar_file_api(arquivo):
+            return arquivo
+        try:
+            referencia, enviado = referencia_arquivo(arquivo)
+        except Exception as e:
+            logger.warning(f"⚠️ Falha ao enviar o documento ao File API do Gemini ({e}). Enviando inline.")
+            return arquivo
+        with self._lock_contadores:
+            self._file_api['enviados' if enviado else 'reaproveitados'] += 1
+        return referencia
+
     def _chamar_gemini(self, prompt: str, arquivo: dict = None, is_json: bool = True):
         """
         Chamada genérica ao Gemini com ou sem arquivo.
@@ -74,13 +146,10 @@ class AnalyserService:
             dict ou str dependendo de is_json
         """
         try:
-            conteudo = [prompt, arquivo] if arquivo else prompt
-            response = self.gemini_model.generate_content(conteudo)
-            
-            if is_json:
-                return self._extrair_json_da_resposta(response.text)
-            else:
-                return response.text.strip()
+            resultado, _ = self._gerar_conteudo(
+                prompt, arquivo, self._extrair_json_da_resposta if is_json else str.strip
+            )
+            return resultado
                 
         except ResourceExhausted as e:
             logger.warning(f"⚠️ Limite da API Gemini atingido: {e}")
@@ -98,9 +167,10 @@ class AnalyserService:
         """Chama Gemini com retry automático em caso de limite de taxa."""
         try:
             self._send_update('log', {'level': 'INFO', 'message': '🤖 Enviando requisição para a IA...'})
-            response = self.gemini_model.generate_content([prompt, arquivo])
-            self._send_update('log', {'level': 'SUCCESS', 'message': '✅ Resposta recebida da IA.'})
-            return self._extrair_json_da_resposta(response.text)
+            dados, do_cache = self._gerar_conteudo(prompt, arquivo, self._extrair_json_da_resposta)
+            mensagem = '⚡ Resposta reaproveitada do cache (sem custo).' if do_cache else '✅ Resposta recebida da IA.'
+            self._send_update('log', {'level': 'SUCCESS', 'message': mensagem})
+            return dados
         except ResourceExhausted as e:
             self._send_update('log', {
                 'level': 'WARNING', 
@@ -142,12 +212,15 @@ class AnalyserService:
         if formato and formato != 'PDF':
             self._log('INFO', f'  -> Convertendo {formato} para texto...')
             try:
-                texto_extraido, formato_detectado = DocumentConverter.convert_to_text(
-                    conteudo_bytes,
-                    mime_type,
-                    nome_arquivo
-                )
-                self._log('SUCCESS', f'  -> ✅ {formato_detectado} convertido com sucesso!')
+                # Mesmo conteúdo já convertido antes (em qualquer análise): usa o texto do cache
+                paginas, formato_detectado, do_cache = extrair_paginas(conteudo_bytes, mime_type, nome_arquivo)
+                texto_extraido = DocumentConverter.juntar_paginas(paginas, formato_detectado)
+                with self._lock_contadores:
+                    self._cache_extracao['acertos' if do_cache else 'falhas'] += 1
+                if do_cache:
+                    self._log('SUCCESS', f'  -> ⚡ Texto do {formato_detectado} reaproveitado do cache de extração.')
+                else:
+                    self._log('SUCCESS', f'  -> ✅ {formato_detectado} convertido com sucesso!')
                 
                 # Cria um "arquivo" de texto para enviar ao Gemini
                 arquivo_preparado = {
@@ -179,18 +252,8 @@ class AnalyserService:
             raise ValueError("O dicionário 'arquivo_info' não contém um 'id'.")
 
         try:
-            sp = SharePoint()
-            item_details = sp.get_item_details(arquivo_id)
-            
-            download_url = item_details.get('@microsoft.graph.downloadUrl')
-            
-            if not download_url:
-                raise ValueError(f"API do SharePoint não retornou URL para '{nome_arquivo}'.")
-            
-            response = requests.get(download_url, timeout=30)
-            response.raise_for_status()
-            
-            conteudo_bytes = response.content
+            # Só baixa do SharePoint se esta versão do arquivo ainda não estiver em disco
+            conteudo_bytes = obter_cache_blobs().ler(arquivo_id)
             
             if not conteudo_bytes:
                 raise ValueError(f"Arquivo '{nome_arquivo}' está vazio.")
@@ -372,24 +435,14 @@ Seu resumo aqui...
         inicio = timezone.now()
         
         try:
-            # --- Etapa 1: MAP - Analisa cada arquivo individualmente ---
-            resultados_parciais = []
-            for arquivo_info in self.arquivos_info:
-                self._log('INFO', f'📄 Processando arquivo: {arquivo_info["name"]}...') 
-                try:
-                    arquivo_preparado = self._preparar_um_arquivo(arquivo_info)
-                    prompt_extracao = self._gerar_prompt_extracao()
-                    dados_parciais = self._chamar_gemini(prompt_extracao, arquivo_preparado, is_json=True)
-                    resultados_parciais.append(dados_parciais)
-                    self._log('SUCCESS', f'✅ Arquivo "{arquivo_info["name"]}" concluído.')
-                except Exception as e:
-                    self._log('WARNING', f'⚠️ Falha ao processar "{arquivo_info["name"]}": {e}')
-                    continue
+            # --- Etapa 1: MAP - Analisa os arquivos em paralelo ---
+            resultados_parciais = self._mapear_arquivos()
             
             if not resultados_parciais:
                 raise ValueError("Nenhum arquivo pôde ser analisado com sucesso.")
             
             # --- Etapa 2: REDUCE - Consolida os resultados ---
+            self._verificar_cancelamento()
             self._log('INFO', '🔄 Consolidando resultados...')
             prompt_combinado = self._gerar_prompt_consolidacao_e_resumo(resultados_parciais)
             resposta_completa = self._chamar_gemini(prompt_combinado, is_json=False)
@@ -405,9 +458,20 @@ Seu resumo aqui...
 
             self.resultado.resumo_caso = resumo_part_str.strip()
             self._log('SUCCESS', '📄 Resumo gerado com sucesso.')
+            if self._cache_respostas['acertos']:
+                self._log(
+                    'INFO',
+                    f"⚡ Respostas da IA: {self._cache_respostas['acertos']} do cache (sem custo), "
+                    f"{self._cache_respostas['falhas']} pedida(s) ao Gemini.",
+                    detalhes={'cache_respostas': dict(self._cache_respostas)},
+                )
 
             self.resultado.status = 'CONCLUIDO'
 
+        except AnaliseCancelada:
+            self.resultado.status = 'CANCELADO'
+            self._log('WARNING', '🛑 Análise cancelada pelo usuário.')
+
         except Exception as e:
             logger.error(f"[Análise #{self.resultado.id}] Falha crítica: {str(e)}", exc_info=True)
             self.resultado.status = 'ERRO'
@@ -416,11 +480,76 @@ Seu resumo aqui...
         
         finally:
             self.resultado.tempo_processamento = timezone.now() - inicio
-            self.resultado.save()
+            # Só os campos da execução: o pedido de cancelamento é gravado por outro processo
+            self.resultado.save(update_fields=[
+                'status', 'mensagem_erro', 'dados_extraidos', 'resumo_caso', 'tempo_processamento'
+            ])
             self._log('INFO', f'🏁 Análise finalizada. Status: {self.resultado.status}')
+            self._send_update('analysis_complete', {'status': self.resultado.status})
 
         return self.resultado
 
+    def _mapear_arquivos(self) -> list:
+        """
+        Etapa MAP: extrai os campos de cada arquivo, até ANALISE_MAP_CONCORRENCIA
+        arquivos ao mesmo tempo. Os resultados voltam na ordem original dos
+        arquivos; um arquivo que falha não interrompe os demais.
+        """
+        prompt_extracao = self._gerar_prompt_extracao()
+        total = len(self.arquivos_info)
+        resultados = [None] * total
+        concluidos = 0
+        cancelada = False
+
+        max_paralelo = max(1, min(total, settings.ANALISE_MAP_CONCORRENCIA))
+        with ThreadPoolExecutor(max_workers=max_paralelo) as executor:
+            futuros = {
+                executor.submit(self._mapear_um_arquivo, arquivo_info, prompt_extracao): indice
+                for indice, arquivo_info in enumerate(self.arquivos_info)
+            }
+            for futuro in as_completed(futuros):
+                arquivo_info = self.arquivos_info[futuros[futuro]]
+                try:
+                    resultados[futuros[futuro]] = futuro.result()
+                except AnaliseCancelada:
+                    cancelada = True
+                except Exception as e:
+                    self._log('WARNING', f'⚠️ Falha ao processar "{arquivo_info["name"]}": {e}')
+                concluidos += 1
+                self._send_update('progress', {'atual': concluidos, 'total': total})
+
+        if any(self._cache_extracao.values()):
+            self._log(
+                'INFO',
+                f"📦 Cache de extração de texto: {self._cache_extracao['acertos']} acerto(s), "
+                f"{self._cache_extracao['falhas']} falha(s).",
+                detalhes={'cache_extracao': dict(self._cache_extracao)},
+            )
+        if any(self._file_api.values()):
+            self._log(
+                'INFO',
+                f"📎 File API do Gemini: {self._file_api['reaproveitados']} documento(s) reaproveitado(s), "
+                f"{self._file_api['enviados']} enviado(s).",
+                detalhes={'file_api': dict(self._file_api)},
+            )
+        if cancelada:
+            raise AnaliseCancelada()
+        return [dados for dados in resultados if dados is not None]
+
+    def _mapear_um_arquivo(self, arquivo_info: dict, prompt_extracao: str) -> dict:
+        """Baixa, prepara e analisa um arquivo (roda numa thread do pool da etapa MAP)."""
+        try:
+            with vaga_map(self._verificar_cancelamento):
+                self._verificar_cancelamento()
+                self._log('INFO', f'📄 Processando arquivo: {arquivo_info["name"]}...')
+                arquivo_preparado = self._preparar_um_arquivo(arquivo_info)
+                dados_parciais = self._chamar_gemini(prompt_extracao, arquivo_preparado, is_json=True)
+            self._log('SUCCESS', f'✅ Arquivo "{arquivo_info["name"]}" concluído.')
+            return dados_parciais
+        finally:
+            # A thread abriu a sua própria conexão com o banco (logs, cancelamento)
+            connection.close()
+
     # =========================================================================
     # ANÁLISE INTERATIVA (UM ARQUIVO)
     # =========================================================================
@@ -570,6 +699,8 @@ Seu resumo aqui...
                 detalhes=detalhes or {}
             )
         
+        self._send_update('log', {'level': nivel, 'message': mensagem})
+
         log_method = getattr(logger, nivel.lower() if nivel != 'SUCCESS' else 'info')
         log_method(f"[Análise #{self.resultado.id if self.resultado else '?'}] {mensagem}")
 
@@ -0,0 +1,48 @@
+# analyser/tasks.py
+import logging
+
+from celery import shared_task
+from django.conf import settings
+
+from .fila import AGUARDAR, RESERVADA, enviar_atualizacao, notificar_fila, reservar_execucao
+from .models import ResultadoAnalise
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(
+    bind=True,
+    acks_late=True,               # Se o worker morrer no meio, a tarefa volta para a fila
+    reject_on_worker_lost=True,
+    ignore_result=True,
+    max_retries=None,
+    soft_time_limit=settings.ANALISE_TEMPO_MAX_MINUTOS * 60,
+)
+def executar_analise(self, resultado_id):
+    """
+    Executa uma análise enviada por `analyser.fila.enfileirar_analise`
+    (fila 'analises'). Se o usuário já está no limite de análises simultâneas,
+    a tarefa volta para a fila e tenta de novo depois.
+    """
+    retomar = bool((self.request.delivery_info or {}).get('redelivered'))
+    situacao = reservar_execucao(resultado_id, retomar=retomar)
+    if situacao == AGUARDAR:
+        raise self.retry(countdown=settings.ANALISE_ESPERA_VAGA_SEGUNDOS)
+    if situacao != RESERVADA:
+        logger.info(f"[Análise #{resultado_id}] Tarefa descartada (cancelada ou já processada).")
+        return
+
+    notificar_fila()
+    from .services import AnalyserService
+    resultado = ResultadoAnalise.objects.select_related('caso', 'modelo_usado', 'criado_por').get(pk=resultado_id)
+    try:
+        AnalyserService(
+            resultado.caso, resultado.modelo_usado, resultado.arquivos_analisados, resultado.criado_por, resultado.id
+        ).executar_analise()
+    except Exception as e:
+        # Falha antes de a análise começar (ex: configuração do Gemini)
+        logger.error(f"Erro ao iniciar análise #{resultado_id}: {e}", exc_info=True)
+        ResultadoAnalise.objects.filter(pk=resultado_id).update(status='ERRO', mensagem_erro=str(e))
+        enviar_atualizacao(resultado_id, 'analysis_error', {'message': str(e)})
+    finally:
+        notificar_fila()
@@ -9,11 +9,13 @@ urlpatterns = [
     # Seleção de arquivos e início de análise
     path('analisar/<int:caso_id>/', views.selecionar_arquivos, name='selecionar_arquivos'),
     path('analisar/<int:caso_id>/arquivos/', views.carregar_arquivos_navegacao, name='carregar_arquivos_navegacao'),
+    path('analisar/<int:caso_id>/arvore/', views.carregar_arvore_caso, name='carregar_arvore_caso'),
     path('analisar/<int:caso_id>/iniciar/', views.iniciar_analise, name='iniciar_analise'),
     
     # Resultado e logs
     path('resultado/<int:resultado_id>/', views.resultado_analise, name='resultado_analise'),
     path('resultado/<int:resultado_id>/logs/', views.carregar_logs, name='carregar_logs'),
+    path('resultado/<int:resultado_id>/cancelar/', views.cancelar_analise, name='cancelar_analise'),
     
     # Aplicar ao caso
     path('resultado/<int:resultado_id>/aplicar/', views.aplicar_ao_caso, name='aplicar_ao_caso'),
@@ -23,6 +25,7 @@ urlpatterns = [
     path('modelos/criar/', views.criar_modelo, name='criar_modelo'),
     path('modelos/<int:pk>/editar/', views.editar_modelo, name='editar_modelo'),
     path('modelos/<int:pk>/deletar/', views.deletar_modelo, name='deletar_modelo'),
+    path('modelos/<int:pk>/limpar-cache/', views.limpar_cache_modelo, name='limpar_cache_modelo'),
     
     # AJAX
     path('ajax/campos/', views.ajax_buscar_campos, name='ajax_buscar_campos'),
@@ -5,12 +5,18 @@ import json
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse
+from django.db import transaction
 from django.views.decorators.http import require_http_methods
 from django.utils import timezone
 from casos.models import Caso
 from .models import ResultadoAnalise, LogAnalise, ModeloAnalise
 from .services import AnalyserService
-from integrations.sharepoint import SharePoint
+from . import fila
+from .cache_respostas import invalidar_respostas
+from integrations.sharepoint import obter_sharepoint
+from integrations.espelho import espelho_atualizado
+from integrations.arvore import varrer_arvore
+from integrations.models import DriveItem
 from clientes.models import Cliente  # ✅ CORRIGIDO
 from produtos.models import Produto  # ✅ CORRIGIDO
 from campos_custom.models import CampoPersonalizado
@@ -20,6 +26,18 @@ from django.contrib import messages
 logger = logging.getLogger(__name__)
 
 
+def _listar_pasta(sp, folder_id):
+    """
+    Itens de uma pasta para o seletor de arquivos: do espelho local quando ele
+    está em dia e já conhece a pasta (uma pasta recém-criada pode ainda não
+    ter chegado pelo delta), senão direto do SharePoint.
+    """
+    if (folder_id != sp.RAIZ and espelho_atualizado(sp)
+            and DriveItem.objects.filter(item_id=folder_id, eh_pasta=True).exists()):
+        return [item.como_item() for item in DriveItem.objects.filter(parent_id=folder_id).order_by('-eh_pasta', 'nome')]
+    return sp.listar_arquivos_pasta(folder_id)
+
+
 @login_required
 @require_http_methods(["GET"])
 def selecionar_arquivos(request, caso_id):
@@ -28,11 +46,11 @@ def selecionar_arquivos(request, caso_id):
     modelos = ModeloAnalise.objects.filter(ativo=True)
     
     try:
-        sp = SharePoint()
-        # Lista arquivos da RAIZ do SharePoint
-        itens = sp.listar_arquivos_pasta_raiz()
+        sp = obter_sharepoint()
+        # Começa pela pasta do caso (ou pela raiz, se o caso ainda não tiver pasta)
+        itens = _listar_pasta(sp, caso.sharepoint_folder_id or sp.RAIZ)
         
-        logger.info(f"📁 Encontrados {len(itens)} itens na raiz para o caso #{caso.id}")
+        logger.info(f"📁 Encontrados {len(itens)} itens para o caso #{caso.id}")
         
     except Exception as e:
         logger.error(f"Erro ao listar arquivos do caso: {e}", exc_info=True)
@@ -53,13 +71,44 @@ def carregar_arquivos_navegacao(request, caso_id):
     folder_id = request.GET.get('folder_id')
     caso = get_object_or_404(Caso, id=caso_id)
     
-    sp = SharePoint()
-    itens = sp.listar_arquivos_pasta(folder_id) if folder_id else sp.listar_arquivos_pasta_raiz()
+    sp = obter_sharepoint()
+    itens = _listar_pasta(sp, folder_id or caso.sharepoint_folder_id or sp.RAIZ)
     
     context = {'itens': itens, 'caso': caso}
     return render(request, 'analyser/partials/_file_grid.html', context)
 
 
+@login_required
+@require_http_methods(["GET"])
+def carregar_arvore_caso(request, caso_id):
+    """
+    HTMX - Todos os arquivos da pasta do caso (subpastas incluídas) numa só
+    lista. Com ?formato=json, devolve a árvore achatada em JSON.
+    """
+    caso = get_object_or_404(Caso, id=caso_id)
+    if not caso.sharepoint_folder_id:
+        return render(request, 'analyser/partials/_file_grid.html', {'itens': [], 'caso': caso})
+
+    try:
+        arvore = varrer_arvore(caso.sharepoint_folder_id)
+    except Exception as e:
+        logger.error(f"Erro ao varrer a pasta do caso #{caso.id}: {e}", exc_info=True)
+        if request.GET.get('formato') == 'json':
+            return JsonResponse({'success': False, 'mensagem': str(e)}, status=502)
+        return render(request, 'analyser/partials/_file_grid.html', {'itens': [], 'caso': caso})
+
+    if request.GET.get('formato') == 'json':
+        return JsonResponse({'success': True, **arvore})
+
+    context = {
+        'caso': caso,
+        'itens': arvore['itens'],
+        'truncada': arvore['truncada'],
+        'total_pdfs': sum(1 for item in arvore['itens'] if 'pdf' in (item.get('mimeType') or '')),
+    }
+    return render(request, 'analyser/partials/_file_tree.html', context)
+
+
 @login_required
 @require_http_methods(["POST"])
 def iniciar_analise(request, caso_id):
@@ -76,41 +125,54 @@ def iniciar_analise(request, caso_id):
         })
     
     modelo = get_object_or_404(ModeloAnalise, id=modelo_id)
-    sp = SharePoint()
+
+    try:
+        fila.verificar_limite_usuario(request.user)
+    except fila.LimiteAnalisesExcedido as e:
+        messages.warning(request, f"⚠️ {e}")
+        return redirect('analyser:selecionar_arquivos', caso_id=caso.id)
+
+    sp = obter_sharepoint()
     
-    # Prepara informações dos arquivos
+    # Prepara informações dos arquivos (nome e tipo vêm do espelho, quando houver)
+    espelhados = DriveItem.objects.in_bulk(arquivos_ids, field_name='item_id')
     arquivos_info = []
     for arquivo_id in arquivos_ids:
-        item = sp.get_item_details(arquivo_id)
+        item = espelhados[arquivo_id].como_item() if arquivo_id in espelhados else sp.get_item_details(arquivo_id)
         arquivos_info.append({
             'id': arquivo_id,
             'name': item.get('name', 'desconhecido'),
             'type': item.get('file', {}).get('mimeType', 'application/pdf'),
         })
     
-    # Cria resultado de análise
-    resultado = ResultadoAnalise.objects.create(
-        caso=caso,
-        modelo_usado=modelo,
-        arquivos_analisados=arquivos_info,
-        status='PROCESSANDO',
-        criado_por=request.user
-    )
-    
-    # Inicia análise em background
-    try:
-        service = AnalyserService(caso, modelo, arquivos_info, request.user, resultado.id)
-        service.executar_analise()
-    except Exception as e:
-        logger.error(f"Erro ao iniciar análise: {e}")
-        resultado.status = 'ERRO'
-        resultado.mensagem_erro = str(e)
-        resultado.save()
+    # Cria o resultado e o coloca na fila; a análise roda num worker do Celery
+    # (fila 'analises') e o progresso chega à página pelo WebSocket
+    with transaction.atomic():
+        resultado = ResultadoAnalise.objects.create(
+            caso=caso,
+            modelo_usado=modelo,
+            arquivos_analisados=arquivos_info,
+            status='NA_FILA',
+            criado_por=request.user
+        )
+        fila.enfileirar_analise(resultado)
     
     # Redireciona para resultado
     return redirect('analyser:resultado_analise', resultado_id=resultado.id)
 
 
+@login_required
+@require_http_methods(["POST"])
+def cancelar_analise(request, resultado_id):
+    """Cancela uma análise na fila ou em execução."""
+    resultado = get_object_or_404(ResultadoAnalise, id=resultado_id)
+    if resultado.criado_por_id != request.user.id and not request.user.is_staff:
+        return JsonResponse({'success': False, 'error': 'Só quem iniciou a análise pode cancelá-la.'}, status=403)
+    if not fila.cancelar_analise(resultado):
+        return JsonResponse({'success': False, 'error': 'A análise já terminou.'}, status=400)
+    return JsonResponse({'success': True, 'message': '🛑 Cancelamento solicitado.'})
+
+
 @login_required
 @require_http_methods(["GET"])
 def resultado_analise(request, resultado_id):
@@ -121,6 +183,7 @@ def resultado_analise(request, resultado_id):
     context = {
         'resultado': resultado,
         'caso': caso,
+        'posicao_na_fila': fila.posicao_na_fila(resultado),
     }
     return render(request, 'analyser/resultado_analise.html', context)
 
@@ -254,6 +317,16 @@ def deletar_modelo(request, pk):
     return redirect('analyser:listar_modelos')
 
 
+@login_required
+@require_http_methods(["POST"])
+def limpar_cache_modelo(request, pk):
+    """Apaga as respostas da IA em cache do modelo (as próximas análises consultam o Gemini de novo)."""
+    modelo = get_object_or_404(ModeloAnalise, id=pk)
+    removidas = invalidar_respostas(modelo)
+    messages.success(request, f"🧹 {removidas} resposta(s) em cache removida(s) do modelo '{modelo.nome}'.")
+    return redirect('analyser:listar_modelos')
+
+
 @login_required
 @require_http_methods(["GET"])
 def ajax_buscar_campos(request):
@@ -345,33 +418,19 @@ def debug_pasta_caso(request, caso_id):
     caso = get_object_or_404(Caso, id=caso_id)
     
     try:
-        sp = SharePoint()
+        sp = obter_sharepoint()
         nome_pasta = f"Caso #{caso.id}"
         
-        # Lista a raiz
+        # Cabeçalho do debug
         print(f"\n{'='*60}")
         print(f"🔍 DEBUGANDO PASTA DO CASO #{caso.id}")
         print(f"{'='*60}\n")
         
-        itens_raiz = sp.listar_arquivos_pasta_raiz()
-        print(f"📁 Itens na RAIZ: {len(itens_raiz)}\n")
-        
-        for item in itens_raiz:
-            eh_pasta = bool(item.get('folder'))
-            print(f"   - {item['name']}")
-            print(f"     ID: {item['id']}")
-            print(f"     É pasta: {eh_pasta}")
-            print(f"     Tamanho: {item.get('size', 0)} bytes\n")
-            
-            logger.info(f"   - {item['name']} (ID: {item['id']}, É pasta: {eh_pasta})")
-        
-        # Tenta encontrar a pasta do caso
-        pasta_encontrada = None
-        for item in itens_raiz:
-            if item['name'].lower() == nome_pasta.lower() and item.get('folder'):
-                pasta_encontrada = item
-                break
-        
+        # Endereça a pasta direto pelo caminho (não depende do tamanho da raiz)
+        pasta_encontrada = sp.buscar_arquivo_por_nome(nome_pasta)
+        if pasta_encontrada and not pasta_encontrada.get('folder'):
+            pasta_encontrada = None
+
         if pasta_encontrada:
             print(f"✅ Pasta '{nome_pasta}' encontrada!")
             print(f"   ID: {pasta_encontrada['id']}\n")
@@ -395,18 +454,16 @@ def debug_pasta_caso(request, caso_id):
                 'arquivos': itens_caso
             })
         else:
-            pastas_disponiveis = [item['name'] for item in itens_raiz if item.get('folder')]
             print(f"❌ Pasta '{nome_pasta}' NÃO encontrada na raiz!")
-            print(f"   Pastas disponíveis: {pastas_disponiveis}\n")
+            print(f"   Pasta vinculada ao caso: {caso.sharepoint_folder_id}\n")
             print(f"{'='*60}\n")
             
             logger.warning(f"❌ Pasta '{nome_pasta}' NÃO encontrada na raiz")
-            logger.info(f"Pastas disponíveis: {pastas_disponiveis}")
             
             return JsonResponse({
                 'status': 'ERRO',
                 'mensagem': f"Pasta '{nome_pasta}' não encontrada",
-                'pastas_na_raiz': pastas_disponiveis,
+                'pasta_vinculada_ao_caso': caso.sharepoint_folder_id,
                 'procurando_por': nome_pasta
             }, status=404)
     
@@ -1,7 +1,7 @@
 # casos/folder_utils.py
 
 from pastas.models import EstruturaPasta
-from integrations.sharepoint import SharePoint
+from integrations.sharepoint import obter_sharepoint
 
 def recriar_estrutura_de_pastas(caso_instance):
     """
@@ -29,7 +29,7 @@ def recriar_estrutura_de_pastas(caso_instance):
 
     # 2. Conecta ao SharePoint e cria as pastas
     try:
-        sp = SharePoint()
+        sp = obter_sharepoint()
         
         # Cria a pasta principal (ex: "29")
         nome_pasta_caso = str(caso_instance.id)
@@ -39,9 +39,11 @@ def recriar_estrutura_de_pastas(caso_instance):
         caso_instance.sharepoint_folder_id = folder_id
         caso_instance.save(update_fields=['sharepoint_folder_id'])
         
-        # Cria as subpastas
-        for pasta in pastas_a_criar:
-            sp.criar_subpasta(folder_id, pasta.nome)
+        # Cria as subpastas em lote ($batch) - uma única ida ao Graph
+        resultados = sp.criar_subpastas_em_lote(folder_id, [pasta.nome for pasta in pastas_a_criar])
+        for resultado in resultados:
+            if not resultado['ok']:
+                print(f"AVISO: subpasta '{resultado['nome']}' não foi criada: {resultado['erro']}")
         
         print("Processo de criação de pastas no SharePoint concluído com sucesso!")
         return folder_id # Retorna o ID da nova pasta raiz
@@ -7,6 +7,7 @@ from clientes.models import Cliente
 from produtos.models import Produto
 from casos.models import Caso
 from campos_custom.models import CampoPersonalizado, ValorCampoPersonalizado
+from workflow.em_massa import efeitos_em_massa
 
 class Command(BaseCommand):
     help = 'Importa casos do produto Tokio RCG a partir de uma planilha Excel.'
@@ -48,47 +49,50 @@ class Command(BaseCommand):
             if nome_variavel not in colunas_planilha:
                 self.stdout.write(self.style.WARNING(f"  -> Aviso: A coluna para a variável '{nome_variavel}' não foi encontrada na planilha. Ela será ignorada."))
 
-        for index, row in df.iterrows():
-            self.stdout.write(f"\nProcessando linha {index + 2} da planilha...")
+        # Os gatilhos de criação rodam em lote ao sair do bloco
+        with efeitos_em_massa():
+            for index, row in df.iterrows():
+                self.stdout.write(f"\nProcessando linha {index + 2} da planilha...")
 
-            # --- Cria o objeto Caso com os dados padrão ---
-            # Usamos .get() para evitar erros se uma coluna não existir
-            novo_caso = Caso(
-                cliente=cliente_tokio,
-                produto=produto_rcg,
-                data_entrada=row.get('data_entrada'),
-                status=row.get('status'),
-                titulo=row.get('titulo')
-                # Adicione outros campos padrão do Caso aqui, se houver
-            )
+                # --- Cria o objeto Caso com os dados padrão ---
+                # Usamos .get() para evitar erros se uma coluna não existir
+                novo_caso = Caso(
+                    cliente=cliente_tokio,
+                    produto=produto_rcg,
+                    data_entrada=row.get('data_entrada'),
+                    status=row.get('status'),
+                    titulo=row.get('titulo')
+                    # Adicione outros campos padrão do Caso aqui, se houver
+                )
             
-            # SALVAR O CASO AQUI DISPARA OS SIGNALS (SharePoint, E-mail)!
-            novo_caso.save()
-            self.stdout.write(self.style.SUCCESS(f"  -> Caso #{novo_caso.id} criado. Signals disparados."))
+                # Dentro de efeitos_em_massa os gatilhos (workflow, SharePoint, e-mail, n8n)
+                # ficam para o fim da importação e rodam uma vez para todos os casos
+                novo_caso.save()
+                self.stdout.write(self.style.SUCCESS(f"  -> Caso #{novo_caso.id} criado."))
 
-            # ==============================================================================
-            # A LÓGICA PARA SALVAR OS DADOS ADICIONAIS ESTÁ AQUI
-            # ==============================================================================
-            valores_criados_count = 0
-            # 3. Iteramos sobre o nosso dicionário de campos da biblioteca
-            for nome_variavel, campo_obj in campos_dict.items():
+                # ==============================================================================
+                # A LÓGICA PARA SALVAR OS DADOS ADICIONAIS ESTÁ AQUI
+                # ==============================================================================
+                valores_criados_count = 0
+                # 3. Iteramos sobre o nosso dicionário de campos da biblioteca
+                for nome_variavel, campo_obj in campos_dict.items():
                 
-                # 4. Verificamos se a planilha tem uma coluna com este nome de variável
-                #    e se o valor nessa linha não está vazio (pd.notna).
-                if nome_variavel in row and pd.notna(row[nome_variavel]):
-                    valor_da_planilha = row[nome_variavel]
+                    # 4. Verificamos se a planilha tem uma coluna com este nome de variável
+                    #    e se o valor nessa linha não está vazio (pd.notna).
+                    if nome_variavel in row and pd.notna(row[nome_variavel]):
+                        valor_da_planilha = row[nome_variavel]
                     
-                    # 5. Criamos o objeto ValorCampoPersonalizado, ligando-o ao novo caso e ao campo
-                    ValorCampoPersonalizado.objects.create(
-                        caso=novo_caso,
-                        campo=campo_obj,
-                        valor=str(valor_da_planilha) # Salvamos tudo como string, como o modelo espera
-                    )
-                    valores_criados_count += 1
+                        # 5. Criamos o objeto ValorCampoPersonalizado, ligando-o ao novo caso e ao campo
+                        ValorCampoPersonalizado.objects.create(
+                            caso=novo_caso,
+                            campo=campo_obj,
+                            valor=str(valor_da_planilha) # Salvamos tudo como string, como o modelo espera
+                        )
+                        valores_criados_count += 1
             
-            if valores_criados_count > 0:
-                self.stdout.write(f"    -> {valores_criados_count} valor(es) de campos personalizados foram salvos para este caso.")
-            else:
-                self.stdout.write(self.style.WARNING("    -> Nenhum valor de campo personalizado encontrado nesta linha da planilha."))
+                if valores_criados_count > 0:
+                    self.stdout.write(f"    -> {valores_criados_count} valor(es) de campos personalizados foram salvos para este caso.")
+                else:
+                    self.stdout.write(self.style.WARNING("    -> Nenhum valor de campo personalizado encontrado nesta linha da planilha."))
 
         self.stdout.write(self.style.SUCCESS("\nImportação concluída com sucesso!"))
\ No newline at end of file
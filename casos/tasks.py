@@ -11,6 +11,7 @@ try:
     from clientes.models import Cliente
     from produtos.models import Produto
     from campos_custom.models import CampoPersonalizado, ValorCampoPersonalizado, EstruturaDeCampos
+    from workflow.em_massa import efeitos_em_massa
 except ImportError as e:
     # Log de erro crítico se os modelos não puderem ser importados
     initial_logger = logging.getLogger(__name__)
@@ -218,4 +219,39 @@ def processar_linha_importacao(
     except Exception as e: # Captura qualquer outro erro inesperado
         logger.error(f"{log_prefix} Erro INESPERADO durante processamento: {e}", exc_info=True)
         # Re-raise para marcar a tarefa como falha
-        raise e
\ No newline at end of file
+        raise e
+
+
+@shared_task(bind=True)
+def processar_lote_importacao(
+    self,
+    linhas,                   # Lista de dicionários de linha (mesmo formato de processar_linha_importacao)
+    cliente_id,
+    produto_id,
+    header_map,
+    chaves_validas_list,
+    campos_meta_map_serializable,
+    padrao_titulo_produto,
+    estrutura_campos_id
+    ):
+    """
+    Processa um lote de linhas da planilha. Os gatilhos de criação dos casos
+    (workflow, pastas, e-mail, n8n) rodam uma vez para o lote inteiro no fim,
+    em vez de caso a caso (ver workflow/em_massa.py).
+    """
+    log_prefix = f"[CELERY Task {self.request.id} - Lote de {len(linhas)} linhas]"
+    logger.info(f"{log_prefix} Iniciando processamento.")
+    resultados = []
+    with efeitos_em_massa():
+        for linha_dados in linhas:
+            try:
+                # Chamada direta: roda aqui mesmo, sem virar outra tarefa
+                resultados.append(processar_linha_importacao(
+                    linha_dados, cliente_id, produto_id, header_map, chaves_validas_list,
+                    campos_meta_map_serializable, padrao_titulo_produto, estrutura_campos_id
+                ))
+            except Exception as e:
+                # Uma linha com erro não impede as demais
+                resultados.append(f"Linha {linha_dados.get('_row_index', 'desconhecida')} falhou: {e}")
+    logger.info(f"{log_prefix} Lote concluído.")
+    return resultados
@@ -77,10 +77,12 @@ urlpatterns = [
     path('<int:pk>/anexos/painel/', views.carregar_painel_anexos, name='carregar_painel_anexos'),
     path('<int:caso_pk>/anexos/upload/', views.upload_arquivo_sharepoint, name='upload_arquivo_sharepoint'),
     path('<int:caso_pk>/anexos/baixar/<str:arquivo_id>/', views.baixar_arquivo_sharepoint, name='baixar_arquivo_sharepoint'),
+    path('<int:caso_pk>/anexos/baixar-zip/', views.baixar_pasta_zip, name='baixar_pasta_zip'),
     path('<int:caso_pk>/anexos/deletar/', views.deletar_arquivo_sharepoint, name='deletar_arquivo_sharepoint'),
     path('<int:caso_pk>/anexos/criar-pasta/', views.criar_pasta_sharepoint, name='criar_pasta_sharepoint'),
     path('pasta/<str:folder_id>/conteudo/', views.carregar_conteudo_pasta, name='carregar_conteudo_pasta'),
     path('anexo/preview/<str:item_id>/', views.preview_anexo, name='preview_anexo'),
+    path('anexo/miniatura/<str:item_id>/', views.miniatura_anexo, name='miniatura_anexo'),
     path('anexo/excluir/<str:item_id>/', views.excluir_anexo_sharepoint, name='excluir_anexo_sharepoint'),
     path('<int:pk>/anexos/recriar-pastas/', views.recriar_pastas_sharepoint, name='recriar_pastas_sharepoint'),
 
@@ -3,24 +3,32 @@
 # Sistema de Gestão de Casos - Views Principais
 # ==============================================================================
 
+import itertools
+import json
 import logging
 import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from decimal import Decimal, InvalidOperation
 from datetime import datetime, timedelta, date
 from dateutil.relativedelta import relativedelta
 from django.db.models import ProtectedError
 
-from django.shortcuts import render, redirect, get_object_or_404
+from asgiref.sync import sync_to_async
+from django.shortcuts import render, redirect, get_object_or_404, aget_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import get_user_model
 from django.contrib import messages
 from django.urls import reverse, reverse_lazy
-from django.db.models import Sum, Q 
+from django.db.models import Sum, Q, Count
 from django.views.decorators.http import require_POST
 from django.forms import formset_factory
+from django.conf import settings
 from django.db import transaction
-from django.http import JsonResponse, HttpResponse, FileResponse
+from django.http import JsonResponse, HttpResponse, FileResponse, StreamingHttpResponse
+from django.template.loader import get_template
 from django.utils import timezone
+from django.utils.http import content_disposition_header
+from django.core.handlers.asgi import ASGIRequest
 from django.core.paginator import Paginator
 from django.views.generic import ListView, CreateView, UpdateView, DeleteView, DetailView
 from io import BytesIO
@@ -43,7 +51,14 @@ from campos_custom.models import (
     ValorCampoPersonalizado,
     OpcoesListaPersonalizada
 )
-from integrations.sharepoint import SharePoint
+from integrations.sharepoint import obter_sharepoint
+from integrations.sharepoint_async import obter_sharepoint_async
+from integrations.miniaturas import obter_servico_miniaturas
+from integrations.espelho import espelho_atualizado
+from integrations.arvore import varrer_arvore
+from integrations.zip_pasta import gerar_zip
+from integrations.blobs import obter_cache_blobs
+from integrations.backends import etag_confere
 
 # --- Imports Locais (do app 'casos') ---
 from .models import (
@@ -95,6 +110,9 @@ from reportlab.lib.units import inch
 logger = logging.getLogger('casos_app')
 User = get_user_model()
 
+# Máximo de arquivos enviados ao SharePoint ao mesmo tempo por requisição
+UPLOADS_SIMULTANEOS = 4
+
 def normalize_currency_input(value):
     if value is None:
         return ''
@@ -173,9 +191,9 @@ except ImportError:
         return ([], [], {})
 
 try:
-    from .tasks import processar_linha_importacao
+    from .tasks import processar_lote_importacao
 except ImportError:
-    def processar_linha_importacao(*args, **kwargs):
+    def processar_lote_importacao(*args, **kwargs):
         logger.critical("Tarefa Celery não encontrada!")
 
 # ==============================================================================
@@ -1020,15 +1038,19 @@ def editar_caso(request, pk):
 
 @login_required
 def lista_casos(request):
+    # Contagem de anexos pelo espelho local do drive (sem chamadas ao Graph)
     casos_list = Caso.objects.select_related(
         'cliente', 'produto', 'advogado_responsavel'
-    ).all().order_by('-id')
+    ).annotate(
+        total_anexos=Count('itens_drive', filter=Q(itens_drive__eh_pasta=False))
+    ).order_by('-id')
     
     filtro_titulo = request.GET.get('filtro_titulo', '')
     filtro_cliente = request.GET.get('filtro_cliente', '')
     filtro_produto = request.GET.get('filtro_produto', '')
     filtro_status = request.GET.get('filtro_status', '')
     filtro_advogado = request.GET.get('filtro_advogado', '')
+    filtro_documentos = request.GET.get('filtro_documentos', '')
 
     if filtro_titulo:
         casos_list = casos_list.filter(titulo__icontains=filtro_titulo)
@@ -1040,6 +1062,10 @@ def lista_casos(request):
         casos_list = casos_list.filter(status=filtro_status)
     if filtro_advogado:
         casos_list = casos_list.filter(advogado_responsavel_id=filtro_advogado)
+    if filtro_documentos == 'SEM':
+        casos_list = casos_list.filter(total_anexos=0)
+    elif filtro_documentos == 'COM':
+        casos_list = casos_list.filter(total_anexos__gt=0)
 
     paginator = Paginator(casos_list, 20)
     page = request.GET.get('page')
@@ -1296,6 +1322,71 @@ def exportar_andamentos_excel(request, pk):
 # ==============================================================================
 # SHAREPOINT & ANEXOS
 # ==============================================================================
+def _conteudo_streaming(request, iterador):
+    """
+    Conteúdo para StreamingHttpResponse que sai em partes também sob ASGI.
+
+    No ASGI (Daphne) o Django consome um iterador síncrono com
+    sync_to_async(list), ou seja, monta a resposta inteira antes do primeiro
+    byte. Aqui cada parte é puxada numa thread (sync_to_async(next)) e o
+    iterador é fechado se o cliente desconectar. No WSGI vai o iterador como está.
+    """
+    if not isinstance(request, ASGIRequest):
+        return iterador
+
+    async def repassar():
+        partes = iter(iterador)
+        proxima = sync_to_async(next)
+        fim = object()
+        try:
+            while True:
+                parte = await proxima(partes, fim)
+                if parte is fim:
+                    break
+                yield parte
+        finally:
+            # Cliente desconectado (CancelledError) ou fim normal: libera downloads/conexões
+            if hasattr(partes, 'close'):
+                await sync_to_async(partes.close)()
+
+    return repassar()
+
+
+def _ler_em_blocos(arquivo, tamanho_bloco):
+    """Lê o arquivo em blocos e o fecha no fim (ou quando o gerador é fechado)."""
+    with arquivo:
+        while bloco := arquivo.read(tamanho_bloco):
+            yield bloco
+
+
+def _painel_anexos_streaming(request, context, itens):
+    """
+    Renderiza o painel de anexos em partes: cabeçalho, um bloco por item
+    (conforme as páginas do Graph chegam) e rodapé.
+    """
+    itens = iter(itens)
+    # Busca a primeira página antes de abrir a resposta, para que erros de
+    # conexão ainda caiam no tratamento de erro da view.
+    primeiro = next(itens, None)
+
+    template_item = get_template('casos/partials/anexo_item.html')
+    contexto_item = {
+        'caso': context['caso'],
+        'root_folder_id': context['root_folder_id'],
+    }
+
+    def gerar():
+        yield get_template('casos/partials/painel_anexos_topo.html').render(context, request)
+        if primeiro is None:
+            yield get_template('casos/partials/anexos_pasta_vazia.html').render(context, request)
+        else:
+            for item in itertools.chain([primeiro], itens):
+                yield template_item.render({**contexto_item, 'item': item})
+        yield get_template('casos/partials/painel_anexos_rodape.html').render(context, request)
+
+    return StreamingHttpResponse(_conteudo_streaming(request, gerar()), content_type='text/html; charset=utf-8')
+
+
 @login_required
 def carregar_painel_anexos(request, pk):
     caso = get_object_or_404(Caso, pk=pk)
@@ -1305,19 +1396,19 @@ def carregar_painel_anexos(request, pk):
         return render(request, 'casos/partials/painel_anexos_criar.html', {'caso': caso})
 
     try:
-        sp = SharePoint()
-        itens = sp.listar_conteudo_pasta(caso.sharepoint_folder_id)
+        sp = obter_sharepoint()
         context = {
             'caso': caso,
-            'itens': itens,
             'folder_id': caso.sharepoint_folder_id,
             'root_folder_id': caso.sharepoint_folder_id,
             'folder_name': f"Caso #{caso.id}",
             'modo': modo
         }
         if modo == 'analyser':
+            context['itens'] = sp.cache_pastas.listar(caso.sharepoint_folder_id)
             return render(request, 'casos/partials/painel_anexos_analyser.html', context)
-        return render(request, 'casos/partials/painel_anexos.html', context)
+        itens = sp.cache_pastas.iterar(caso.sharepoint_folder_id)
+        return _painel_anexos_streaming(request, context, itens)
     except Exception as e:
         logger.error(f"Erro ao carregar anexos: {e}", exc_info=True)
         return render(request, 'casos/partials/painel_anexos_erro.html', {
@@ -1337,7 +1428,7 @@ def carregar_painel_analyser(request, pk):
 def criar_pasta_para_caso(request, pk):
     caso = get_object_or_404(Caso, pk=pk)
     try:
-        sp = SharePoint()
+        sp = obter_sharepoint()
         nome_pasta_caso = str(caso.id)
         pasta_caso_id = sp.criar_pasta_caso(nome_pasta_caso)
         caso.sharepoint_folder_id = pasta_caso_id
@@ -1357,7 +1448,7 @@ def recriar_pastas_sharepoint(request, pk):
         caso.sharepoint_folder_id = None
         caso.save(update_fields=['sharepoint_folder_id'])
         folder_id = recriar_estrutura_de_pastas(caso)
-        sp = SharePoint()
+        sp = obter_sharepoint()
         conteudo = sp.listar_conteudo_pasta(folder_id)
         context = {
             'caso': caso,
@@ -1374,19 +1465,139 @@ def recriar_pastas_sharepoint(request, pk):
 def baixar_arquivo_sharepoint(request, caso_pk, arquivo_id):
     caso = get_object_or_404(Caso, pk=caso_pk)
     try:
-        sp = SharePoint()
-        conteudo = sp.baixar_arquivo(arquivo_id)
-        info = sp.obter_info_arquivo(arquivo_id)
-        nome = info.get('name', 'arquivo')
+        sp = obter_sharepoint()
+        blobs = obter_cache_blobs()
+        range_header = request.headers.get('Range')
+        if_none_match = request.headers.get('If-None-Match')
+
+        if not range_header:
+            # Versão já em disco: responde sem falar com o SharePoint
+            info = blobs.detalhes_atuais(arquivo_id)
+            objeto = blobs.localizar(arquivo_id, blobs.versao(info))
+            if objeto is not None:
+                if etag_confere(if_none_match, info.get('eTag')):
+                    response = HttpResponse(status=304)
+                    response['ETag'] = info['eTag']
+                    return response
+                tipo = (info.get('file') or {}).get('mimeType') or 'application/octet-stream'
+                arquivo = open(objeto, 'rb')
+                response = FileResponse(arquivo, as_attachment=True,
+                                        filename=info.get('name', 'arquivo'), content_type=tipo)
+                if isinstance(request, ASGIRequest):
+                    # FileResponse também seria juntado inteiro na memória sob ASGI
+                    response.streaming_content = _conteudo_streaming(
+                        request, _ler_em_blocos(arquivo, sp.TAMANHO_BLOCO_DOWNLOAD)
+                    )
+                response['Accept-Ranges'] = 'bytes'
+                if info.get('eTag'):
+                    response['ETag'] = info['eTag']
+                return response
+
+        info, upstream = sp.abrir_download(arquivo_id, range_header=range_header, if_none_match=if_none_match)
+
+        if upstream is None:
+            response = HttpResponse(status=304)
+            response['ETag'] = info['eTag']
+            return response
 
-        response = HttpResponse(conteudo, content_type='application/octet-stream')
-        response['Content-Disposition'] = f'attachment; filename="{nome}"'
+        # O arquivo inteiro é guardado no cache de blobs enquanto é repassado
+        gravacao = blobs.gravador(arquivo_id, blobs.versao(info)) if upstream.status_code == 200 and not range_header else None
+
+        def repassar_conteudo():
+            # Repassa o arquivo em blocos, sem carregá-lo inteiro na memória
+            nonlocal gravacao
+            try:
+                for bloco in upstream.iter_content(chunk_size=sp.TAMANHO_BLOCO_DOWNLOAD):
+                    if gravacao is not None:
+                        gravacao.write(bloco)
+                    yield bloco
+                if gravacao is not None:
+                    gravacao.concluir()
+                    gravacao = None
+            finally:
+                upstream.close()
+                if gravacao is not None:
+                    gravacao.descartar()  # Cliente desistiu no meio: o parcial não serve
+
+        nome = info.get('name', 'arquivo')
+        tipo = (info.get('file') or {}).get('mimeType') or 'application/octet-stream'
+        response = StreamingHttpResponse(_conteudo_streaming(request, repassar_conteudo()),
+                                         status=upstream.status_code, content_type=tipo)
+        response['Content-Disposition'] = content_disposition_header(True, nome)
+        response['Accept-Ranges'] = 'bytes'
+        for cabecalho in ('Content-Length', 'Content-Range'):
+            if cabecalho in upstream.headers:
+                response[cabecalho] = upstream.headers[cabecalho]
+        if info.get('eTag'):
+            response['ETag'] = info['eTag']
         return response
     except Exception as e:
         logger.error(f"Erro no download: {e}", exc_info=True)
         messages.error(request, f"Erro ao baixar: {str(e)}")
         return redirect('casos:detalhe_caso', pk=caso_pk)
 
+@login_required
+def baixar_pasta_zip(request, caso_pk):
+    """
+    Baixa toda a pasta do caso (com subpastas) num ZIP gerado em streaming.
+    Inclui manifesto.json com os dados do caso e o fluxo interno, a menos que
+    seja pedido ?manifesto=0.
+    """
+    caso = get_object_or_404(Caso.objects.select_related('cliente', 'produto', 'advogado_responsavel'), pk=caso_pk)
+    if not caso.sharepoint_folder_id:
+        messages.error(request, "Este caso ainda não tem pasta de documentos.")
+        return redirect('casos:detalhe_caso', pk=caso_pk)
+
+    try:
+        sp = obter_sharepoint()
+        arvore = varrer_arvore(caso.sharepoint_folder_id, sp=sp)
+    except Exception as e:
+        logger.error(f"Erro ao listar a pasta do caso #{caso.pk} para o ZIP: {e}", exc_info=True)
+        messages.error(request, f"Erro ao preparar o ZIP: {str(e)}")
+        return redirect('casos:detalhe_caso', pk=caso_pk)
+
+    extras = []
+    if request.GET.get('manifesto') != '0':
+        extras.append(('manifesto.json', _manifesto_caso(caso, arvore).encode('utf-8')))
+
+    response = StreamingHttpResponse(_conteudo_streaming(request, gerar_zip(sp, arvore['itens'], extras)),
+                                     content_type='application/zip')
+    response['Content-Disposition'] = content_disposition_header(True, f"Caso_{caso.pk:05d}.zip")
+    return response
+
+
+def _manifesto_caso(caso, arvore):
+    """JSON com os dados do caso, o fluxo interno e a lista de arquivos do ZIP."""
+    advogado = caso.advogado_responsavel
+    manifesto = {
+        'gerado_em': timezone.now().isoformat(),
+        'caso': {
+            'id': caso.pk,
+            'titulo': caso.titulo,
+            'cliente': caso.cliente.nome if caso.cliente else None,
+            'produto': caso.produto.nome if caso.produto else None,
+            'status': caso.get_status_display(),
+            'data_entrada': caso.data_entrada,
+            'advogado_responsavel': (advogado.get_full_name() or advogado.username) if advogado else None,
+            'sharepoint_folder_id': caso.sharepoint_folder_id,
+        },
+        'fluxo_interno': [
+            {
+                'data': evento.data_evento,
+                'tipo': evento.get_tipo_evento_display(),
+                'descricao': evento.descricao,
+                'autor': (evento.autor.get_full_name() or evento.autor.username) if evento.autor else None,
+            }
+            for evento in caso.fluxo_interno.select_related('autor')
+        ],
+        'arquivos': [
+            {'caminho': item['caminho'], 'tamanho': item.get('size'), 'modificado_em': item.get('lastModifiedDateTime')}
+            for item in arvore['itens'] if not item.get('folder')
+        ],
+        'arvore_truncada': arvore['truncada'],
+    }
+    return json.dumps(manifesto, ensure_ascii=False, indent=2, default=str)
+
 @login_required
 def deletar_arquivo_sharepoint(request, caso_pk):
     caso = get_object_or_404(Caso, pk=caso_pk)
@@ -1396,7 +1607,7 @@ def deletar_arquivo_sharepoint(request, caso_pk):
         return JsonResponse({'error': 'ID do arquivo nao fornecido'}, status=400)
 
     try:
-        sp = SharePoint()
+        sp = obter_sharepoint()
         sp.excluir_item(arquivo_id)
         return carregar_painel_anexos(request, caso_pk)
     except Exception as e:
@@ -1418,7 +1629,7 @@ def criar_pasta_sharepoint(request, caso_pk):
         if not nome_pasta:
             return JsonResponse({'error': 'Nome obrigatorio'}, status=400)
 
-        sp = SharePoint()
+        sp = obter_sharepoint()
         sp.criar_subpasta(caso.sharepoint_folder_id, nome_pasta)
         return carregar_painel_anexos(request, caso_pk)
     except Exception as e:
@@ -1429,17 +1640,17 @@ def criar_pasta_sharepoint(request, caso_pk):
         })
 
 @login_required
-def carregar_conteudo_pasta(request, folder_id):
+async def carregar_conteudo_pasta(request, folder_id):
     caso_pk = request.GET.get('caso_pk')
     root_folder_id = request.GET.get('root_folder_id', folder_id)
     modo = request.GET.get('modo', 'anexos')
 
-    caso = get_object_or_404(Caso, pk=caso_pk) if caso_pk else None
+    caso = await aget_object_or_404(Caso, pk=caso_pk) if caso_pk else None
 
     try:
-        sp = SharePoint()
-        folder_details = sp.get_item_details(folder_id)
-        itens = sp.listar_conteudo_pasta(folder_id)
+        # Detalhes da pasta e conteúdo são buscados ao mesmo tempo
+        async with obter_sharepoint_async(isinstance(request, ASGIRequest)) as sp:
+            folder_details, itens = await sp.detalhes_e_conteudo(folder_id)
 
         context = {
             'caso': caso,
@@ -1451,9 +1662,8 @@ def carregar_conteudo_pasta(request, folder_id):
             'modo': modo
         }
 
-        if modo == 'analyser':
-            return render(request, 'casos/partials/painel_anexos_analyser.html', context)
-        return render(request, 'casos/partials/painel_anexos.html', context)
+        template = 'casos/partials/painel_anexos_analyser.html' if modo == 'analyser' else 'casos/partials/painel_anexos.html'
+        return await sync_to_async(render)(request, template, context)
     except Exception as e:
         logger.error(f"Erro ao carregar pasta: {e}", exc_info=True)
         return HttpResponse(f"<div class='alert alert-danger'>Erro: {e}</div>")
@@ -1461,17 +1671,38 @@ def carregar_conteudo_pasta(request, folder_id):
 @login_required
 def preview_anexo(request, item_id):
     try:
-        sp = SharePoint()
-        preview_url = sp.get_preview_url(item_id)
+        preview_url = obter_servico_miniaturas().obter_preview_url(item_id)
         return HttpResponse(f'<iframe src="{preview_url}"></iframe>')
     except Exception as e:
         return HttpResponse(f"<p style='color:red;'>Erro: {e}</p>")
 
+@login_required
+def miniatura_anexo(request, item_id):
+    """
+    Miniatura do anexo, servida do cache em disco. A URL traz o cTag (?v=),
+    então cada versão tem endereço próprio e pode ficar em cache no navegador.
+    """
+    try:
+        servico = obter_servico_miniaturas()
+        caminho = servico.obter_miniatura(item_id, request.GET.get('v'))
+    except Exception as e:
+        logger.warning(f"Erro ao obter miniatura de {item_id}: {e}")
+        caminho = None
+
+    if caminho is None:
+        return HttpResponse(status=404)
+    response = FileResponse(open(caminho, 'rb'), content_type=servico.tipo_imagem(caminho))
+    if request.GET.get('v'):
+        response['Cache-Control'] = 'private, max-age=31536000, immutable'
+    else:
+        response['Cache-Control'] = 'private, max-age=300'
+    return response
+
 @require_POST
 @login_required
 def excluir_anexo_sharepoint(request, item_id):
     try:
-        sp = SharePoint()
+        sp = obter_sharepoint()
         sp.excluir_item(item_id)
         response = HttpResponse(status=200)
         response['HX-Refresh'] = 'true'
@@ -1483,28 +1714,30 @@ def excluir_anexo_sharepoint(request, item_id):
 def listar_arquivos_para_analise(request, pk):
     caso = get_object_or_404(Caso, pk=pk)
     try:
-        sp = SharePoint()
+        sp = obter_sharepoint()
         if not caso.sharepoint_folder_id:
             return JsonResponse({'success': False, 'arquivos': [], 'mensagem': 'Pasta nao encontrada'})
 
-        itens = sp.listar_conteudo_pasta(caso.sharepoint_folder_id)
-        arquivos = [
-            {'id': item['id'], 'nome': item.get('name') or item.get('nome')}
-            for item in itens
-            if item.get('type') == 'file' or item.get('tipo') == 'file'
-        ]
+        if espelho_atualizado(sp) and caso.itens_drive.filter(item_id=caso.sharepoint_folder_id).exists():
+            # Todos os arquivos do caso (inclusive em subpastas), direto do espelho local
+            arquivos = [
+                {'id': item_id, 'nome': nome}
+                for item_id, nome in caso.itens_drive.filter(eh_pasta=False).values_list('item_id', 'nome')
+            ]
+        else:
+            itens = sp.listar_conteudo_pasta(caso.sharepoint_folder_id)
+            arquivos = [{'id': item['id'], 'nome': item.get('name')} for item in itens if not item.get('folder')]
         return JsonResponse({'success': True, 'arquivos': arquivos})
     except Exception as e:
         return JsonResponse({'success': False, 'arquivos': [], 'mensagem': str(e)})
 
 @login_required
-def analyser_navegador_pasta(request, pk, folder_id):
-    caso = get_object_or_404(Caso, pk=pk)
+async def analyser_navegador_pasta(request, pk, folder_id):
+    caso = await aget_object_or_404(Caso, pk=pk)
     root_folder_id = request.GET.get('root_folder_id', folder_id)
     try:
-        sp = SharePoint()
-        folder_details = sp.get_item_details(folder_id)
-        itens = sp.listar_conteudo_pasta(folder_id)
+        async with obter_sharepoint_async(isinstance(request, ASGIRequest)) as sp:
+            folder_details, itens = await sp.detalhes_e_conteudo(folder_id)
         context = {
             'caso': caso,
             'itens': itens,
@@ -1513,7 +1746,7 @@ def analyser_navegador_pasta(request, pk, folder_id):
             'folder_name': folder_details.get('name', 'Pasta'),
             'folder_details': folder_details
         }
-        return render(request, 'casos/partials/analyser_navegador.html', context)
+        return await sync_to_async(render)(request, 'casos/partials/analyser_navegador.html', context)
     except Exception as e:
         return HttpResponse(f'<div class="alert alert-danger">Erro: {e}</div>')
 
@@ -1973,14 +2206,23 @@ def selecionar_filtros_exportacao(request):
 def exportar_casos_excel(request):
     casos_queryset = Caso.objects.select_related(
         'cliente', 'produto', 'advogado_responsavel'
+    ).annotate(
+        total_anexos=Count('itens_drive', filter=Q(itens_drive__eh_pasta=False))
     ).order_by('-data_entrada')
 
+    # Permite exportar o relatório de casos sem documentos a partir da lista
+    filtro_documentos = request.GET.get('filtro_documentos', '')
+    if filtro_documentos == 'SEM':
+        casos_queryset = casos_queryset.filter(total_anexos=0)
+    elif filtro_documentos == 'COM':
+        casos_queryset = casos_queryset.filter(total_anexos__gt=0)
+
     workbook = openpyxl.Workbook()
     sheet = workbook.active
     sheet.title = 'Casos'
     headers = [
         'ID', 'Cliente', 'Produto', 'Status', 'Data Entrada',
-        'Advogado', 'Valor Apurado'
+        'Advogado', 'Valor Apurado', 'Anexos'
     ]
     sheet.append(headers)
 
@@ -1996,7 +2238,8 @@ def exportar_casos_excel(request):
             caso.get_status_display(),
             data_entrada,
             advogado,
-            str(caso.valor_apurado) if caso.valor_apurado is not None else ''
+            str(caso.valor_apurado) if caso.valor_apurado is not None else '',
+            caso.total_anexos
         ])
 
     response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
@@ -2110,25 +2353,26 @@ def importar_casos_view(request):
             if not mapeamentos_uteis:
                 raise ValidationError("Nenhum cabeçalho corresponde aos campos esperados.")
 
-            linhas_enviadas = 0
             campos_meta_map_serializable = {nome_var: campo.id for nome_var, campo in campos_meta_map.items()}
 
+            linhas = []
             for row_index, row in enumerate(sheet.iter_rows(min_row=2, values_only=True), start=2):
                 linha_dados = dict(zip(excel_headers, row))
                 linha_dados['_row_index'] = row_index
                 linha_dados_mapeada = {k: v for k, v in linha_dados.items() if k in header_map or k == '_row_index'}
                 if not any(v for k, v in linha_dados_mapeada.items() if k != '_row_index' and v is not None):
                     continue
+                linhas.append(linha_dados_mapeada)
+
+            # Cada tarefa cria um lote de casos e dispara os gatilhos uma vez para o lote todo
+            tamanho_lote = settings.IMPORTACAO_LOTE
+            for inicio in range(0, len(linhas), tamanho_lote):
+                processar_lote_importacao.apply_async(args=[
+                    linhas[inicio:inicio + tamanho_lote], cliente.id, produto.id, header_map, list(chaves_validas_set),
+                    campos_meta_map_serializable, produto.padrao_titulo, estrutura_campos.id if estrutura_campos else None
+                ])
+            linhas_enviadas = len(linhas)
 
-                processar_linha_importacao.apply_async(
-                    args=[
-                        linha_dados_mapeada, cliente.id, produto.id, header_map, list(chaves_validas_set),
-                        campos_meta_map_serializable, produto.padrao_titulo, estrutura_campos.id if estrutura_campos else None
-                    ],
-                    countdown=linhas_enviadas * 10
-                )
-                linhas_enviadas += 1
-            
             if linhas_enviadas == 0:
                 messages.warning(request, "Nenhuma linha válida encontrada.")
             else:
@@ -2216,8 +2460,8 @@ def analyser_navegador(request, pk):
     if not caso.sharepoint_folder_id:
         return HttpResponse('<div class="analyser-empty-state">Pasta não encontrada</div>')
     try:
-        sp = SharePoint()
-        itens = sp.listar_conteudo_pasta(caso.sharepoint_folder_id)
+        sp = obter_sharepoint()
+        itens = sp.cache_pastas.listar(caso.sharepoint_folder_id)
         return render(request, 'casos/partials/painel_anexos.html', {
             'caso': caso, 'itens': itens, 'folder_id': caso.sharepoint_folder_id
         })
@@ -2227,10 +2471,27 @@ def analyser_navegador(request, pk):
 @login_required
 def upload_arquivo_sharepoint(request, caso_pk):
     caso = get_object_or_404(Caso, pk=caso_pk)
-    if request.method == 'POST' and request.FILES.get('arquivo'):
-        sp = SharePoint()
+    arquivos = request.FILES.getlist('arquivo')
+    if request.method == 'POST' and arquivos:
+        sp = obter_sharepoint()
         pasta_id = request.POST.get('pasta_id', caso.sharepoint_folder_id)
-        sp.fazer_upload(request.FILES['arquivo'], pasta_id)
+
+        # Vários arquivos sobem em paralelo (cada um em pedaços, se for grande)
+        falhas = []
+        with ThreadPoolExecutor(max_workers=min(len(arquivos), UPLOADS_SIMULTANEOS)) as executor:
+            futuros = {executor.submit(sp.fazer_upload, arquivo, pasta_id): arquivo for arquivo in arquivos}
+            for futuro in as_completed(futuros):
+                try:
+                    futuro.result()
+                except Exception as e:
+                    logger.error(f"Erro no upload de '{futuros[futuro].name}': {e}", exc_info=True)
+                    falhas.append(futuros[futuro].name)
+
+        if falhas:
+            return render(request, 'casos/partials/painel_anexos_erro.html', {
+                'caso': caso,
+                'mensagem_erro': f"Falha ao enviar: {', '.join(falhas)}"
+            })
         return carregar_painel_anexos(request, caso_pk)
     return JsonResponse({'error': 'Falha no upload'}, status=400)
 
@@ -2241,7 +2502,7 @@ def criar_pasta_raiz_sharepoint(request):
         nome_nova_pasta = request.POST.get('nome_pasta')
         if not nome_nova_pasta:
             return HttpResponse("<p style='color: red;'>Nome da pasta nao pode ser vazio.</p>", status=400)
-        sp = SharePoint()
+        sp = obter_sharepoint()
         sp.criar_pasta_caso(nome_nova_pasta)
     except Exception as e:
         logger.error(f"Erro ao criar pasta na raiz: {e}", exc_info=True)
@@ -52,6 +52,7 @@ INSTALLED_APPS = [
     #'workflow.apps.WorkflowConfig',
     'workflow',
     'analyser',
+    'integrations',
 
     'django.contrib.admin',
     'django.contrib.auth',
@@ -221,6 +222,18 @@ EMAIL_USE_TLS = True
 EMAIL_HOST_USER = env.str('EMAIL_HOST_USER', default=None)
 EMAIL_HOST_PASSWORD = env.str('EMAIL_HOST_PASSWORD', default=None)
 
+# Fila de e-mails (integrations/emails.py): os envios saem de um worker,
+# reaproveitando uma conexão SMTP por lote. Para medir a fila localmente sem
+# SMTP, use EMAIL_FILA_BACKEND=django.core.mail.backends.locmem.EmailBackend
+EMAIL_FILA_BACKEND = env.str('EMAIL_FILA_BACKEND', default=EMAIL_BACKEND)
+EMAIL_FILA_LOTE = env.int('EMAIL_FILA_LOTE', default=50)  # Mensagens por conexão SMTP
+EMAIL_FILA_MAX_POR_MINUTO = env.int('EMAIL_FILA_MAX_POR_MINUTO', default=30)  # Limite do Office 365
+EMAIL_FILA_MAX_TENTATIVAS = env.int('EMAIL_FILA_MAX_TENTATIVAS', default=5)
+# Resumo: um e-mail com vários casos novos, a cada N casos ou ao fim da janela
+EMAIL_RESUMO_NOVOS_CASOS = env.bool('EMAIL_RESUMO_NOVOS_CASOS', default=False)
+EMAIL_RESUMO_MAX_ITENS = env.int('EMAIL_RESUMO_MAX_ITENS', default=50)
+EMAIL_RESUMO_JANELA_MINUTOS = env.int('EMAIL_RESUMO_JANELA_MINUTOS', default=15)
+
 
 # ==============================================================================
 # 11. CONFIGURAÇÕES DE PRODUÇÃO E SEGURANÇA
@@ -243,6 +256,58 @@ if not DEBUG:
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# --- Cache ---
+# Em produção o cache fica no Redis (compartilhado entre workers); sem
+# REDIS_CACHE_URL, cai no cache em memória do processo (desenvolvimento).
+REDIS_CACHE_URL = env.str('REDIS_CACHE_URL', default=None)
+if REDIS_CACHE_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_CACHE_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# --- Armazenamento de documentos ---
+# 'sharepoint' (padrão), 'local' (pastas em DOCUMENTOS_LOCAL_RAIZ) ou
+# 'emulador' (cliente Graph real contra o emulador local, para testes de carga).
+DOCUMENTOS_BACKEND = env.str('DOCUMENTOS_BACKEND', default='sharepoint')
+DOCUMENTOS_LOCAL_RAIZ = env.str('DOCUMENTOS_LOCAL_RAIZ', default=str(MEDIA_ROOT / 'documentos'))
+GRAPH_EMULADOR_URL = env.str('GRAPH_EMULADOR_URL', default=None)
+GRAPH_EMULADOR_LATENCIA_MS = env.float('GRAPH_EMULADOR_LATENCIA_MS', default=0)
+GRAPH_EMULADOR_TAXA_429 = env.float('GRAPH_EMULADOR_TAXA_429', default=0.0)
+
+# Miniaturas dos anexos (cache em disco, LRU limitado em MB)
+MINIATURAS_RAIZ = env.str('MINIATURAS_RAIZ', default=str(MEDIA_ROOT / 'miniaturas'))
+MINIATURAS_LIMITE_MB = env.int('MINIATURAS_LIMITE_MB', default=200)
+
+# Cache do conteúdo dos arquivos do drive (por item + cTag, endereçado por SHA-256)
+BLOBS_RAIZ = env.str('BLOBS_RAIZ', default=str(MEDIA_ROOT / 'blobs'))
+BLOBS_LIMITE_MB = env.int('BLOBS_LIMITE_MB', default=2048)
+BLOBS_IDADE_MAX_DIAS = env.int('BLOBS_IDADE_MAX_DIAS', default=30)
+
+# --- Webhook do n8n (fila em integrations/webhooks.py) ---
+# Os eventos saem em lotes de até N8N_LOTE_MAX, esperando no máximo
+# N8N_LOTE_ESPERA_SEGUNDOS para juntar o lote. Com N8N_LOTE_MAX=1 (padrão) cada
+# evento sai sozinho, no formato antigo (só os dados do caso, no nível de cima).
+# Acima de 1 o corpo vira {"total": n, "eventos": [{tipo, chave, criado_em, dados}]}:
+# só aumente depois de ajustar o fluxo do n8n para esse formato.
+N8N_WEBHOOK_URL = env.str('N8N_WEBHOOK_URL', default=None)
+N8N_LOTE_MAX = env.int('N8N_LOTE_MAX', default=1)
+N8N_LOTE_ESPERA_SEGUNDOS = env.float('N8N_LOTE_ESPERA_SEGUNDOS', default=5)
+N8N_MAX_TENTATIVAS = env.int('N8N_MAX_TENTATIVAS', default=8)
+N8N_TIMEOUT = env.float('N8N_TIMEOUT', default=15)
+
+# Importação de planilhas: casos por tarefa do Celery. Os gatilhos de criação
+# (workflow, pastas, e-mail, n8n) rodam uma vez por lote (workflow/em_massa.py).
+IMPORTACAO_LOTE = env.int('IMPORTACAO_LOTE', default=100)
+
 # --- Configurações do Celery ---
 CELERY_BROKER_URL = 'redis://localhost:6379/0'  # URL do Redis (broker)
 CELERY_RESULT_BACKEND = 'redis://localhost:6379/0' # Onde guardar resultados (opcional)
@@ -251,6 +316,51 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE # Usa o mesmo timezone do Django (America/Sao_Paulo)
 
+# As análises de documentos (longas, presas à API do Gemini) têm fila própria,
+# para não atrasar as demais tarefas. Algum worker precisa consumir essa fila
+# (o start.sh usa -Q celery,analises); num worker dedicado:
+#   celery -A gestao_casos worker -Q analises --concurrency=4
+CELERY_TASK_ROUTES = {
+    'analyser.tasks.executar_analise': {'queue': 'analises'},
+}
+# Análises rodando ao mesmo tempo por usuário; as demais esperam na fila
+ANALISE_MAX_SIMULTANEAS_POR_USUARIO = env.int('ANALISE_MAX_SIMULTANEAS_POR_USUARIO', default=2)
+# Análises ativas (na fila + rodando) por usuário; acima disso o envio é recusado
+ANALISE_MAX_NA_FILA_POR_USUARIO = env.int('ANALISE_MAX_NA_FILA_POR_USUARIO', default=10)
+# Intervalo para tentar de novo quando o usuário está no limite de simultâneas
+ANALISE_ESPERA_VAGA_SEGUNDOS = env.int('ANALISE_ESPERA_VAGA_SEGUNDOS', default=15)
+ANALISE_TEMPO_MAX_MINUTOS = env.int('ANALISE_TEMPO_MAX_MINUTOS', default=30)
+# Etapa MAP (download + conversão + Gemini por arquivo): arquivos processados ao
+# mesmo tempo em uma análise, e no total (somando as análises de todos os
+# processos do worker; vagas no cache compartilhado, ver analyser.fila.vaga_map)
+ANALISE_MAP_CONCORRENCIA = env.int('ANALISE_MAP_CONCORRENCIA', default=4)
+ANALISE_MAP_CONCORRENCIA_GLOBAL = env.int('ANALISE_MAP_CONCORRENCIA_GLOBAL', default=8)
+# Cache do texto extraído dos documentos (analyser.ExtracaoTexto), LRU limitado em MB
+ANALISE_EXTRACAO_CACHE_MB = env.int('ANALISE_EXTRACAO_CACHE_MB', default=512)
+
+# Espelho local dos documentos (integrations.DriveItem), atualizado pelo /delta
+# na tarefa do beat. Sem sincronizar há mais de ESPELHO_DRIVE_IDADE_MAX_MINUTOS,
+# o seletor de arquivos volta a listar direto do SharePoint.
+ESPELHO_DRIVE_IDADE_MAX_MINUTOS = env.int('ESPELHO_DRIVE_IDADE_MAX_MINUTOS', default=10)
+CELERY_BEAT_SCHEDULE = {
+    'sincronizar-espelho-drive': {
+        'task': 'integrations.tasks.sincronizar_espelho_drive',
+        'schedule': env.int('ESPELHO_DRIVE_INTERVALO', default=120),
+    },
+    'drenar-outbox-casos': {
+        'task': 'workflow.tasks.drenar_outbox',
+        'schedule': env.int('OUTBOX_INTERVALO', default=60),
+    },
+    'enviar-emails-pendentes': {
+        'task': 'integrations.tasks.enviar_emails_pendentes',
+        'schedule': 60,
+    },
+    'entregar-webhooks-pendentes': {
+        'task': 'integrations.tasks.entregar_webhooks_pendentes',
+        'schedule': 30,
+    },
+}
+
 # --- ADICIONE OU MODIFIQUE ESTAS LINHAS ---
 # Define o formato padrão para campos DateField
 DATE_FORMAT = 'd/m/Y' 
@@ -262,4 +372,10 @@ LOGIN_REDIRECT_URL = '/'
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')  # ✅ Usa os.getenv()
 GEMINI_MODEL = os.getenv('GEMINI_MODEL', 'gemini-2.5-flash')
 GEMINI_TEMPERATURE = float(os.getenv('GEMINI_TEMPERATURE', '0.1'))
-GEMINI_MAX_TOKENS = int(os.getenv('GEMINI_MAX_TOKENS', '4096'))
\ No newline at end of file
+GEMINI_MAX_TOKENS = int(os.getenv('GEMINI_MAX_TOKENS', '4096'))
+# Cache das respostas do Gemini (analyser.RespostaLLM); 0 desliga
+GEMINI_CACHE_TTL_HORAS = int(os.getenv('GEMINI_CACHE_TTL_HORAS', '24'))
+# Documentos a partir deste tamanho vão para o File API do Gemini uma vez só e
+# as chamadas seguintes passam apenas a referência (analyser.ArquivoGemini)
+GEMINI_FILE_API = os.getenv('GEMINI_FILE_API', 'True') == 'True'
+GEMINI_FILE_API_MIN_KB = int(os.getenv('GEMINI_FILE_API_MIN_KB', '256'))
\ No newline at end of file
@@ -41,6 +41,7 @@ urlpatterns = [
     path('equipamentos/', include('equipamentos.urls', namespace='equipamentos')),
     path('campos-custom/', include('campos_custom.urls', namespace='campos_custom')),
     path('analyser/', include('analyser.urls')),
+    path('integrations/', include('integrations.urls', namespace='integrations')),
     
     # ==========================================================
     # 4. ROTAS ESPECÍFICAS (Importação, etc.)
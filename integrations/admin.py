@@ -1,3 +1,59 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import DriveItem, EmailPendente, EntregaWebhook, EventoWebhook, SincronizacaoDrive, WebhookMorto
+from .webhooks import reenfileirar_mortos
+
+
+@admin.register(DriveItem)
+class DriveItemAdmin(admin.ModelAdmin):
+    list_display = ('nome', 'caso', 'eh_pasta', 'tamanho', 'mime_type', 'modificado_em', 'sincronizado_em')
+    list_filter = ('eh_pasta',)
+    search_fields = ('nome', 'item_id')
+    raw_id_fields = ('caso',)
+
+
+@admin.register(SincronizacaoDrive)
+class SincronizacaoDriveAdmin(admin.ModelAdmin):
+    list_display = ('drive_id', 'atualizado_em')
+
+
+@admin.register(EmailPendente)
+class EmailPendenteAdmin(admin.ModelAdmin):
+    list_display = ('assunto', 'status', 'resumo', 'tentativas', 'criado_em', 'enviado_em')
+    list_filter = ('status', 'resumo')
+    search_fields = ('assunto', 'chave')
+    readonly_fields = ('chave', 'criado_em', 'enviado_em', 'ultimo_erro')
+    actions = ['reenviar']
+
+    @admin.action(description="Reenviar mensagens selecionadas")
+    def reenviar(self, request, queryset):
+        total = queryset.exclude(status='AGRUPADO').update(status='PENDENTE', tentativas=0, proxima_tentativa_em=None)
+        self.message_user(request, f"{total} mensagem(ns) voltaram para a fila.")
+
+
+@admin.register(EventoWebhook)
+class EventoWebhookAdmin(admin.ModelAdmin):
+    list_display = ('chave', 'tipo', 'status', 'tentativas', 'proxima_tentativa_em', 'criado_em')
+    list_filter = ('status', 'tipo')
+    search_fields = ('chave',)
+    raw_id_fields = ('entrega',)
+
+
+@admin.register(EntregaWebhook)
+class EntregaWebhookAdmin(admin.ModelAdmin):
+    list_display = ('criado_em', 'total_eventos', 'sucesso', 'status_http', 'latencia_ms', 'espera_fila_ms')
+    list_filter = ('sucesso', 'status_http')
+    readonly_fields = [f.name for f in EntregaWebhook._meta.fields]
+
+
+@admin.register(WebhookMorto)
+class WebhookMortoAdmin(admin.ModelAdmin):
+    list_display = ('chave', 'tipo', 'tentativas', 'evento_criado_em', 'criado_em')
+    list_filter = ('tipo',)
+    search_fields = ('chave',)
+    actions = ['reenfileirar']
+
+    @admin.action(description="Reenfileirar eventos selecionados")
+    def reenfileirar(self, request, queryset):
+        total = reenfileirar_mortos(queryset)
+        self.message_user(request, f"{total} evento(s) voltaram para a fila do webhook.")
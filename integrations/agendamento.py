@@ -0,0 +1,42 @@
+# integrations/agendamento.py
+import logging
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db.models import Min
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+def agendar_proxima_rodada(tarefa, chave: str, pendentes, campo: str = 'proxima_tentativa_em',
+                           apos: timedelta = timedelta(0)) -> bool:
+    """
+    Agenda `tarefa` (Celery) para quando vencer o primeiro item de `pendentes`
+    (o menor `campo` + `apos`), para novas tentativas e janelas de espera não
+    dependerem do Celery beat, que fica só como rede de segurança.
+
+    O horário da rodada agendada fica em `chave`; só agenda de novo se não
+    houver uma rodada marcada para antes disso. Quem roda a rodada chama esta
+    função no fim, para agendar a seguinte.
+
+    :return: True se agendou uma rodada.
+    """
+    proxima = pendentes.aggregate(proxima=Min(campo))['proxima']
+    if proxima is None:
+        return False
+    proxima += apos
+    agora = timezone.now()
+    agendada = cache.get(chave)
+    if agendada and agora < agendada <= proxima:
+        return False
+    espera = max(0.0, (proxima - agora).total_seconds()) + 1
+    cache.set(chave, proxima, int(espera) + 60)
+    try:
+        tarefa.apply_async(countdown=espera)
+    except Exception as e:
+        # Broker fora do ar: a tarefa periódica pega depois
+        cache.delete(chave)
+        logger.warning(f"⚠️ Não foi possível agendar {tarefa.name} ({e}). Fica para a tarefa periódica.")
+        return False
+    return True
@@ -0,0 +1,338 @@
+# integrations/armazenamento_local.py
+import os
+import json
+import base64
+import shutil
+import hashlib
+import logging
+import mimetypes
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from django.conf import settings
+
+from .backends import BackendDocumentos, etag_confere
+from .cache_pastas import CachePastas
+
+logger = logging.getLogger(__name__)
+
+
+class RespostaArquivoLocal:
+    """Imita a parte de `requests.Response` usada nos downloads em streaming."""
+
+    def __init__(self, caminho: Path, inicio: int, fim: int, tamanho: int, parcial: bool):
+        self.status_code = 206 if parcial else 200
+        self.headers = {'Content-Length': str(fim - inicio + 1)}
+        if parcial:
+            self.headers['Content-Range'] = f'bytes {inicio}-{fim}/{tamanho}'
+        self._arquivo = open(caminho, 'rb')
+        self._arquivo.seek(inicio)
+        self._restante = fim - inicio + 1
+
+    def iter_content(self, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+        while self._restante > 0:
+            bloco = self._arquivo.read(min(chunk_size, self._restante))
+            if not bloco:
+                break
+            self._restante -= len(bloco)
+            yield bloco
+
+    def close(self):
+        self._arquivo.close()
+
+
+class RespostaIntervaloInvalido:
+    """Resposta 416 (Range fora do arquivo), no mesmo formato da anterior."""
+
+    status_code = 416
+
+    def __init__(self, tamanho: int):
+        self.headers = {'Content-Range': f'bytes */{tamanho}', 'Content-Length': '0'}
+
+    def iter_content(self, chunk_size: int = 0) -> Iterator[bytes]:
+        return iter(())
+
+    def close(self):
+        pass
+
+
+def interpretar_range(range_header: Optional[str], tamanho: int) -> Optional[Tuple[int, int]]:
+    """
+    Interpreta um cabeçalho Range de intervalo único ("bytes=a-b", "bytes=a-",
+    "bytes=-n"). Retorna (inicio, fim) inclusivo, None se ausente/ignorado, ou
+    levanta ValueError se o intervalo estiver fora do arquivo.
+    """
+    if not range_header or not range_header.startswith('bytes=') or ',' in range_header:
+        return None
+    inicio_txt, _, fim_txt = range_header[6:].strip().partition('-')
+    try:
+        if not inicio_txt:
+            inicio, fim = max(0, tamanho - int(fim_txt)), tamanho - 1
+        else:
+            inicio = int(inicio_txt)
+            fim = min(int(fim_txt), tamanho - 1) if fim_txt else tamanho - 1
+    except ValueError:
+        return None
+    if inicio >= tamanho or inicio > fim:
+        raise ValueError(f"Range fora do arquivo: {range_header}")
+    return inicio, fim
+
+
+class ArmazenamentoLocal(BackendDocumentos):
+    """
+    Backend de documentos em pastas no disco, sem rede nem tenant do M365.
+
+    Serve para desenvolvimento e para medir o desempenho do sistema (criação
+    de casos, anexos, analyser) offline. Os itens imitam os driveItems do
+    Graph: o ID é o caminho relativo codificado, cTag/eTag derivam da data de
+    modificação e as mudanças ficam num diário (.delta.jsonl) que alimenta o
+    `consultar_delta` — inclusive entre processos (web e Celery) que
+    compartilham a mesma raiz.
+    """
+
+    ARQUIVO_DIARIO = '.delta.jsonl'
+
+    def __init__(self, raiz: Optional[str] = None):
+        self.raiz = Path(raiz or getattr(settings, 'DOCUMENTOS_LOCAL_RAIZ', None)
+                         or Path(settings.MEDIA_ROOT) / 'documentos').resolve()
+        self.raiz.mkdir(parents=True, exist_ok=True)
+        self._drive_id = 'local-' + hashlib.sha1(str(self.raiz).encode()).hexdigest()[:12]
+        self._lock = threading.Lock()
+        self.cache_pastas = CachePastas(self)
+
+    @property
+    def drive_id(self) -> str:
+        return self._drive_id
+
+    # -------------------------------------------------------------------------
+    # IDs <-> caminhos
+    # -------------------------------------------------------------------------
+
+    def _id_para_caminho(self, item_id: str) -> Path:
+        if item_id == self.RAIZ:
+            return self.raiz
+        try:
+            relativo = base64.urlsafe_b64decode(item_id + '=' * (-len(item_id) % 4)).decode()
+        except (ValueError, UnicodeDecodeError):
+            raise FileNotFoundError(f"Item inexistente: {item_id}")
+        caminho = (self.raiz / relativo).resolve()
+        # Impede IDs forjados de escaparem da raiz
+        if self.raiz not in caminho.parents:
+            raise FileNotFoundError(f"Item inexistente: {item_id}")
+        return caminho
+
+    def _caminho_para_id(self, caminho: Path) -> str:
+        if caminho == self.raiz:
+            return self.RAIZ
+        relativo = caminho.relative_to(self.raiz).as_posix()
+        return base64.urlsafe_b64encode(relativo.encode()).decode().rstrip('=')
+
+    def _item_bruto(self, caminho: Path) -> Dict:
+        """Monta um driveItem (formato do Graph) para o caminho."""
+        info = caminho.stat()
+        item_id = self._caminho_para_id(caminho)
+        versao = f'{info.st_mtime_ns:x}'
+        item = {
+            'id': item_id,
+            'name': caminho.name if caminho != self.raiz else 'root',
+            'size': info.st_size,
+            'createdDateTime': datetime.fromtimestamp(info.st_ctime, timezone.utc).isoformat(),
+            'lastModifiedDateTime': datetime.fromtimestamp(info.st_mtime, timezone.utc).isoformat(),
+            'webUrl': caminho.as_uri(),
+            'cTag': f'"c:{{{item_id}}},{versao}"',
+            'eTag': f'"{{{item_id}}},{versao}"',
+        }
+        if caminho != self.raiz:
+            item['parentReference'] = {'id': self._caminho_para_id(caminho.parent), 'driveId': self.drive_id}
+        if caminho.is_dir():
+            item['folder'] = {'childCount': sum(1 for f in caminho.iterdir() if not f.name.startswith('.'))}
+            item['size'] = 0
+        else:
+            item['file'] = {'mimeType': mimetypes.guess_type(caminho.name)[0] or 'application/octet-stream'}
+        return item
+
+    # -------------------------------------------------------------------------
+    # Diário de mudanças (base do /delta)
+    # -------------------------------------------------------------------------
+
+    def _registrar_mudanca(self, caminho: Path, removido: bool = False):
+        entrada = {'id': self._caminho_para_id(caminho), 'parentId': self._caminho_para_id(caminho.parent)}
+        if removido:
+            entrada['deleted'] = True
+        with self._lock, open(self.raiz / self.ARQUIVO_DIARIO, 'a', encoding='utf-8') as diario:
+            diario.write(json.dumps(entrada) + '\n')
+
+    def consultar_delta(self, delta_link: Optional[str] = None, completo: bool = False) -> Tuple[List[Dict], str]:
+        """O "delta link" local é a posição (em bytes) já lida do diário."""
+        caminho_diario = self.raiz / self.ARQUIVO_DIARIO
+        if not caminho_diario.exists():
+            caminho_diario.touch()
+
+        with open(caminho_diario, 'r', encoding='utf-8') as diario:
+            if not delta_link:
+                diario.seek(0, os.SEEK_END)
+                link = f'local-delta:{diario.tell()}'
+                if not completo:
+                    return [], link
+                return [self._item_bruto(caminho) for caminho in self._percorrer()], link
+
+            diario.seek(int(delta_link.rsplit(':', 1)[1]))
+            entradas = {}
+            for linha in iter(diario.readline, ''):
+                if linha.endswith('\n'):
+                    entrada = json.loads(linha)
+                    entradas[entrada['id']] = entrada  # Só a última mudança de cada item importa
+            posicao = diario.tell()
+
+        itens = []
+        for item_id, entrada in entradas.items():
+            try:
+                caminho = self._id_para_caminho(item_id)
+                if entrada.get('deleted') or not caminho.exists():
+                    raise FileNotFoundError
+                itens.append(self._item_bruto(caminho))
+            except FileNotFoundError:
+                itens.append({'id': item_id, 'deleted': {}, 'parentReference': {'id': entrada.get('parentId')}})
+        return itens, f'local-delta:{posicao}'
+
+    def _percorrer(self) -> Iterator[Path]:
+        """Todos os caminhos visíveis do armazenamento, pais antes dos filhos."""
+        for caminho in sorted(self.raiz.rglob('*')):
+            if not any(parte.startswith('.') for parte in caminho.relative_to(self.raiz).parts):
+                yield caminho
+
+    # -------------------------------------------------------------------------
+    # Leitura
+    # -------------------------------------------------------------------------
+
+    def iterar_conteudo_pasta(self, folder_id: str, campos: Optional[List[str]] = None,
+                              expandir_thumbnails: bool = False, tamanho_pagina: int = 200) -> Iterator[Dict]:
+        pasta = self._id_para_caminho(folder_id)
+        if not pasta.is_dir():
+            raise FileNotFoundError(f"Pasta inexistente: {folder_id}")
+        for caminho in sorted(pasta.iterdir(), key=lambda c: c.name.lower()):
+            if not caminho.name.startswith('.'):
+                yield self._processar_item(self._item_bruto(caminho))
+
+    def get_item_details(self, item_id: str) -> Dict:
+        caminho = self._id_para_caminho(item_id)
+        if not caminho.exists():
+            raise FileNotFoundError(f"Item inexistente: {item_id}")
+        return self._item_bruto(caminho)
+
+    def get_preview_url(self, item_id: str) -> Optional[str]:
+        return None
+
+    def obter_item_por_caminho(self, caminho: str, pasta_base: str = 'root') -> Optional[Dict]:
+        atual = self._id_para_caminho(pasta_base)
+        for parte in Path(caminho.strip('/')).parts:
+            proximo = atual / parte
+            if not proximo.exists() and atual.is_dir():
+                # Como no SharePoint, nomes não diferenciam maiúsculas
+                proximo = next((c for c in atual.iterdir() if c.name.lower() == parte.lower()), proximo)
+            atual = proximo
+        atual = atual.resolve()
+        if not atual.exists() or (atual != self.raiz and self.raiz not in atual.parents):
+            return None
+        return self._processar_item(self._item_bruto(atual))
+
+    def download_arquivo(self, item_id: str) -> bytes:
+        logger.info(f"📥 Lendo arquivo local: {item_id}...")
+        return self._id_para_caminho(item_id).read_bytes()
+
+    def abrir_download(self, item_id: str, range_header: Optional[str] = None,
+                       if_none_match: Optional[str] = None):
+        metadados = self.get_item_details(item_id)
+        if 'file' not in metadados:
+            raise ValueError(f"Item {item_id} não é um arquivo")
+
+        if etag_confere(if_none_match, metadados['eTag']):
+            return metadados, None
+
+        caminho = self._id_para_caminho(item_id)
+        tamanho = metadados['size']
+        try:
+            intervalo = interpretar_range(range_header, tamanho)
+        except ValueError:
+            return metadados, RespostaIntervaloInvalido(tamanho)
+        inicio, fim = intervalo or (0, tamanho - 1)
+        return metadados, RespostaArquivoLocal(caminho, inicio, fim, tamanho, parcial=intervalo is not None)
+
+    # -------------------------------------------------------------------------
+    # Escrita
+    # -------------------------------------------------------------------------
+
+    def _nome_seguro(self, nome: str) -> str:
+        nome = nome.strip().replace('/', '_').replace('\\', '_')
+        if nome in ('', '.', '..') or nome.startswith('.'):
+            raise ValueError(f"Nome inválido: {nome!r}")
+        return nome
+
+    def criar_pasta_caso(self, nome_pasta_caso: str) -> str:
+        logger.info(f"📁 Criando pasta do caso: '{nome_pasta_caso}'...")
+        nome = self._nome_seguro(nome_pasta_caso)
+        with self._lock:
+            # Mesmo comportamento do conflictBehavior=rename do Graph ("Nome 1", "Nome 2"...)
+            caminho, n = self.raiz / nome, 0
+            while caminho.exists():
+                n += 1
+                caminho = self.raiz / f'{nome} {n}'
+            caminho.mkdir()
+        self._registrar_mudanca(caminho)
+        self.cache_pastas.invalidar_pasta(self.RAIZ)
+        self.cache_pastas.registrar_nome(self.RAIZ, self._processar_item(self._item_bruto(caminho)))
+        return self._caminho_para_id(caminho)
+
+    def criar_subpasta(self, id_pasta_pai: str, nome_subpasta: str) -> Dict:
+        logger.info(f"📁 Criando subpasta: '{nome_subpasta}' em {id_pasta_pai}...")
+        caminho = self._id_para_caminho(id_pasta_pai) / self._nome_seguro(nome_subpasta)
+        caminho.mkdir()  # FileExistsError equivale ao conflictBehavior=fail
+        self._registrar_mudanca(caminho)
+        self.cache_pastas.invalidar_pasta(id_pasta_pai)
+        item = self._item_bruto(caminho)
+        self.cache_pastas.registrar_nome(id_pasta_pai, self._processar_item(item))
+        return item
+
+    def _gravar(self, folder_id: str, file_name: str, escrever) -> Dict:
+        pasta = self._id_para_caminho(folder_id)
+        if not pasta.is_dir():
+            raise FileNotFoundError(f"Pasta inexistente: {folder_id}")
+        destino = pasta / self._nome_seguro(file_name)
+        temporario = pasta / f'.{destino.name}.{threading.get_ident()}.parcial'
+        try:
+            with open(temporario, 'wb') as saida:
+                escrever(saida)
+            os.replace(temporario, destino)
+        finally:
+            temporario.unlink(missing_ok=True)
+        self._registrar_mudanca(destino)
+        item = self._item_bruto(destino)
+        self.cache_pastas.invalidar_pasta(folder_id)
+        # Um arquivo substituído mantém o ID: os detalhes em cache passam a ser os da nova versão
+        self.cache_pastas.gravar_detalhes(item['id'], item)
+        logger.info(f"✅ Arquivo '{destino.name}' gravado em {pasta}")
+        return item
+
+    def upload_arquivo(self, folder_id: str, file_name: str, file_content: bytes) -> Dict:
+        return self._gravar(folder_id, file_name, lambda saida: saida.write(file_content))
+
+    def fazer_upload(self, arquivo, pasta_id: str) -> Dict:
+        """Copia o arquivo enviado em blocos, sem carregá-lo inteiro na memória."""
+        logger.info(f"📤 Upload: {arquivo.name} -> pasta {pasta_id}")
+        arquivo.seek(0)
+        return self._gravar(pasta_id, arquivo.name, lambda saida: shutil.copyfileobj(arquivo, saida))
+
+    def excluir_item(self, item_id: str) -> bool:
+        logger.warning(f"🗑️  Excluindo item local: {item_id}...")
+        caminho = self._id_para_caminho(item_id)
+        if caminho == self.raiz:
+            raise ValueError("A raiz não pode ser excluída")
+        if caminho.is_dir():
+            shutil.rmtree(caminho)
+        else:
+            caminho.unlink()
+        self._registrar_mudanca(caminho, removido=True)
+        self.cache_pastas.invalidar_item(item_id)
+        return True
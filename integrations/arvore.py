@@ -0,0 +1,115 @@
+# integrations/arvore.py
+import os
+import hashlib
+import logging
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, List, Optional
+
+from django.core.cache import cache as cache_padrao
+
+from .backends import BackendDocumentos
+
+logger = logging.getLogger(__name__)
+
+
+class VarreduraPastas:
+    """
+    Percorre a árvore de uma pasta (ex: a pasta de um caso) e devolve todos os
+    itens numa lista achatada, em ordem de exibição (cada pasta seguida do seu
+    conteúdo, pastas antes de arquivos).
+
+    As subpastas são listadas em paralelo, com no máximo `max_paralelo`
+    listagens simultâneas, e cada listagem passa pelo cache de pastas. A árvore
+    pronta fica em cache pelo cTag/eTag da pasta raiz e pela versão de árvore
+    do cache de pastas, que muda a cada alteração vista no drive.
+    """
+
+    PROFUNDIDADE_MAX = int(os.getenv('SHAREPOINT_ARVORE_PROFUNDIDADE', '8'))
+    MAX_PARALELO = int(os.getenv('SHAREPOINT_ARVORE_PARALELO', '8'))
+    # Limite de segurança para pastas com estrutura muito grande
+    MAX_PASTAS = int(os.getenv('SHAREPOINT_ARVORE_MAX_PASTAS', '2000'))
+    TTL = int(os.getenv('SHAREPOINT_ARVORE_TTL', str(60 * 10)))
+
+    def __init__(self, sp: BackendDocumentos, profundidade_max: Optional[int] = None,
+                 max_paralelo: Optional[int] = None, cache=None):
+        self.sp = sp
+        self.profundidade_max = self.PROFUNDIDADE_MAX if profundidade_max is None else profundidade_max
+        self.max_paralelo = max(1, max_paralelo or self.MAX_PARALELO)
+        self.cache = cache or cache_padrao
+
+    def _chave(self, folder_id: str, raiz: Dict) -> str:
+        cache_pastas = self.sp.cache_pastas
+        versao = f"{raiz.get('cTag') or raiz.get('eTag')}:{cache_pastas.versao_arvore()}"
+        versao_hash = hashlib.sha1(versao.encode()).hexdigest()[:16]
+        return f'{cache_pastas._prefixo()}:arvore:{folder_id}:{self.profundidade_max}:{versao_hash}'
+
+    def varrer(self, folder_id: str) -> Dict:
+        """
+        Árvore completa de `folder_id`.
+
+        :return: Dict com 'raiz' (detalhes da pasta), 'itens' (lista achatada;
+                 cada item traz também 'caminho' e 'profundidade') e 'truncada'
+                 (True se o limite de profundidade ou de pastas cortou a árvore).
+        """
+        raiz = self.sp.cache_pastas.detalhes(folder_id)
+        chave = self._chave(folder_id, raiz)
+        arvore = self.cache.get(chave)
+        if arvore is not None:
+            logger.debug(f"⚡ Árvore da pasta {folder_id} servida do cache ({len(arvore['itens'])} itens)")
+            return arvore
+
+        filhos, truncada = self._listar_tudo(folder_id)
+        itens = []
+        self._achatar(folder_id, filhos, '', 0, itens)
+        arvore = {'raiz': self.sp._processar_item(raiz), 'itens': itens, 'truncada': truncada}
+        self.cache.set(chave, arvore, self.TTL)
+        logger.info(f"🌳 Árvore da pasta {folder_id}: {len(itens)} itens em {len(filhos)} pasta(s)"
+                    f"{' (truncada)' if truncada else ''}")
+        return arvore
+
+    def _listar_tudo(self, folder_id: str):
+        """Lista a pasta e as subpastas em paralelo. Retorna ({pasta: itens}, truncada)."""
+        filhos: Dict[str, List[Dict]] = {}
+        truncada = False
+        listar = self.sp.cache_pastas.listar
+
+        with ThreadPoolExecutor(max_workers=self.max_paralelo) as executor:
+            pendentes = {executor.submit(listar, folder_id): (folder_id, 0)}
+            while pendentes:
+                concluidos, _ = wait(pendentes, return_when=FIRST_COMPLETED)
+                for futuro in concluidos:
+                    pasta_id, profundidade = pendentes.pop(futuro)
+                    try:
+                        filhos[pasta_id] = futuro.result()
+                    except Exception as e:
+                        if pasta_id == folder_id:
+                            raise
+                        logger.warning(f"⚠️ Falha ao listar a subpasta {pasta_id}: {e}")
+                        filhos[pasta_id] = []
+                        truncada = True
+                        continue
+
+                    for item in filhos[pasta_id]:
+                        if not item.get('folder'):
+                            continue
+                        if profundidade + 1 > self.profundidade_max or len(filhos) + len(pendentes) >= self.MAX_PASTAS:
+                            truncada = True
+                            continue
+                        pendentes[executor.submit(listar, item['id'])] = (item['id'], profundidade + 1)
+        return filhos, truncada
+
+    def _achatar(self, pasta_id: str, filhos: Dict[str, List[Dict]], prefixo: str, profundidade: int, saida: List[Dict]):
+        itens = sorted(filhos.get(pasta_id, []), key=lambda i: (not i.get('folder'), (i.get('name') or '').lower()))
+        for item in itens:
+            caminho = f"{prefixo}{item.get('name')}"
+            saida.append({**item, 'caminho': caminho, 'profundidade': profundidade})
+            if item.get('folder'):
+                self._achatar(item['id'], filhos, f'{caminho}/', profundidade + 1, saida)
+
+
+def varrer_arvore(folder_id: str, sp: Optional[BackendDocumentos] = None, **opcoes) -> Dict:
+    """Atalho para varrer a árvore de uma pasta no backend configurado."""
+    if sp is None:
+        from .sharepoint import obter_sharepoint
+        sp = obter_sharepoint()
+    return VarreduraPastas(sp, **opcoes).varrer(folder_id)
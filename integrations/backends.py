@@ -0,0 +1,277 @@
+# integrations/backends.py
+import re
+import logging
+from abc import ABC, abstractmethod
+from typing import Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_RE_ETAG = re.compile(r'\*|(?:W/)?"[^"]*"')
+
+
+def etag_confere(if_none_match: Optional[str], etag: Optional[str]) -> bool:
+    """
+    Diz se o If-None-Match do cliente contém o eTag do item. Os eTags do
+    Graph têm vírgula ("{GUID},3"), então a lista é lida pelas aspas.
+    """
+    if not if_none_match or not etag:
+        return False
+    for candidato in _RE_ETAG.findall(if_none_match):
+        if candidato == '*' or candidato.removeprefix('W/') == etag.removeprefix('W/'):
+            return True
+    return False
+
+
+class BackendDocumentos(ABC):
+    """
+    Interface comum dos armazenamentos de documentos dos casos.
+
+    O sistema fala sempre com os nomes de método do cliente SharePoint; esta
+    classe define o mínimo que cada backend precisa implementar (operações
+    primitivas) e, a partir delas, os atalhos usados pelas views.
+
+    Os itens seguem o formato de driveItem do Graph: as operações que
+    retornam um item "bruto" (get_item_details, consultar_delta, upload)
+    usam os campos do Graph; as listagens já vêm normalizadas por
+    `_processar_item`.
+    """
+
+    # ID usado para a raiz do armazenamento
+    RAIZ = 'root'
+    # Tamanho dos blocos repassados ao cliente nos downloads em streaming
+    TAMANHO_BLOCO_DOWNLOAD = 256 * 1024
+
+    @property
+    @abstractmethod
+    def drive_id(self) -> str:
+        """Identificador estável do armazenamento (usado nas chaves de cache)."""
+
+    # -------------------------------------------------------------------------
+    # Operações primitivas
+    # -------------------------------------------------------------------------
+
+    @abstractmethod
+    def iterar_conteudo_pasta(self, folder_id: str, campos: Optional[List[str]] = None,
+                              expandir_thumbnails: bool = False, tamanho_pagina: int = 200) -> Iterator[Dict]:
+        """Percorre os itens de uma pasta (já normalizados por `_processar_item`)."""
+
+    @abstractmethod
+    def consultar_delta(self, delta_link: Optional[str] = None, completo: bool = False) -> Tuple[List[Dict], str]:
+        """
+        Mudanças desde `delta_link` (itens brutos) e o novo link. Sem link,
+        `completo=True` enumera o drive inteiro; senão só devolve o link atual.
+        """
+
+    @abstractmethod
+    def get_item_details(self, item_id: str) -> Dict:
+        """Metadados brutos de um item."""
+
+    @abstractmethod
+    def criar_pasta_caso(self, nome_pasta_caso: str) -> str:
+        """Cria uma pasta na raiz (renomeando em caso de conflito) e retorna o ID."""
+
+    @abstractmethod
+    def criar_subpasta(self, id_pasta_pai: str, nome_subpasta: str) -> Dict:
+        """Cria uma subpasta (falha se já existir) e retorna o item bruto."""
+
+    @abstractmethod
+    def upload_arquivo(self, folder_id: str, file_name: str, file_content: bytes) -> Dict:
+        """Grava (ou substitui) um arquivo na pasta e retorna o item bruto."""
+
+    @abstractmethod
+    def download_arquivo(self, item_id: str) -> bytes:
+        """Conteúdo completo de um arquivo."""
+
+    @abstractmethod
+    def abrir_download(self, item_id: str, range_header: Optional[str] = None,
+                       if_none_match: Optional[str] = None) -> Tuple[Dict, Optional[object]]:
+        """
+        Prepara o download em streaming. Retorna (metadados, resposta); a
+        resposta expõe status_code, headers, iter_content() e close(), e é
+        None quando o If-None-Match bate com o eTag.
+        """
+
+    @abstractmethod
+    def excluir_item(self, item_id: str) -> bool:
+        """Exclui um arquivo ou pasta."""
+
+    @abstractmethod
+    def get_preview_url(self, item_id: str) -> Optional[str]:
+        """URL de visualização do arquivo, se o backend oferecer."""
+
+    @abstractmethod
+    def obter_item_por_caminho(self, caminho: str, pasta_base: str = RAIZ) -> Optional[Dict]:
+        """
+        Item (normalizado) no caminho relativo a `pasta_base` (ex: "Caso #29/Fotos"),
+        numa única consulta; None se não existir. Nomes não diferenciam maiúsculas.
+        """
+
+    # -------------------------------------------------------------------------
+    # Operações derivadas (cada backend pode sobrescrever com algo mais eficiente)
+    # -------------------------------------------------------------------------
+
+    def baixar_thumbnail(self, item_id: str, tamanho: str = 'medium') -> Optional[bytes]:
+        """Imagem de miniatura gerada pelo backend, ou None se ele não oferecer."""
+        return None
+
+    @staticmethod
+    def _processar_item(item: Dict) -> Dict:
+        """Normaliza um driveItem no formato usado pelos templates."""
+        item_processado = {
+            'id': item.get('id'),
+            'name': item.get('name'),
+            'file': item.get('file', {}),
+            'folder': item.get('folder'),
+            'size': item.get('size', 0),
+            'createdDateTime': item.get('createdDateTime'),
+            'lastModifiedDateTime': item.get('lastModifiedDateTime'),
+            'webUrl': item.get('webUrl'),
+            'mimeType': item.get('file', {}).get('mimeType', 'folder') if item.get('folder') else item.get('file', {}).get('mimeType', 'application/octet-stream'),
+            'parentId': (item.get('parentReference') or {}).get('id'),
+            'cTag': item.get('cTag'),
+            'eTag': item.get('eTag'),
+        }
+        if 'thumbnails' in item:
+            item_processado['thumbnails'] = item['thumbnails']
+        return item_processado
+
+    def listar_conteudo_pasta(self, folder_id: str, campos: Optional[List[str]] = None,
+                              expandir_thumbnails: bool = False) -> List[Dict]:
+        """Lista os arquivos e subpastas de uma pasta específica (todas as páginas)."""
+        return list(self.iterar_conteudo_pasta(folder_id, campos=campos, expandir_thumbnails=expandir_thumbnails))
+
+    def listar_arquivos_pasta_raiz(self) -> List[Dict]:
+        """Lista todos os arquivos e pastas da raiz da biblioteca de documentos."""
+        logger.info("📁 Listando arquivos e pastas da raiz...")
+        try:
+            return self.listar_conteudo_pasta(self.RAIZ)
+        except Exception as e:
+            logger.error(f"❌ Erro ao listar pasta raiz: {e}")
+            return []
+
+    def listar_arquivos_pasta(self, folder_id: str) -> List[Dict]:
+        """Lista todos os arquivos e pastas de uma pasta específica."""
+        logger.info(f"📁 Listando arquivos da pasta: {folder_id}...")
+        try:
+            return self.listar_conteudo_pasta(folder_id)
+        except Exception as e:
+            logger.error(f"❌ Erro ao listar pasta {folder_id}: {e}")
+            return []
+
+    def get_folder_details(self, folder_id: str) -> Dict:
+        """Alias para get_item_details para melhor legibilidade."""
+        return self.get_item_details(folder_id)
+
+    def criar_pastas_em_lote(self, pastas: List[Tuple[str, str]]) -> List[Dict]:
+        """
+        Cria várias pastas, cada uma na sua pasta pai. Uma pasta que já existe
+        conta como falha (conflictBehavior=fail).
+
+        :param pastas: Pares (id_pasta_pai, nome).
+        :return: Lista (na ordem de `pastas`) com 'pai', 'nome', 'ok', 'item' e 'erro'.
+        """
+        resultados = []
+        for id_pasta_pai, nome in pastas:
+            try:
+                item = self.criar_subpasta(id_pasta_pai, nome)
+                resultados.append({'pai': id_pasta_pai, 'nome': nome, 'ok': True, 'item': item, 'erro': None})
+            except Exception as e:
+                resultados.append({'pai': id_pasta_pai, 'nome': nome, 'ok': False, 'item': None, 'erro': str(e)})
+        return resultados
+
+    def criar_subpastas_em_lote(self, id_pasta_pai: str, nomes: List[str]) -> List[Dict]:
+        """
+        Cria várias subpastas na mesma pasta.
+
+        :return: Lista (na ordem de `nomes`) com 'nome', 'ok', 'item' e 'erro'.
+        """
+        return self.criar_pastas_em_lote([(id_pasta_pai, nome) for nome in nomes])
+
+    def buscar_arquivo_por_nome(self, nome: str, folder_id: str = RAIZ) -> Optional[Dict]:
+        """
+        Busca um arquivo ou pasta por nome dentro de `folder_id`.
+
+        Endereça o item direto pelo caminho (uma consulta, qualquer que seja o
+        tamanho da pasta). Se a consulta falhar, usa o índice nome -> ID do
+        cache de pastas, mantido nas listagens e criações de pastas.
+        """
+        logger.info(f"🔍 Buscando arquivo: '{nome}' em pasta {folder_id}...")
+        cache_pastas = self.cache_pastas
+
+        try:
+            item = self.obter_item_por_caminho(nome, folder_id)
+        except Exception as e:
+            logger.warning(f"⚠️ Busca por caminho falhou ({e}). Usando o índice local de nomes.")
+            item = cache_pastas.buscar_nome(folder_id, nome)
+        else:
+            if item:
+                cache_pastas.registrar_nome(folder_id, item)
+            else:
+                cache_pastas.remover_nome(folder_id, nome)
+
+        if item:
+            logger.info(f"✅ Arquivo encontrado: {item['id']}")
+        else:
+            logger.info(f"⚠️ Arquivo '{nome}' não encontrado")
+        return item
+
+    def obter_ou_criar_pasta_caso(self, nome_caso: str) -> str:
+        """
+        Obtém a pasta do caso ou a cria se não existir.
+
+        :param nome_caso: Nome do caso (ex: "Caso #29")
+        :return: ID da pasta do caso
+        """
+        logger.info(f"🔍 Buscando ou criando pasta do caso: '{nome_caso}'...")
+
+        try:
+            # Tenta buscar a pasta existente
+            pasta = self.buscar_arquivo_por_nome(nome_caso, self.RAIZ)
+            if pasta and pasta.get('folder'):
+                logger.info(f"✅ Pasta do caso encontrada: {pasta['id']}")
+                return pasta['id']
+
+            # Se não existe, cria
+            logger.info(f"📁 Criando nova pasta: '{nome_caso}'...")
+            folder_id = self.criar_pasta_caso(nome_caso)
+            return folder_id
+
+        except Exception as e:
+            logger.error(f"❌ Erro ao obter/criar pasta do caso: {e}")
+            raise
+
+    def invalidar_cache(self):
+        """Descarta estado resolvido sob demanda (IDs etc.). Nada a fazer por padrão."""
+
+    # =========================================================================
+    # ALIASES (compatibilidade com as views)
+    # =========================================================================
+
+    def criar_pasta(self, nome_pasta: str, pasta_pai_id: str) -> Dict:
+        """
+        Alias universal para criar pasta (detecta se é raiz ou subpasta).
+        """
+        if pasta_pai_id == self.RAIZ:
+            return {'id': self.criar_pasta_caso(nome_pasta)}
+        else:
+            return self.criar_subpasta(pasta_pai_id, nome_pasta)
+
+    def fazer_upload(self, arquivo, pasta_id: str) -> Dict:
+        """
+        Faz upload de um arquivo Django (InMemoryUploadedFile ou TemporaryUploadedFile).
+        """
+        logger.info(f"📤 Upload: {arquivo.name} -> pasta {pasta_id}")
+        arquivo.seek(0)  # Garante que está no início
+        return self.upload_arquivo(pasta_id, arquivo.name, arquivo.read())
+
+    def baixar_arquivo(self, item_id: str) -> bytes:
+        """
+        Alias para download_arquivo (para compatibilidade).
+        """
+        return self.download_arquivo(item_id)
+
+    def obter_info_arquivo(self, item_id: str) -> Dict:
+        """
+        Alias para get_item_details (para compatibilidade).
+        """
+        return self.get_item_details(item_id)
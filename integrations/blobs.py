@@ -0,0 +1,260 @@
+# integrations/blobs.py
+import os
+import mmap
+import time
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class GravacaoBlob:
+    """
+    Conteúdo de um arquivo sendo gravado no cache de blobs, em blocos.
+    `concluir()` publica o blob; `descartar()` apaga o parcial.
+    """
+
+    def __init__(self, blobs: 'CacheBlobs', item_id: str, ctag: str):
+        self.blobs = blobs
+        self.item_id = item_id
+        self.ctag = ctag
+        self._hash = hashlib.sha256()
+        self._tamanho = 0
+        blobs.raiz_objetos.mkdir(parents=True, exist_ok=True)
+        self._temporario = blobs.raiz_objetos / f'.{os.getpid()}.{threading.get_ident()}.{time.monotonic_ns()}.parcial'
+        self._arquivo = open(self._temporario, 'wb')
+
+    def write(self, bloco: bytes):
+        self._arquivo.write(bloco)
+        self._hash.update(bloco)
+        self._tamanho += len(bloco)
+
+    def concluir(self) -> Path:
+        self._arquivo.close()
+        return self.blobs._publicar(self.item_id, self.ctag, self._temporario, self._hash.hexdigest(), self._tamanho)
+
+    def descartar(self):
+        self._arquivo.close()
+        self._temporario.unlink(missing_ok=True)
+
+
+class CacheBlobs:
+    """
+    Cache em disco do conteúdo dos arquivos do drive, endereçado por conteúdo.
+
+    Cada versão de item (ID + cTag) aponta para um objeto nomeado pelo SHA-256
+    do conteúdo, então arquivos iguais em pastas diferentes ocupam espaço uma
+    vez só. Enquanto o cTag não muda, o arquivo nunca é baixado de novo.
+
+    Os objetos são lidos por mmap (sem copiar o conteúdo para a memória do
+    processo) e removidos por LRU quando o cache passa do limite de tamanho, ou
+    quando ficam sem uso por mais que a idade máxima.
+    """
+
+    TAMANHO_BLOCO = 256 * 1024
+    # Intervalo mínimo entre duas varreduras de limpeza (quando não há estouro)
+    INTERVALO_LIMPEZA = 10 * 60
+
+    def __init__(self, sp, raiz: Optional[Path] = None, limite_bytes: Optional[int] = None,
+                 idade_max_segundos: Optional[int] = None):
+        self.sp = sp
+        self.raiz = Path(raiz or getattr(settings, 'BLOBS_RAIZ', None) or Path(settings.MEDIA_ROOT) / 'blobs')
+        self.raiz_objetos = self.raiz / 'objetos'
+        self.raiz_indice = self.raiz / 'itens'
+        self.limite_bytes = limite_bytes or getattr(settings, 'BLOBS_LIMITE_MB', 2048) * 1024 * 1024
+        self.idade_max = idade_max_segundos or getattr(settings, 'BLOBS_IDADE_MAX_DIAS', 30) * 24 * 60 * 60
+        self._lock_limpeza = threading.Lock()
+        self._total_estimado = None
+        self._ultima_limpeza = 0.0
+
+    # -------------------------------------------------------------------------
+    # Caminhos
+    # -------------------------------------------------------------------------
+
+    def _caminho_indice(self, item_id: str, ctag: str) -> Path:
+        chave = hashlib.sha1(f'{self.sp.drive_id}:{item_id}:{ctag}'.encode()).hexdigest()
+        return self.raiz_indice / chave[:2] / chave
+
+    def _caminho_objeto(self, sha256: str) -> Path:
+        return self.raiz_objetos / sha256[:2] / sha256
+
+    # -------------------------------------------------------------------------
+    # Leitura
+    # -------------------------------------------------------------------------
+
+    def detalhes_atuais(self, item_id: str) -> Dict:
+        """Metadados do item segundo o cache de pastas, já com o delta aplicado."""
+        cache_pastas = self.sp.cache_pastas
+        cache_pastas.sincronizar()
+        return cache_pastas.detalhes(item_id)
+
+    @staticmethod
+    def versao(detalhes: Dict) -> str:
+        return detalhes.get('cTag') or detalhes.get('eTag') or ''
+
+    def localizar(self, item_id: str, ctag: str) -> Optional[Path]:
+        """Objeto em cache desta versão do item, ou None."""
+        indice = self._caminho_indice(item_id, ctag)
+        try:
+            sha256 = indice.read_text().strip()
+        except FileNotFoundError:
+            return None
+
+        objeto = self._caminho_objeto(sha256)
+        try:
+            os.utime(objeto)  # Marca como usado recentemente (LRU)
+        except FileNotFoundError:
+            indice.unlink(missing_ok=True)  # O objeto foi removido pela limpeza
+            return None
+        return objeto
+
+    def obter_caminho(self, item_id: str, ctag: Optional[str] = None) -> Path:
+        """Caminho do conteúdo do item em disco, baixando-o se ainda não estiver no cache."""
+        ctag = ctag or self.versao(self.detalhes_atuais(item_id))
+        objeto = self.localizar(item_id, ctag)
+        if objeto is not None:
+            logger.debug(f"⚡ Conteúdo de {item_id} servido do cache de blobs")
+            return objeto
+
+        metadados, resposta = self.sp.abrir_download(item_id)
+        # Se o item mudou desde a consulta, vale a versão que realmente veio
+        gravacao = GravacaoBlob(self, item_id, self.versao(metadados) or ctag)
+        try:
+            for bloco in resposta.iter_content(chunk_size=self.TAMANHO_BLOCO):
+                if bloco:
+                    gravacao.write(bloco)
+        except Exception:
+            gravacao.descartar()
+            raise
+        finally:
+            resposta.close()
+        return gravacao.concluir()
+
+    @contextmanager
+    def abrir(self, item_id: str, ctag: Optional[str] = None) -> Iterator[memoryview]:
+        """
+        Conteúdo do item como memoryview somente leitura sobre um mmap do
+        objeto em cache. A view não pode ser usada depois do bloco `with`.
+        """
+        caminho = self.obter_caminho(item_id, ctag)
+        with open(caminho, 'rb') as arquivo:
+            if os.fstat(arquivo.fileno()).st_size == 0:
+                yield memoryview(b'')
+                return
+            with mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ) as mapa:
+                with memoryview(mapa) as conteudo:
+                    yield conteudo
+
+    def ler(self, item_id: str, ctag: Optional[str] = None) -> bytes:
+        """Conteúdo do item como bytes (para quem precisa de uma cópia própria)."""
+        return self.obter_caminho(item_id, ctag).read_bytes()
+
+    # -------------------------------------------------------------------------
+    # Escrita
+    # -------------------------------------------------------------------------
+
+    def gravador(self, item_id: str, ctag: str) -> GravacaoBlob:
+        """Grava no cache um conteúdo que já está sendo baixado por outro caminho."""
+        return GravacaoBlob(self, item_id, ctag)
+
+    def _publicar(self, item_id: str, ctag: str, temporario: Path, sha256: str, tamanho: int) -> Path:
+        objeto = self._caminho_objeto(sha256)
+        objeto.parent.mkdir(parents=True, exist_ok=True)
+        if objeto.exists():
+            temporario.unlink(missing_ok=True)  # Mesmo conteúdo já em cache (outro item ou outra versão)
+            os.utime(objeto)
+        else:
+            os.replace(temporario, objeto)
+            if self._total_estimado is not None:
+                self._total_estimado += tamanho
+
+        indice = self._caminho_indice(item_id, ctag)
+        indice.parent.mkdir(parents=True, exist_ok=True)
+        indice_temporario = indice.with_suffix(f'.{threading.get_ident()}.parcial')
+        indice_temporario.write_text(sha256)
+        os.replace(indice_temporario, indice)
+        logger.debug(f"💾 Conteúdo de {item_id} guardado no cache de blobs ({tamanho} bytes)")
+
+        self._aplicar_limites()
+        return objeto
+
+    # -------------------------------------------------------------------------
+    # Limpeza
+    # -------------------------------------------------------------------------
+
+    def _aplicar_limites(self):
+        """Remove objetos sem uso há mais que a idade máxima e, se preciso, os mais antigos até caber no limite."""
+        estourou = self._total_estimado is not None and self._total_estimado > self.limite_bytes
+        if not estourou and time.monotonic() - self._ultima_limpeza < self.INTERVALO_LIMPEZA:
+            return
+        if not self._lock_limpeza.acquire(blocking=False):
+            return  # Outra thread já está limpando
+        try:
+            self._ultima_limpeza = time.monotonic()
+            agora = time.time()
+            objetos = []
+            total = 0
+            removidos = 0
+            for caminho in self.raiz_objetos.glob('*/*'):
+                try:
+                    info = caminho.stat()
+                except FileNotFoundError:
+                    continue
+                if agora - info.st_mtime > self.idade_max:
+                    caminho.unlink(missing_ok=True)
+                    removidos += 1
+                    continue
+                objetos.append((info.st_mtime, info.st_size, caminho))
+                total += info.st_size
+
+            if total > self.limite_bytes:
+                for _, tamanho, caminho in sorted(objetos):
+                    if total <= self.limite_bytes * 0.9:  # Folga para não limpar a cada gravação
+                        break
+                    caminho.unlink(missing_ok=True)
+                    total -= tamanho
+                    removidos += 1
+
+            # Gravações interrompidas (ex: processo encerrado no meio do download)
+            for parcial in self.raiz_objetos.glob('.*.parcial'):
+                try:
+                    if agora - parcial.stat().st_mtime > 24 * 60 * 60:
+                        parcial.unlink(missing_ok=True)
+                except FileNotFoundError:
+                    continue
+
+            self._total_estimado = total
+            if removidos:
+                self._remover_indices_orfaos()
+                logger.info(f"🧹 {removidos} blob(s) removido(s) do cache em disco")
+        finally:
+            self._lock_limpeza.release()
+
+    def _remover_indices_orfaos(self):
+        for indice in self.raiz_indice.glob('*/*'):
+            try:
+                if not self._caminho_objeto(indice.read_text().strip()).exists():
+                    indice.unlink(missing_ok=True)
+            except (FileNotFoundError, ValueError):
+                continue
+
+
+_blobs = None
+_blobs_lock = threading.Lock()
+
+
+def obter_cache_blobs() -> CacheBlobs:
+    """Cache de blobs compartilhado do processo (sobre o backend configurado)."""
+    global _blobs
+    if _blobs is None:
+        with _blobs_lock:
+            if _blobs is None:
+                from .sharepoint import obter_sharepoint
+                _blobs = CacheBlobs(obter_sharepoint())
+    return _blobs
@@ -0,0 +1,301 @@
+# integrations/cache_pastas.py
+import os
+import time
+import hashlib
+import logging
+from typing import Dict, Iterator, List, Optional
+
+import requests
+from django.core.cache import cache as cache_padrao
+
+logger = logging.getLogger(__name__)
+
+
+class CachePastas:
+    """
+    Cache do conteúdo das pastas do SharePoint, chaveado pelo ID do driveItem.
+
+    As listagens ficam no cache do Django (Redis em produção). Antes de servir
+    uma pasta do cache, aplicamos as mudanças do drive vindas do endpoint
+    /delta: só os itens alterados (cTag/eTag diferentes) são atualizados na
+    listagem em cache, sem listar a pasta de novo. Escritas feitas pelo próprio
+    sistema (upload, exclusão, criação de pasta) invalidam a pasta na hora.
+    """
+
+    TTL = int(os.getenv('SHAREPOINT_CACHE_PASTAS_TTL', str(60 * 60 * 6)))
+    # Intervalo mínimo entre duas consultas ao /delta (entre todos os workers)
+    INTERVALO_DELTA = int(os.getenv('SHAREPOINT_DELTA_INTERVALO', '15'))
+    # Por quanto tempo a geração lida do cache vale neste processo (evita uma
+    # ida ao Redis por chave montada; um descarte feito por outro worker é
+    # percebido aqui em até TTL_GERACAO segundos)
+    TTL_GERACAO = 5
+
+    def __init__(self, sp, cache=None):
+        self.sp = sp
+        self.cache = cache or cache_padrao
+        self._geracao = (None, 0.0)  # (geração, lida em)
+        self._raiz_id = None
+        self._raiz_tentar_em = 0.0
+
+    # -------------------------------------------------------------------------
+    # Chaves
+    # -------------------------------------------------------------------------
+
+    def _prefixo(self) -> str:
+        # A "geração" permite descartar o cache inteiro (ex: delta expirado)
+        # sem precisar apagar chave por chave.
+        geracao, lida_em = self._geracao
+        if geracao is None or time.monotonic() - lida_em > self.TTL_GERACAO:
+            geracao = self.cache.get_or_set(f'sp:{self.sp.drive_id}:geracao', 1, None)
+            self._geracao = (geracao, time.monotonic())
+        return f'sp:{self.sp.drive_id}:{geracao}'
+
+    def _id_raiz(self) -> Optional[str]:
+        """ID real do item raiz do drive (o /delta informa este, não 'root')."""
+        if self._raiz_id is None:
+            chave = f'sp:{self.sp.drive_id}:raiz_id'
+            raiz_id = self.cache.get(chave)
+            if raiz_id is None:
+                if time.monotonic() < self._raiz_tentar_em:
+                    return None
+                try:
+                    raiz_id = self.sp.get_item_details(self.sp.RAIZ)['id']
+                except Exception as e:
+                    self._raiz_tentar_em = time.monotonic() + 60
+                    logger.warning(f"⚠️ Não foi possível obter o ID da raiz do drive: {e}")
+                    return None
+                self.cache.set(chave, raiz_id, None)
+            self._raiz_id = raiz_id
+        return self._raiz_id
+
+    def _pasta(self, folder_id: Optional[str]) -> Optional[str]:
+        """A raiz fica em cache como RAIZ ('root'), seja qual for o ID usado para ela."""
+        if folder_id and folder_id != self.sp.RAIZ and folder_id == self._id_raiz():
+            return self.sp.RAIZ
+        return folder_id
+
+    def _chave_pasta(self, folder_id: str) -> str:
+        return f'{self._prefixo()}:pasta:{self._pasta(folder_id)}'
+
+    def _chave_item(self, item_id: str) -> str:
+        return f'{self._prefixo()}:item:{item_id}'
+
+    def _chave_pai(self, item_id: str) -> str:
+        return f'{self._prefixo()}:pai:{item_id}'
+
+    def _chave_nome(self, folder_id: str, nome: str) -> str:
+        # Nomes no SharePoint não diferenciam maiúsculas; o hash evita espaços na chave
+        nome_hash = hashlib.sha1(nome.strip().lower().encode()).hexdigest()
+        return f'{self._prefixo()}:nome:{self._pasta(folder_id)}:{nome_hash}'
+
+    def _chave_delta(self) -> str:
+        return f'sp:{self.sp.drive_id}:delta_link'
+
+    def _chave_versao_arvore(self) -> str:
+        return f'sp:{self.sp.drive_id}:versao_arvore'
+
+    # -------------------------------------------------------------------------
+    # Leitura
+    # -------------------------------------------------------------------------
+
+    def listar(self, folder_id: str) -> List[Dict]:
+        """Retorna o conteúdo da pasta, do cache quando possível."""
+        return list(self.iterar(folder_id))
+
+    def iterar(self, folder_id: str) -> Iterator[Dict]:
+        """
+        Entrega os itens da pasta. Em caso de cache miss, repassa as páginas do
+        Graph conforme chegam e grava a listagem completa no final.
+        """
+        self.sincronizar()
+
+        chave = self._chave_pasta(folder_id)
+        itens = self.cache.get(chave)
+        if itens is not None:
+            logger.debug(f"⚡ Pasta {folder_id} servida do cache ({len(itens)} itens)")
+            yield from itens
+            return
+
+        itens = []
+        for item in self.sp.iterar_conteudo_pasta(folder_id):
+            itens.append(item)
+            yield item
+        self.gravar_pasta(folder_id, itens)
+
+    def detalhes(self, item_id: str) -> Dict:
+        """Metadados de um item (ex: nome da pasta atual), do cache quando possível."""
+        detalhes = self.obter_detalhes(item_id)
+        if detalhes is None:
+            detalhes = self.sp.get_item_details(item_id)
+            self.gravar_detalhes(item_id, detalhes)
+        return detalhes
+
+    def obter_pasta(self, folder_id: str) -> Optional[List[Dict]]:
+        """Só o que está em cache (após aplicar o delta); None em caso de miss."""
+        self.sincronizar()
+        return self.cache.get(self._chave_pasta(folder_id))
+
+    def obter_detalhes(self, item_id: str) -> Optional[Dict]:
+        return self.cache.get(self._chave_item(item_id))
+
+    def gravar_pasta(self, folder_id: str, itens: List[Dict]):
+        folder_id = self._pasta(folder_id)
+        self.cache.set(self._chave_pasta(folder_id), itens, self.TTL)
+        # Índice item -> pasta pai, usado para invalidar a partir do ID do item
+        indices = {self._chave_pai(item['id']): folder_id for item in itens}
+        # Índice (pasta, nome) -> item, usado nas buscas por nome
+        indices.update({self._chave_nome(folder_id, item['name']): item for item in itens if item.get('name')})
+        self.cache.set_many(indices, self.TTL)
+
+    def gravar_detalhes(self, item_id: str, detalhes: Dict):
+        self.cache.set(self._chave_item(item_id), detalhes, self.TTL)
+
+    # -------------------------------------------------------------------------
+    # Índice de nomes
+    # -------------------------------------------------------------------------
+
+    def buscar_nome(self, folder_id: str, nome: str) -> Optional[Dict]:
+        """Item com este nome na pasta, segundo o índice local (sem consultar o backend)."""
+        return self.cache.get(self._chave_nome(folder_id, nome))
+
+    def registrar_nome(self, folder_id: str, item: Dict):
+        if item.get('name'):
+            self.cache.set(self._chave_nome(folder_id, item['name']), item, self.TTL)
+
+    def remover_nome(self, folder_id: str, nome: str):
+        self.cache.delete(self._chave_nome(folder_id, nome))
+
+    # -------------------------------------------------------------------------
+    # Invalidação explícita (escritas locais)
+    # -------------------------------------------------------------------------
+
+    def invalidar_pasta(self, folder_id: Optional[str]):
+        if not folder_id:
+            return
+        self.cache.delete_many([self._chave_pasta(folder_id), self._chave_item(folder_id)])
+        self._nova_versao_arvore()
+        logger.debug(f"♻️ Cache da pasta {folder_id} invalidado")
+
+    def invalidar_item(self, item_id: str):
+        """Invalida o item e a pasta que o contém (se conhecida)."""
+        pai = self.cache.get(self._chave_pai(item_id))
+        self.cache.delete_many([self._chave_item(item_id), self._chave_pasta(item_id), self._chave_pai(item_id)])
+        self.invalidar_pasta(pai)
+
+    def versao_arvore(self) -> int:
+        """
+        Contador que muda a cada alteração conhecida no drive (delta ou escrita
+        local). Entra na chave das árvores em cache, que dependem de várias pastas.
+        """
+        return self.cache.get_or_set(self._chave_versao_arvore(), 1, None)
+
+    def _nova_versao_arvore(self):
+        try:
+            self.cache.incr(self._chave_versao_arvore())
+        except ValueError:
+            self.cache.set(self._chave_versao_arvore(), 1, None)
+
+    def invalidar_tudo(self):
+        try:
+            self.cache.incr(f'sp:{self.sp.drive_id}:geracao')
+        except ValueError:
+            self.cache.set(f'sp:{self.sp.drive_id}:geracao', 1, None)
+        self._geracao = (None, 0.0)
+        logger.info("♻️ Cache de pastas do SharePoint descartado por completo")
+
+    # -------------------------------------------------------------------------
+    # Sincronização via /delta
+    # -------------------------------------------------------------------------
+
+    def sincronizar(self, forcar: bool = False) -> int:
+        """
+        Aplica no cache as mudanças do drive desde a última consulta ao /delta.
+
+        Roda no máximo uma vez a cada INTERVALO_DELTA segundos (o `cache.add`
+        funciona como trava entre workers). Retorna o número de itens alterados.
+        """
+        if not forcar and not self.cache.add(f'sp:{self.sp.drive_id}:delta_trava', 1, self.INTERVALO_DELTA):
+            return 0
+
+        delta_link = self.cache.get(self._chave_delta())
+        try:
+            itens, novo_delta_link = self.sp.consultar_delta(delta_link)
+        except requests.exceptions.HTTPError as e:
+            if e.response is not None and e.response.status_code == 410:
+                # Token expirado: o Graph exige uma ressincronização completa
+                logger.warning("⚠️ Token de delta expirado. Descartando o cache de pastas.")
+                self.invalidar_tudo()
+                self.cache.delete(self._chave_delta())
+                return 0
+            logger.warning(f"⚠️ Falha ao consultar delta do SharePoint: {e}")
+            return 0
+        except Exception as e:
+            logger.warning(f"⚠️ Falha ao consultar delta do SharePoint: {e}")
+            return 0
+
+        alterados = 0
+        if delta_link:
+            for item in itens:
+                if self._aplicar_mudanca(item):
+                    alterados += 1
+            if itens:
+                # Mesmo itens de pastas fora do cache podem fazer parte de uma árvore em cache
+                self._nova_versao_arvore()
+
+        self.cache.set(self._chave_delta(), novo_delta_link, None)
+        if alterados:
+            logger.info(f"🔄 Delta do SharePoint aplicado: {alterados} item(ns) alterado(s)")
+        return alterados
+
+    def _aplicar_mudanca(self, bruto: Dict) -> bool:
+        """Atualiza a listagem em cache da pasta pai com um item vindo do /delta."""
+        item_id = bruto.get('id')
+        removido = 'deleted' in bruto
+        item = self.sp._processar_item(bruto)
+        novo_pai = self._pasta(item.get('parentId'))
+        pai_anterior = self.cache.get(self._chave_pai(item_id))
+        alterou = False
+
+        # Item movido (ou excluído): sai da listagem da pasta antiga
+        if pai_anterior and (removido or pai_anterior != novo_pai):
+            alterou |= self._remover_da_pasta(pai_anterior, item_id)
+
+        if removido:
+            self.cache.delete_many([self._chave_item(item_id), self._chave_pai(item_id), self._chave_pasta(item_id)])
+            return alterou
+
+        if novo_pai:
+            chave = self._chave_pasta(novo_pai)
+            itens = self.cache.get(chave)
+            if itens is not None:
+                atual = next((i for i in itens if i['id'] == item_id), None)
+                if atual is None:
+                    itens.append(item)
+                    alterou = True
+                elif (atual.get('cTag'), atual.get('eTag')) != (item.get('cTag'), item.get('eTag')):
+                    itens[itens.index(atual)] = item
+                    alterou = True
+                    if atual.get('name') != item.get('name'):
+                        self.remover_nome(novo_pai, atual['name'])  # Renomeado
+                if alterou:
+                    self.cache.set(chave, itens, self.TTL)
+                    self.cache.set(self._chave_pai(item_id), novo_pai, self.TTL)
+            self.registrar_nome(novo_pai, item)
+
+        # Os detalhes do item podem estar em cache mesmo sem a pasta estar
+        self.cache.delete(self._chave_item(item_id))
+        return alterou
+
+    def _remover_da_pasta(self, folder_id: str, item_id: str) -> bool:
+        chave = self._chave_pasta(folder_id)
+        itens = self.cache.get(chave)
+        if itens is None:
+            return False
+        restantes = [i for i in itens if i['id'] != item_id]
+        if len(restantes) == len(itens):
+            return False
+        self.cache.set(chave, restantes, self.TTL)
+        for removido in itens:
+            if removido['id'] == item_id and removido.get('name'):
+                self.remover_nome(folder_id, removido['name'])
+        return True
@@ -0,0 +1,278 @@
+# integrations/emails.py
+import time
+import logging
+import smtplib
+from datetime import timedelta
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.db.models import Q
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .agendamento import agendar_proxima_rodada
+from .models import EmailPendente
+
+logger = logging.getLogger(__name__)
+
+# Espera antes da 2ª tentativa; dobra a cada falha
+ESPERA_BASE_SEGUNDOS = 60
+CHAVE_TRAVA_ENVIO = 'emails:enviando'
+CHAVE_AGENDAMENTO = 'emails:agendado'
+CHAVE_AGENDAMENTO_RESUMOS = 'emails:resumos_agendados'
+CHAVE_NOVA_TENTATIVA = 'emails:nova_tentativa'
+# Atraso do envio após enfileirar, para juntar as mensagens de uma rajada num lote só
+ATRASO_AGENDAMENTO = 2
+
+# Tipos de resumo: template do e-mail e assunto (recebe a quantidade de itens)
+RESUMOS = {
+    'novos_casos': ('emails/resumo_novos_casos.html', 'Resumo: {total} novo(s) caso(s) criado(s)'),
+}
+
+
+def enfileirar_email(assunto: str, destinatarios: List[str], texto: str = '', html: str = '',
+                     remetente: Optional[str] = None, chave: Optional[str] = None,
+                     resumo: str = '', dados: Optional[Dict] = None) -> EmailPendente:
+    """
+    Coloca um e-mail na fila; o envio é feito por um worker depois do commit.
+
+    :param chave: Identifica a mensagem; enfileirar de novo com a mesma chave não duplica o envio.
+    :param resumo: Tipo de resumo (ver RESUMOS). A mensagem entra num e-mail de
+                   resumo em vez de sair sozinha; `dados` vai para o template.
+    """
+    campos = {
+        'assunto': assunto[:255],
+        'destinatarios': list(destinatarios),
+        'corpo_texto': texto,
+        'corpo_html': html,
+        'remetente': remetente or settings.EMAIL_HOST_USER or '',
+        'resumo': resumo,
+        'dados': dados or {},
+    }
+    if chave:
+        mensagem, criada = EmailPendente.objects.get_or_create(chave=chave, defaults=campos)
+    else:
+        mensagem, criada = EmailPendente.objects.create(**campos), True
+    if criada:
+        transaction.on_commit(agendar_resumos if resumo else agendar_envio)
+    return mensagem
+
+
+def agendar_envio():
+    """Agenda uma rodada de envio (uma só para várias mensagens enfileiradas em sequência)."""
+    if not cache.add(CHAVE_AGENDAMENTO, 1, ATRASO_AGENDAMENTO + 3):
+        return
+    from .tasks import enviar_emails_pendentes
+    try:
+        enviar_emails_pendentes.apply_async(countdown=ATRASO_AGENDAMENTO)
+    except Exception as e:
+        # Broker fora do ar: a tarefa periódica envia depois
+        logger.warning(f"⚠️ Não foi possível agendar o envio de e-mails ({e}). Fica para a tarefa periódica.")
+
+
+def agendar_resumos():
+    """Agenda uma rodada de envio para quando fechar a janela do resumo pendente mais antigo."""
+    from .tasks import enviar_emails_pendentes
+    agendar_proxima_rodada(
+        enviar_emails_pendentes, CHAVE_AGENDAMENTO_RESUMOS,
+        EmailPendente.objects.filter(status='PENDENTE').exclude(resumo=''),
+        campo='criado_em', apos=timedelta(minutes=settings.EMAIL_RESUMO_JANELA_MINUTOS),
+    )
+
+
+def agendar_nova_tentativa():
+    """Agenda uma rodada de envio para quando vencer a próxima nova tentativa."""
+    from .tasks import enviar_emails_pendentes
+    agendar_proxima_rodada(
+        enviar_emails_pendentes, CHAVE_NOVA_TENTATIVA,
+        EmailPendente.objects.filter(status='PENDENTE', resumo='', proxima_tentativa_em__isnull=False),
+    )
+
+
+# -----------------------------------------------------------------------------
+# Resumos
+# -----------------------------------------------------------------------------
+
+def montar_resumos(forcar: bool = False) -> int:
+    """
+    Junta as mensagens de resumo pendentes (por tipo e destinatários) em
+    e-mails de resumo, quando o grupo chega a EMAIL_RESUMO_MAX_ITENS ou a
+    mais antiga passa da janela de EMAIL_RESUMO_JANELA_MINUTOS.
+
+    :return: Quantidade de e-mails de resumo criados.
+    """
+    max_itens = max(1, settings.EMAIL_RESUMO_MAX_ITENS)
+    limite_janela = timezone.now() - timedelta(minutes=settings.EMAIL_RESUMO_JANELA_MINUTOS)
+
+    grupos: Dict[tuple, List[EmailPendente]] = {}
+    for mensagem in EmailPendente.objects.filter(status='PENDENTE').exclude(resumo='').order_by('id'):
+        grupos.setdefault((mensagem.resumo, tuple(mensagem.destinatarios), mensagem.remetente), []).append(mensagem)
+
+    criados = 0
+    for (resumo, destinatarios, remetente), mensagens in grupos.items():
+        if resumo not in RESUMOS:
+            logger.error(f"❌ Tipo de resumo desconhecido: '{resumo}'. {len(mensagens)} mensagem(ns) ignorada(s).")
+            continue
+        template, assunto = RESUMOS[resumo]
+        for inicio in range(0, len(mensagens), max_itens):
+            parte = mensagens[inicio:inicio + max_itens]
+            if len(parte) < max_itens and parte[0].criado_em > limite_janela and not forcar:
+                break  # Ainda pode crescer: espera encher ou a janela fechar
+            with transaction.atomic():
+                EmailPendente.objects.create(
+                    assunto=assunto.format(total=len(parte)),
+                    remetente=remetente,
+                    destinatarios=list(destinatarios),
+                    corpo_html=render_to_string(template, {'itens': [m.dados for m in parte]}),
+                )
+                EmailPendente.objects.filter(pk__in=[m.pk for m in parte]).update(status='AGRUPADO')
+            criados += 1
+            logger.info(f"📧 Resumo '{resumo}' montado com {len(parte)} item(ns) para {', '.join(destinatarios)}")
+    return criados
+
+
+# -----------------------------------------------------------------------------
+# Envio
+# -----------------------------------------------------------------------------
+
+class EnvioEmails:
+    """
+    Envia a fila usando uma conexão SMTP por lote de EMAIL_FILA_LOTE mensagens
+    (uma negociação TLS por lote, não por e-mail), respeitando o limite de
+    EMAIL_FILA_MAX_POR_MINUTO. Uma trava no cache garante um só remetente por
+    vez, então o limite vale para todos os workers juntos.
+    """
+
+    def __init__(self, backend: Optional[str] = None, lote: Optional[int] = None,
+                 max_por_minuto: Optional[int] = None, max_tentativas: Optional[int] = None):
+        self.backend = backend or settings.EMAIL_FILA_BACKEND
+        self.lote = max(1, lote or settings.EMAIL_FILA_LOTE)
+        max_por_minuto = settings.EMAIL_FILA_MAX_POR_MINUTO if max_por_minuto is None else max_por_minuto
+        self.intervalo = 60.0 / max_por_minuto if max_por_minuto > 0 else 0.0
+        self.max_tentativas = max_tentativas or settings.EMAIL_FILA_MAX_TENTATIVAS
+        self._ultimo_envio = 0.0
+        self.conexoes_abertas = 0
+
+    def _pendentes(self):
+        return EmailPendente.objects.filter(status='PENDENTE', resumo='').filter(
+            Q(proxima_tentativa_em__isnull=True) | Q(proxima_tentativa_em__lte=timezone.now())
+        ).order_by('id')
+
+    def enviar_pendentes(self, tempo_max: float = 240) -> Dict[str, int]:
+        """
+        Monta os resumos vencidos e envia a fila, lote a lote, até esvaziá-la
+        ou passar de `tempo_max` segundos (o resto fica para a próxima rodada).
+
+        :return: Contagem {'enviados': n, 'falhas': n}
+        """
+        resultado = {'enviados': 0, 'falhas': 0}
+        if not cache.add(CHAVE_TRAVA_ENVIO, 1, int(tempo_max) + 60):
+            logger.debug("⏭️ Envio de e-mails já em andamento em outro worker.")
+            return resultado
+        try:
+            montar_resumos()
+            agendar_resumos()  # Resumos que ainda não fecharam a janela
+            limite = time.monotonic() + tempo_max
+            while time.monotonic() < limite:
+                mensagens = list(self._pendentes()[:self.lote])
+                if not mensagens:
+                    break
+                self._enviar_lote(mensagens, resultado)
+        finally:
+            cache.delete(CHAVE_TRAVA_ENVIO)
+        agendar_nova_tentativa()  # Mensagens que falharam e esperam a vez
+        if resultado['enviados'] or resultado['falhas']:
+            logger.info(f"📧 Fila de e-mails: {resultado['enviados']} enviado(s), {resultado['falhas']} falha(s), "
+                        f"{self.conexoes_abertas} conexão(ões) aberta(s)")
+        return resultado
+
+    def _enviar_lote(self, mensagens: List[EmailPendente], resultado: Dict[str, int]):
+        conexao = get_connection(self.backend, fail_silently=False)
+        try:
+            conexao.open()
+            self.conexoes_abertas += 1
+        except Exception as e:
+            # Sem conexão, o lote inteiro fica para depois
+            logger.error(f"❌ Não foi possível conectar ao servidor de e-mail: {e}")
+            for mensagem in mensagens:
+                self._registrar_falha(mensagem, e)
+            resultado['falhas'] += len(mensagens)
+            return
+
+        try:
+            for posicao, mensagem in enumerate(mensagens):
+                self._respeitar_limite()
+                try:
+                    self._enviar(mensagem, conexao)
+                except smtplib.SMTPServerDisconnected:
+                    # O servidor fechou a sessão (ex: limite de mensagens por conexão): reabre e tenta uma vez
+                    conexao.close()
+                    try:
+                        conexao.open()
+                    except Exception as e:
+                        # Servidor ainda fora do ar: o resto do lote fica para depois
+                        logger.error(f"❌ Não foi possível reconectar ao servidor de e-mail: {e}")
+                        restantes = mensagens[posicao:]
+                        for restante in restantes:
+                            self._registrar_falha(restante, e)
+                        resultado['falhas'] += len(restantes)
+                        return
+                    self.conexoes_abertas += 1
+                    try:
+                        self._enviar(mensagem, conexao)
+                    except Exception as e:
+                        self._registrar_falha(mensagem, e)
+                        resultado['falhas'] += 1
+                        continue
+                except Exception as e:
+                    self._registrar_falha(mensagem, e)
+                    resultado['falhas'] += 1
+                    continue
+                resultado['enviados'] += 1
+        finally:
+            conexao.close()
+
+    def _respeitar_limite(self):
+        if self.intervalo:
+            espera = self._ultimo_envio + self.intervalo - time.monotonic()
+            if espera > 0:
+                time.sleep(espera)
+        self._ultimo_envio = time.monotonic()
+
+    def _enviar(self, mensagem: EmailPendente, conexao):
+        email = EmailMultiAlternatives(
+            subject=mensagem.assunto,
+            body=mensagem.corpo_texto,
+            from_email=mensagem.remetente or None,
+            to=mensagem.destinatarios,
+            connection=conexao,
+        )
+        if mensagem.corpo_html:
+            email.attach_alternative(mensagem.corpo_html, 'text/html')
+        email.send()
+        mensagem.status = 'ENVIADO'
+        mensagem.enviado_em = timezone.now()
+        mensagem.tentativas += 1
+        mensagem.ultimo_erro = ''
+        mensagem.save(update_fields=['status', 'enviado_em', 'tentativas', 'ultimo_erro'])
+
+    def _registrar_falha(self, mensagem: EmailPendente, erro: Exception):
+        mensagem.tentativas += 1
+        mensagem.ultimo_erro = f"{type(erro).__name__}: {erro}"
+        if mensagem.tentativas >= self.max_tentativas:
+            mensagem.status = 'FALHOU'
+            logger.error(f"❌ E-mail '{mensagem.assunto}' descartado após {mensagem.tentativas} tentativas: {erro}")
+        else:
+            espera = ESPERA_BASE_SEGUNDOS * 2 ** (mensagem.tentativas - 1)
+            mensagem.proxima_tentativa_em = timezone.now() + timedelta(seconds=espera)
+            logger.warning(f"⚠️ Falha ao enviar '{mensagem.assunto}' (tentativa {mensagem.tentativas}): {erro}. "
+                           f"Nova tentativa em {espera}s.")
+        mensagem.save(update_fields=['status', 'tentativas', 'ultimo_erro', 'proxima_tentativa_em'])
+
+
+def enviar_emails_pendentes(**opcoes) -> Dict[str, int]:
+    """Atalho para enviar a fila com as configurações do settings."""
+    return EnvioEmails(**opcoes).enviar_pendentes()
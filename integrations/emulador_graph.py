@@ -0,0 +1,373 @@
+# integrations/emulador_graph.py
+import re
+import json
+import time
+import uuid
+import random
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from .armazenamento_local import ArmazenamentoLocal, RespostaArquivoLocal, RespostaIntervaloInvalido
+
+logger = logging.getLogger(__name__)
+
+
+class ErroGraph(Exception):
+    """Erro devolvido no formato {"error": {"code", "message"}} do Graph."""
+
+    def __init__(self, status: int, codigo: str, mensagem: str):
+        super().__init__(mensagem)
+        self.status = status
+        self.codigo = codigo
+
+
+class EmuladorGraph:
+    """
+    Emulador em processo dos endpoints de drive do Microsoft Graph que o
+    sistema usa, gravando num `ArmazenamentoLocal`.
+
+    Cobre: site/drive, detalhes (por ID ou caminho) e filhos de itens (com
+    paginação), criação de pastas, upload simples e por sessão (Content-Range
+    / nextExpectedRanges), download (com Range), exclusão, preview, /delta e
+    JSON $batch. Com ele o cliente `SharePoint` real roda sem tenant do
+    M365, o que permite medir a vazão de criação de casos, anexos e analyser
+    offline.
+
+    `latencia_ms` simula o tempo de ida e volta do Graph e `taxa_429` devolve
+    uma fração das requisições como throttling (429 + Retry-After), para
+    exercitar as retentativas.
+    """
+
+    def __init__(self, armazenamento: Optional[ArmazenamentoLocal] = None, host: str = '127.0.0.1',
+                 porta: int = 0, latencia_ms: float = 0, taxa_429: float = 0.0):
+        self.armazenamento = armazenamento or ArmazenamentoLocal()
+        self.latencia_ms = latencia_ms
+        self.taxa_429 = taxa_429
+        self._sessoes: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._servidor = ThreadingHTTPServer((host, porta), _criar_handler(self))
+        self._servidor.daemon_threads = True
+        self._thread = None
+
+        self._rotas = [
+            ('GET', r'/sites/[^/]+:/sites/(?P<site>[^/]+)', self._site),
+            ('GET', r'/sites/(?P<site>[^/]+)/drive', self._drive),
+            ('GET', r'/sites/(?P<site>[^/]+)', self._site),
+            ('GET', r'/drives/[^/]+/(?:items/)?(?P<id>[^/:]+):/(?P<caminho>[^:]+):', self._por_caminho),
+            ('GET', r'/drives/[^/]+/(?:items/)?(?P<id>[^/]+)/delta', self._delta),
+            ('GET', r'/drives/[^/]+/(?:items/)?(?P<id>[^/:]+)/children', self._filhos),
+            ('POST', r'/drives/[^/]+/(?:items/)?(?P<id>[^/:]+)/children', self._criar_pasta),
+            ('PUT', r'/drives/[^/]+/items/(?P<id>[^/:]+):/(?P<nome>[^:]+):/content', self._upload),
+            ('POST', r'/drives/[^/]+/items/(?P<id>[^/:]+):/(?P<nome>[^:]+):/createUploadSession', self._criar_sessao),
+            ('GET', r'/drives/[^/]+/items/(?P<id>[^/:]+)/content', self._redirecionar_conteudo),
+            ('POST', r'/drives/[^/]+/items/(?P<id>[^/:]+)/preview', self._preview),
+            ('GET', r'/drives/[^/]+/(?:items/)?(?P<id>[^/:]+)', self._detalhes),
+            ('DELETE', r'/drives/[^/]+/items/(?P<id>[^/:]+)', self._excluir),
+            ('POST', r'/\$batch', self._lote),
+            ('GET', r'/_conteudo/(?P<id>[^/]+)', self._conteudo),
+            ('GET', r'/_sessoes/(?P<sessao>[^/]+)', self._estado_sessao),
+            ('PUT', r'/_sessoes/(?P<sessao>[^/]+)', self._enviar_pedaco),
+            ('DELETE', r'/_sessoes/(?P<sessao>[^/]+)', self._cancelar_sessao),
+        ]
+        self._rotas = [(metodo, re.compile(padrao + '$'), funcao) for metodo, padrao, funcao in self._rotas]
+
+    # -------------------------------------------------------------------------
+    # Ciclo de vida
+    # -------------------------------------------------------------------------
+
+    @property
+    def url_base(self) -> str:
+        host, porta = self._servidor.server_address[:2]
+        return f'http://{host}:{porta}'
+
+    @property
+    def url(self) -> str:
+        """URL a usar como graph_url do cliente SharePoint."""
+        return f'{self.url_base}/v1.0'
+
+    def iniciar(self) -> 'EmuladorGraph':
+        """Atende em segundo plano (thread daemon)."""
+        self._thread = threading.Thread(target=self._servidor.serve_forever, name='emulador-graph', daemon=True)
+        self._thread.start()
+        logger.info(f"🧪 Emulador do Graph em {self.url} (raiz: {self.armazenamento.raiz})")
+        return self
+
+    def servir(self):
+        """Atende no thread atual até ser interrompido (Ctrl+C)."""
+        self._servidor.serve_forever()
+
+    def parar(self):
+        self._servidor.shutdown()
+        self._servidor.server_close()
+
+    # -------------------------------------------------------------------------
+    # Roteamento
+    # -------------------------------------------------------------------------
+
+    def despachar(self, metodo: str, url: str, headers: Dict[str, str], corpo: bytes) -> Tuple[int, Dict, object]:
+        """
+        Executa uma requisição e retorna (status, cabeçalhos, corpo), onde o
+        corpo é um dict (JSON), bytes ou uma resposta de arquivo em streaming.
+        """
+        partes = urlsplit(url)
+        caminho = unquote(partes.path)
+        if caminho.startswith('/v1.0'):
+            caminho = caminho[len('/v1.0'):]
+        query = {chave: valores[0] for chave, valores in parse_qs(partes.query).items()}
+
+        for metodo_rota, padrao, funcao in self._rotas:
+            encontrado = padrao.match(caminho)
+            if metodo_rota == metodo and encontrado:
+                try:
+                    return funcao(query=query, headers=headers, corpo=corpo, **encontrado.groupdict())
+                except ErroGraph as e:
+                    return e.status, {}, {'error': {'code': e.codigo, 'message': str(e)}}
+                except FileNotFoundError as e:
+                    return 404, {}, {'error': {'code': 'itemNotFound', 'message': str(e)}}
+                except FileExistsError as e:
+                    return 409, {}, {'error': {'code': 'nameAlreadyExists', 'message': str(e)}}
+                except ValueError as e:
+                    return 400, {}, {'error': {'code': 'invalidRequest', 'message': str(e)}}
+        return 404, {}, {'error': {'code': 'notSupported', 'message': f'{metodo} {caminho} não emulado'}}
+
+    # -------------------------------------------------------------------------
+    # Site / drive
+    # -------------------------------------------------------------------------
+
+    def _site(self, site, **kwargs):
+        return 200, {}, {'id': 'emulador-site', 'displayName': site, 'name': site}
+
+    def _drive(self, site, **kwargs):
+        return 200, {}, {'id': self.armazenamento.drive_id, 'driveType': 'documentLibrary'}
+
+    # -------------------------------------------------------------------------
+    # Itens
+    # -------------------------------------------------------------------------
+
+    def _com_download_url(self, item: Dict) -> Dict:
+        if 'file' in item:
+            item['@microsoft.graph.downloadUrl'] = f"{self.url_base}/_conteudo/{item['id']}"
+        return item
+
+    def _detalhes(self, id, **kwargs):
+        return 200, {}, self._com_download_url(self.armazenamento.get_item_details(id))
+
+    def _por_caminho(self, id, caminho, **kwargs):
+        item = self.armazenamento.obter_item_por_caminho(caminho, id)
+        if item is None:
+            raise FileNotFoundError(f"Caminho inexistente: {caminho}")
+        return 200, {}, self._com_download_url(self.armazenamento.get_item_details(item['id']))
+
+    def _filhos(self, id, query, **kwargs):
+        pasta = self.armazenamento._id_para_caminho(id)
+        if not pasta.is_dir():
+            raise FileNotFoundError(f"Pasta inexistente: {id}")
+        caminhos = sorted((c for c in pasta.iterdir() if not c.name.startswith('.')), key=lambda c: c.name.lower())
+
+        topo = int(query.get('$top', 200))
+        inicio = int(query.get('$skiptoken', 0))
+        pagina = caminhos[inicio:inicio + topo]
+        resposta = {'value': [self._com_download_url(self.armazenamento._item_bruto(c)) for c in pagina]}
+        if inicio + topo < len(caminhos):
+            resposta['@odata.nextLink'] = (
+                f"{self.url}/drives/{self.armazenamento.drive_id}/items/{id}/children"
+                f"?$top={topo}&$skiptoken={inicio + topo}"
+            )
+        return 200, {}, resposta
+
+    def _criar_pasta(self, id, corpo, **kwargs):
+        dados = json.loads(corpo or b'{}')
+        if 'folder' not in dados:
+            raise ValueError("Só a criação de pastas é emulada neste endpoint")
+        nome = dados.get('name', '')
+        if id == self.armazenamento.RAIZ and dados.get('@microsoft.graph.conflictBehavior') == 'rename':
+            item_id = self.armazenamento.criar_pasta_caso(nome)
+            return 201, {}, self.armazenamento.get_item_details(item_id)
+        return 201, {}, self.armazenamento.criar_subpasta(id, nome)
+
+    def _upload(self, id, nome, corpo, **kwargs):
+        return 201, {}, self.armazenamento.upload_arquivo(id, nome, corpo)
+
+    def _excluir(self, id, **kwargs):
+        self.armazenamento.excluir_item(id)
+        return 204, {}, b''
+
+    def _preview(self, id, **kwargs):
+        self.armazenamento.get_item_details(id)
+        return 200, {}, {'getUrl': f'{self.url_base}/_conteudo/{id}'}
+
+    def _redirecionar_conteudo(self, id, **kwargs):
+        return 302, {'Location': f'{self.url_base}/_conteudo/{id}'}, b''
+
+    def _conteudo(self, id, headers, **kwargs):
+        _, resposta = self.armazenamento.abrir_download(id, range_header=headers.get('Range'))
+        return resposta.status_code, dict(resposta.headers, **{'Accept-Ranges': 'bytes'}), resposta
+
+    # -------------------------------------------------------------------------
+    # Sessões de upload
+    # -------------------------------------------------------------------------
+
+    def _criar_sessao(self, id, nome, **kwargs):
+        pasta = self.armazenamento._id_para_caminho(id)
+        if not pasta.is_dir():
+            raise FileNotFoundError(f"Pasta inexistente: {id}")
+        sessao = uuid.uuid4().hex
+        with self._lock:
+            self._sessoes[sessao] = {
+                'folder_id': id,
+                'nome': nome,
+                'recebido': 0,
+                'temporario': pasta / f'.{sessao}.sessao',
+            }
+        return 200, {}, {
+            'uploadUrl': f'{self.url_base}/_sessoes/{sessao}',
+            'nextExpectedRanges': ['0-'],
+        }
+
+    def _obter_sessao(self, sessao: str) -> Dict:
+        dados = self._sessoes.get(sessao)
+        if dados is None:
+            raise ErroGraph(404, 'itemNotFound', 'Sessão de upload inexistente ou expirada')
+        return dados
+
+    def _estado_sessao(self, sessao, **kwargs):
+        dados = self._obter_sessao(sessao)
+        return 200, {}, {'nextExpectedRanges': [f"{dados['recebido']}-"]}
+
+    def _enviar_pedaco(self, sessao, headers, corpo, **kwargs):
+        dados = self._obter_sessao(sessao)
+        intervalo = re.match(r'bytes (\d+)-(\d+)/(\d+)', headers.get('Content-Range', ''))
+        if not intervalo:
+            raise ValueError("Content-Range ausente ou inválido")
+        inicio, fim, total = (int(v) for v in intervalo.groups())
+        if inicio != dados['recebido'] or fim - inicio + 1 != len(corpo):
+            raise ErroGraph(416, 'invalidRange', f"Esperado o byte {dados['recebido']}")
+
+        with open(dados['temporario'], 'ab') as saida:
+            saida.write(corpo)
+        dados['recebido'] = fim + 1
+
+        if dados['recebido'] < total:
+            return 202, {}, {'nextExpectedRanges': [f"{dados['recebido']}-"]}
+
+        with self._lock:
+            self._sessoes.pop(sessao, None)
+        temporario: Path = dados['temporario']
+        try:
+            with open(temporario, 'rb') as entrada:
+                item = self.armazenamento._gravar(
+                    dados['folder_id'], dados['nome'],
+                    lambda saida: saida.write(entrada.read())
+                )
+        finally:
+            temporario.unlink(missing_ok=True)
+        return 201, {}, item
+
+    def _cancelar_sessao(self, sessao, **kwargs):
+        with self._lock:
+            dados = self._sessoes.pop(sessao, None)
+        if dados:
+            dados['temporario'].unlink(missing_ok=True)
+        return 204, {}, b''
+
+    # -------------------------------------------------------------------------
+    # Delta e $batch
+    # -------------------------------------------------------------------------
+
+    def _delta(self, id, query, **kwargs):
+        token = query.get('token')
+        armazenamento = self.armazenamento
+        if token and token != 'latest':
+            itens, link = armazenamento.consultar_delta(f'local-delta:{token}')
+        else:
+            # Sem token o Graph enumera o drive inteiro
+            itens, link = armazenamento.consultar_delta(None, completo=not token)
+        posicao = link.rsplit(':', 1)[1]
+        return 200, {}, {
+            'value': itens,
+            '@odata.deltaLink': f"{self.url}/drives/{armazenamento.drive_id}/root/delta?token={posicao}",
+        }
+
+    def _lote(self, corpo, **kwargs):
+        requisicoes = json.loads(corpo or b'{}').get('requests', [])
+        if len(requisicoes) > 20:
+            raise ValueError("O $batch aceita no máximo 20 requisições")
+        respostas = []
+        for requisicao in requisicoes:
+            sub_corpo = json.dumps(requisicao['body']).encode() if requisicao.get('body') is not None else b''
+            status, headers, corpo_resposta = self.despachar(
+                requisicao['method'].upper(), requisicao['url'], requisicao.get('headers') or {}, sub_corpo
+            )
+            respostas.append({
+                'id': requisicao['id'],
+                'status': status,
+                'headers': headers,
+                'body': corpo_resposta if isinstance(corpo_resposta, dict) else None,
+            })
+        return 200, {}, {'responses': respostas}
+
+
+def _criar_handler(emulador: EmuladorGraph):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'  # keep-alive, como o Graph
+
+        def _atender(self):
+            tamanho = int(self.headers.get('Content-Length') or 0)
+            corpo = self.rfile.read(tamanho) if tamanho else b''
+
+            if emulador.latencia_ms:
+                time.sleep(emulador.latencia_ms / 1000)
+            if emulador.taxa_429 and random.random() < emulador.taxa_429:
+                status, headers, resposta = 429, {'Retry-After': '1'}, {
+                    'error': {'code': 'TooManyRequests', 'message': 'Throttling simulado pelo emulador'}
+                }
+            else:
+                status, headers, resposta = emulador.despachar(self.command, self.path, dict(self.headers), corpo)
+
+            if isinstance(resposta, dict):
+                resposta = json.dumps(resposta).encode()
+                headers.setdefault('Content-Type', 'application/json')
+
+            self.send_response(status)
+            for nome, valor in headers.items():
+                self.send_header(nome, valor)
+            if isinstance(resposta, (RespostaArquivoLocal, RespostaIntervaloInvalido)):
+                self.end_headers()
+                try:
+                    for bloco in resposta.iter_content(256 * 1024):
+                        self.wfile.write(bloco)
+                finally:
+                    resposta.close()
+            else:
+                self.send_header('Content-Length', str(len(resposta)))
+                self.end_headers()
+                self.wfile.write(resposta)
+
+        do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _atender
+
+        def log_message(self, formato, *args):
+            logger.debug("emulador-graph: " + formato, *args)
+
+    return Handler
+
+
+_emulador = None
+_emulador_lock = threading.Lock()
+
+
+def iniciar_emulador() -> EmuladorGraph:
+    """Inicia (uma vez por processo) o emulador com as opções do settings."""
+    global _emulador
+    if _emulador is None:
+        with _emulador_lock:
+            if _emulador is None:
+                from django.conf import settings
+                _emulador = EmuladorGraph(
+                    latencia_ms=getattr(settings, 'GRAPH_EMULADOR_LATENCIA_MS', 0),
+                    taxa_429=getattr(settings, 'GRAPH_EMULADOR_TAXA_429', 0.0),
+                ).iniciar()
+    return _emulador
@@ -0,0 +1,84 @@
+# integrations/emulador_n8n.py
+import json
+import time
+import random
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+
+class EmuladorN8n:
+    """
+    Receptor HTTP local no lugar do webhook do n8n, para testar e medir a
+    fila de webhooks sem um n8n de verdade.
+
+    Guarda cada chamada recebida em `recebidos` (corpo JSON e cabeçalho de
+    idempotência). `latencia_ms` atrasa as respostas e `taxa_erro` devolve
+    uma fração das chamadas como 503, para exercitar as retentativas.
+    """
+
+    def __init__(self, host: str = '127.0.0.1', porta: int = 0, latencia_ms: float = 0, taxa_erro: float = 0.0):
+        self.latencia_ms = latencia_ms
+        self.taxa_erro = taxa_erro
+        self.recebidos: List[Dict] = []
+        self._lock = threading.Lock()
+        self._servidor = ThreadingHTTPServer((host, porta), _criar_handler(self))
+        self._servidor.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, porta = self._servidor.server_address[:2]
+        return f'http://{host}:{porta}/webhook'
+
+    @property
+    def total_eventos(self) -> int:
+        """Eventos recebidos, contando os que vieram em lote."""
+        with self._lock:
+            return sum(corpo.get('total', 1) if isinstance(corpo, dict) else 1
+                       for corpo in (r['corpo'] for r in self.recebidos))
+
+    def iniciar(self) -> 'EmuladorN8n':
+        """Sobe o servidor numa thread em segundo plano (para testes)."""
+        self._thread = threading.Thread(target=self._servidor.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def servir(self):
+        self._servidor.serve_forever()
+
+    def parar(self):
+        self._servidor.shutdown()
+        self._servidor.server_close()
+
+    def _receber(self, corpo: bytes, idempotencia: str):
+        if self.latencia_ms:
+            time.sleep(self.latencia_ms / 1000)
+        if self.taxa_erro and random.random() < self.taxa_erro:
+            return 503
+        with self._lock:
+            self.recebidos.append({'corpo': json.loads(corpo or b'null'), 'idempotencia': idempotencia})
+        return 200
+
+
+def _criar_handler(emulador: EmuladorN8n):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'  # Mantém a conexão aberta, como o n8n atrás de um proxy
+
+        def do_POST(self):
+            tamanho = int(self.headers.get('Content-Length') or 0)
+            status = emulador._receber(self.rfile.read(tamanho), self.headers.get('X-Idempotency-Key', ''))
+            resposta = json.dumps({'ok': status == 200}).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(resposta)))
+            self.end_headers()
+            self.wfile.write(resposta)
+
+        def log_message(self, formato, *args):
+            logger.debug(f"n8n emulado: {formato % args}")
+
+    return Handler
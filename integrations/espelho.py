@@ -0,0 +1,251 @@
+# integrations/espelho.py
+import logging
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional, Set
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from casos.models import Caso
+
+from .backends import BackendDocumentos
+from .models import DriveItem, SincronizacaoDrive
+
+logger = logging.getLogger(__name__)
+
+# Campos regravados quando um item já espelhado muda
+CAMPOS_ATUALIZAVEIS = [
+    'drive_id', 'parent_id', 'caso', 'nome', 'eh_pasta', 'tamanho', 'mime_type',
+    'ctag', 'etag', 'web_url', 'modificado_em', 'sincronizado_em',
+]
+TAMANHO_LOTE = 500
+
+
+def _em_lotes(valores: List, tamanho: int = TAMANHO_LOTE) -> Iterable[List]:
+    for inicio in range(0, len(valores), tamanho):
+        yield valores[inicio:inicio + tamanho]
+
+
+def _descendentes(pastas: Iterable[str]) -> Set[str]:
+    """IDs de todos os itens abaixo das pastas (consulta nível a nível)."""
+    encontrados = set()
+    nivel = list(pastas)
+    while nivel:
+        filhos = []
+        for lote in _em_lotes(nivel):
+            filhos.extend(DriveItem.objects.filter(parent_id__in=lote).values_list('item_id', flat=True))
+        nivel = [item_id for item_id in filhos if item_id not in encontrados]
+        encontrados.update(nivel)
+    return encontrados
+
+
+class SincronizadorEspelho:
+    """
+    Aplica o /delta do armazenamento de documentos na tabela DriveItem.
+
+    Na primeira execução (ou quando o token expira) o drive é enumerado por
+    inteiro; depois, só as mudanças desde o último delta link. Cada item
+    herda o caso da pasta pai, partindo das pastas em `Caso.sharepoint_folder_id`.
+    """
+
+    def __init__(self, sp: Optional[BackendDocumentos] = None):
+        if sp is None:
+            from .sharepoint import obter_sharepoint
+            sp = obter_sharepoint()
+        self.sp = sp
+        self.drive_id = sp.drive_id
+
+    def sincronizar(self, completo: bool = False) -> int:
+        """Sincroniza o espelho e retorna o número de itens alterados."""
+        registro = SincronizacaoDrive.objects.filter(drive_id=self.drive_id).first()
+        delta_link = None if (completo or registro is None) else registro.delta_link
+
+        try:
+            itens, novo_delta_link = self.sp.consultar_delta(delta_link, completo=not delta_link)
+        except requests.exceptions.HTTPError as e:
+            if not delta_link or e.response is None or e.response.status_code != 410:
+                raise
+            logger.warning("⚠️ Token de delta do espelho expirado. Enumerando o drive inteiro...")
+            delta_link = None
+            itens, novo_delta_link = self.sp.consultar_delta(None, completo=True)
+
+        with transaction.atomic():
+            alterados = self._aplicar(itens, completo=not delta_link)
+            alterados += self._vincular_pastas_de_casos()
+            SincronizacaoDrive.objects.update_or_create(
+                drive_id=self.drive_id, defaults={'delta_link': novo_delta_link}
+            )
+
+        logger.info(f"🪞 Espelho do drive sincronizado ({'completo' if not delta_link else 'delta'}): "
+                    f"{alterados} item(ns) alterado(s)")
+        return alterados
+
+    # -------------------------------------------------------------------------
+    # Aplicação das mudanças
+    # -------------------------------------------------------------------------
+
+    def _aplicar(self, brutos: List[Dict], completo: bool) -> int:
+        # O mesmo item pode vir mais de uma vez no delta; vale a última versão
+        mudancas = {}
+        for bruto in brutos:
+            if bruto.get('id') and 'root' not in bruto:
+                mudancas[bruto['id']] = bruto
+
+        removidos = [item_id for item_id, bruto in mudancas.items() if 'deleted' in bruto]
+        presentes = [bruto for bruto in mudancas.values() if 'deleted' not in bruto]
+
+        alterados = 0
+        if removidos:
+            ids = set(removidos) | _descendentes(removidos)
+            for lote in _em_lotes(list(ids)):
+                alterados += DriveItem.objects.filter(item_id__in=lote).delete()[0]
+
+        if completo:
+            # Na enumeração completa, o que não veio não existe mais
+            vistos = set(mudancas)
+            sobrando = [item_id for item_id in DriveItem.objects.filter(drive_id=self.drive_id)
+                        .values_list('item_id', flat=True) if item_id not in vistos]
+            for lote in _em_lotes(sobrando):
+                alterados += DriveItem.objects.filter(item_id__in=lote).delete()[0]
+
+        return alterados + self._gravar(presentes)
+
+    def _gravar(self, brutos: List[Dict]) -> int:
+        if not brutos:
+            return 0
+
+        ids = [bruto['id'] for bruto in brutos]
+        existentes = {}
+        for lote in _em_lotes(ids):
+            existentes.update(DriveItem.objects.in_bulk(lote, field_name='item_id'))
+
+        # Caso de cada pasta: pastas dos casos, pastas já espelhadas e pastas deste lote
+        caso_da_pasta = dict(
+            Caso.objects.exclude(sharepoint_folder_id__isnull=True)
+            .exclude(sharepoint_folder_id='').values_list('sharepoint_folder_id', 'id')
+        )
+        pais = list({(bruto.get('parentReference') or {}).get('id') for bruto in brutos} - set(caso_da_pasta) - {None})
+        for lote in _em_lotes(pais):
+            for item_id, caso_id in DriveItem.objects.filter(item_id__in=lote).values_list('item_id', 'caso_id'):
+                caso_da_pasta.setdefault(item_id, caso_id)
+
+        agora = timezone.now()
+        novos, atualizados, pastas_que_mudaram_de_caso = [], [], {}
+        pendentes = list(brutos)
+        # Filhos podem vir antes dos pais; repete enquanto houver progresso
+        while pendentes:
+            adiados = []
+            ids_pendentes = {bruto['id'] for bruto in pendentes}
+            for bruto in pendentes:
+                pai = (bruto.get('parentReference') or {}).get('id')
+                if bruto['id'] in caso_da_pasta:
+                    caso_id = caso_da_pasta[bruto['id']]
+                elif pai in caso_da_pasta:
+                    caso_id = caso_da_pasta[pai]
+                elif pai in ids_pendentes:
+                    adiados.append(bruto)
+                    continue
+                else:
+                    caso_id = None
+
+                item = existentes.get(bruto['id'])
+                if item is None:
+                    item = DriveItem(item_id=bruto['id'])
+                    novos.append(item)
+                else:
+                    if item.eh_pasta and item.caso_id != caso_id:
+                        pastas_que_mudaram_de_caso[item.item_id] = caso_id
+                    atualizados.append(item)
+                self._preencher(item, bruto, pai, caso_id, agora)
+                if item.eh_pasta:
+                    caso_da_pasta.setdefault(item.item_id, caso_id)
+
+            if len(adiados) == len(pendentes):
+                # Pais fora do lote e fora do espelho: ficam sem caso
+                for bruto in adiados:
+                    caso_da_pasta.setdefault((bruto.get('parentReference') or {}).get('id'), None)
+            pendentes = adiados
+
+        DriveItem.objects.bulk_create(novos, batch_size=TAMANHO_LOTE)
+        DriveItem.objects.bulk_update(atualizados, CAMPOS_ATUALIZAVEIS, batch_size=TAMANHO_LOTE)
+        for pasta_id, caso_id in pastas_que_mudaram_de_caso.items():
+            self._propagar_caso(pasta_id, caso_id)
+        return len(novos) + len(atualizados)
+
+    def _preencher(self, item: DriveItem, bruto: Dict, pai: Optional[str], caso_id: Optional[int], agora):
+        item.drive_id = self.drive_id
+        item.parent_id = pai
+        item.caso_id = caso_id
+        item.nome = (bruto.get('name') or '')[:400]
+        item.eh_pasta = 'folder' in bruto
+        item.tamanho = 0 if item.eh_pasta else (bruto.get('size') or 0)
+        item.mime_type = '' if item.eh_pasta else (bruto.get('file') or {}).get('mimeType', 'application/octet-stream')
+        item.ctag = bruto.get('cTag') or ''
+        item.etag = bruto.get('eTag') or ''
+        item.web_url = bruto.get('webUrl') or ''
+        item.modificado_em = parse_datetime(bruto['lastModifiedDateTime']) if bruto.get('lastModifiedDateTime') else None
+        item.sincronizado_em = agora
+
+    @staticmethod
+    def _propagar_caso(pasta_id: str, caso_id: Optional[int]):
+        """Leva o novo caso de uma pasta movida/vinculada para tudo que está abaixo dela."""
+        descendentes = list(_descendentes([pasta_id]))
+        for lote in _em_lotes(descendentes):
+            DriveItem.objects.filter(item_id__in=lote).update(caso_id=caso_id)
+
+    def _vincular_pastas_de_casos(self) -> int:
+        """
+        Vincula as pastas já espelhadas a casos que ganharam (ou trocaram de)
+        `sharepoint_folder_id` depois que a pasta foi sincronizada.
+        """
+        caso_da_pasta = dict(
+            Caso.objects.exclude(sharepoint_folder_id__isnull=True)
+            .exclude(sharepoint_folder_id='').values_list('sharepoint_folder_id', 'id')
+        )
+        vinculados = 0
+        for lote in _em_lotes(list(caso_da_pasta)):
+            divergentes = (DriveItem.objects.filter(drive_id=self.drive_id, item_id__in=lote)
+                           .values_list('item_id', 'caso_id'))
+            for pasta_id, caso_id in divergentes:
+                if caso_id != caso_da_pasta[pasta_id]:
+                    DriveItem.objects.filter(item_id=pasta_id).update(caso_id=caso_da_pasta[pasta_id])
+                    self._propagar_caso(pasta_id, caso_da_pasta[pasta_id])
+                    vinculados += 1
+        return vinculados
+
+
+def sincronizar_espelho(sp: Optional[BackendDocumentos] = None, completo: bool = False) -> int:
+    """Atalho para sincronizar o espelho do backend configurado."""
+    return SincronizadorEspelho(sp).sincronizar(completo=completo)
+
+
+def espelho_disponivel(sp: Optional[BackendDocumentos] = None) -> bool:
+    """Diz se o espelho do drive já foi sincronizado ao menos uma vez."""
+    if sp is None:
+        from .sharepoint import obter_sharepoint
+        sp = obter_sharepoint()
+    return SincronizacaoDrive.objects.filter(drive_id=sp.drive_id).exists()
+
+
+def espelho_atualizado(sp: Optional[BackendDocumentos] = None) -> bool:
+    """
+    Diz se o espelho pode ser lido: já sincronizado e com a última
+    sincronização (tarefa do beat) há menos de ESPELHO_DRIVE_IDADE_MAX_MINUTOS.
+    Um espelho parado é avisado no log, para não passar despercebido.
+    """
+    if sp is None:
+        from .sharepoint import obter_sharepoint
+        sp = obter_sharepoint()
+    ultima = SincronizacaoDrive.objects.filter(drive_id=sp.drive_id).values_list('atualizado_em', flat=True).first()
+    if ultima is None:
+        return False
+    if timezone.now() - ultima <= timedelta(minutes=settings.ESPELHO_DRIVE_IDADE_MAX_MINUTOS):
+        return True
+    if cache.add(f'espelho_drive:{sp.drive_id}:aviso_atraso', 1, 60 * 10):
+        logger.warning(f"⚠️ Espelho do drive sem sincronizar desde {timezone.localtime(ultima):%d/%m/%Y %H:%M}. "
+                       f"Verifique o Celery beat (integrations.tasks.sincronizar_espelho_drive).")
+    return False
@@ -0,0 +1,195 @@
+# integrations/graph_http.py
+import os
+import re
+import time
+import random
+import logging
+import threading
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+
+# Status que o Graph usa para "tente de novo mais tarde" (throttling/indisponibilidade)
+STATUS_RETENTAVEIS = {429, 502, 503, 504}
+
+# Em erros de rede só repetimos métodos idempotentes (um POST pode já ter sido aplicado)
+METODOS_IDEMPOTENTES = {'GET', 'HEAD', 'PUT', 'DELETE', 'OPTIONS'}
+
+_RE_SEGMENTO_ID = re.compile(r'/(sites|drives|items|thumbnails)/[^/:?]+')
+_RE_CAMINHO = re.compile(r':/[^:]*:')
+
+
+def normalizar_endpoint(metodo: str, url: str) -> str:
+    """
+    Reduz uma URL do Graph a um "endpoint" estável para as métricas,
+    trocando IDs e caminhos por marcadores (ex: GET /drives/{id}/items/{id}/children).
+    """
+    caminho = url.split('?', 1)[0]
+    if '/v1.0' in caminho:
+        caminho = caminho.split('/v1.0', 1)[1]
+    elif '://' in caminho:
+        # URLs pré-autenticadas de download/upload: agrupa pelo host
+        caminho = '/' + caminho.split('://', 1)[1].split('/', 1)[0] + '/{url}'
+    caminho = _RE_CAMINHO.sub(':{caminho}:', caminho)
+    caminho = _RE_SEGMENTO_ID.sub(lambda m: f'/{m.group(1)}/{{id}}', caminho)
+    return f"{metodo.upper()} {caminho}"
+
+
+def segundos_retry_after(valor: Optional[str]) -> Optional[float]:
+    """Interpreta o cabeçalho Retry-After (segundos ou data HTTP)."""
+    if not valor:
+        return None
+    try:
+        return max(0.0, float(valor))
+    except ValueError:
+        pass
+    try:
+        data = parsedate_to_datetime(valor)
+        return max(0.0, (data - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+class MetricasGraph:
+    """Contadores de latência e retentativas por endpoint do Graph (thread-safe)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._dados: Dict[str, Dict] = {}
+
+    def registrar(self, endpoint: str, duracao_ms: float, retentativas: int, status: Optional[int]):
+        with self._lock:
+            dados = self._dados.setdefault(endpoint, {
+                'chamadas': 0,
+                'erros': 0,
+                'retentativas': 0,
+                'tempo_total_ms': 0.0,
+                'tempo_max_ms': 0.0,
+            })
+            dados['chamadas'] += 1
+            dados['retentativas'] += retentativas
+            dados['tempo_total_ms'] += duracao_ms
+            dados['tempo_max_ms'] = max(dados['tempo_max_ms'], duracao_ms)
+            if status is None or status >= 400:
+                dados['erros'] += 1
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Retorna uma cópia das métricas, com a latência média calculada."""
+        with self._lock:
+            resultado = {}
+            for endpoint, dados in self._dados.items():
+                copia = dict(dados)
+                copia['tempo_medio_ms'] = round(dados['tempo_total_ms'] / dados['chamadas'], 1) if dados['chamadas'] else 0.0
+                copia['tempo_total_ms'] = round(copia['tempo_total_ms'], 1)
+                copia['tempo_max_ms'] = round(copia['tempo_max_ms'], 1)
+                resultado[endpoint] = copia
+            return resultado
+
+    def resetar(self):
+        with self._lock:
+            self._dados.clear()
+
+
+class GraphHTTP:
+    """
+    Sessão HTTP única (keep-alive) para todo o tráfego do Graph.
+
+    Repete automaticamente respostas 429/5xx respeitando o Retry-After e,
+    na falta dele, usa backoff exponencial com jitter.
+    """
+
+    def __init__(self, pool_connections: int = None, pool_maxsize: int = None,
+                 max_tentativas: int = None, backoff_base: float = None, backoff_max: float = None):
+        self.max_tentativas = max_tentativas or int(os.getenv('GRAPH_MAX_TENTATIVAS', '5'))
+        self.backoff_base = backoff_base or float(os.getenv('GRAPH_BACKOFF_BASE', '0.5'))
+        self.backoff_max = backoff_max or float(os.getenv('GRAPH_BACKOFF_MAX', '30'))
+        self.metricas = MetricasGraph()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=pool_connections or int(os.getenv('GRAPH_POOL_CONNECTIONS', '10')),
+            pool_maxsize=pool_maxsize or int(os.getenv('GRAPH_POOL_MAXSIZE', '32')),
+            max_retries=0,  # As retentativas são nossas, para respeitar o Retry-After
+        )
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def _espera_backoff(self, tentativa: int) -> float:
+        """Backoff exponencial com jitter total (0..base*2^n), limitado a backoff_max."""
+        teto = min(self.backoff_max, self.backoff_base * (2 ** tentativa))
+        return random.uniform(0, teto)
+
+    def request(self, metodo: str, url: str, **kwargs) -> requests.Response:
+        """Executa a requisição com retentativas. Não chama raise_for_status()."""
+        metodo = metodo.upper()
+        endpoint = normalizar_endpoint(metodo, url)
+        inicio = time.monotonic()
+        retentativas = 0
+
+        while True:
+            try:
+                response = self.session.request(metodo, url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                pode_repetir = metodo in METODOS_IDEMPOTENTES or isinstance(e, requests.exceptions.ConnectTimeout)
+                if not pode_repetir or retentativas + 1 >= self.max_tentativas:
+                    self.metricas.registrar(endpoint, (time.monotonic() - inicio) * 1000, retentativas, None)
+                    raise
+                espera = self._espera_backoff(retentativas)
+                logger.warning(f"🔁 Erro de rede em {endpoint} ({e}). Nova tentativa em {espera:.1f}s...")
+                retentativas += 1
+                time.sleep(espera)
+                continue
+
+            if response.status_code in STATUS_RETENTAVEIS and retentativas + 1 < self.max_tentativas:
+                espera = segundos_retry_after(response.headers.get('Retry-After'))
+                if espera is None:
+                    espera = self._espera_backoff(retentativas)
+                espera = min(espera, self.backoff_max)
+                logger.warning(f"⏳ Graph respondeu {response.status_code} em {endpoint}. Aguardando {espera:.1f}s...")
+                response.close()
+                retentativas += 1
+                time.sleep(espera)
+                continue
+
+            self.metricas.registrar(endpoint, (time.monotonic() - inicio) * 1000, retentativas, response.status_code)
+            return response
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.request('PUT', url, **kwargs)
+
+    def patch(self, url, **kwargs):
+        return self.request('PATCH', url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request('DELETE', url, **kwargs)
+
+
+_http = None
+_http_lock = threading.Lock()
+
+
+def obter_http_graph() -> GraphHTTP:
+    """Retorna a sessão HTTP do Graph compartilhada pelo processo."""
+    global _http
+    if _http is None:
+        with _http_lock:
+            if _http is None:
+                _http = GraphHTTP()
+    return _http
+
+
+def obter_metricas_graph() -> Dict[str, Dict]:
+    """Atalho para as métricas por endpoint da sessão compartilhada."""
+    return obter_http_graph().metricas.snapshot()
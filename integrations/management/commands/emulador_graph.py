@@ -0,0 +1,38 @@
+# integrations/management/commands/emulador_graph.py
+
+from django.core.management.base import BaseCommand
+
+from integrations.armazenamento_local import ArmazenamentoLocal
+from integrations.emulador_graph import EmuladorGraph
+
+
+class Command(BaseCommand):
+    help = (
+        'Sobe o emulador local do Microsoft Graph (drive do SharePoint). '
+        'Aponte os processos para ele com DOCUMENTOS_BACKEND=emulador e GRAPH_EMULADOR_URL.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--porta', type=int, default=8765)
+        parser.add_argument('--raiz', default=None, help='Pasta onde os documentos são gravados (padrão: DOCUMENTOS_LOCAL_RAIZ)')
+        parser.add_argument('--latencia-ms', type=float, default=0, help='Atraso artificial por requisição')
+        parser.add_argument('--taxa-429', type=float, default=0.0, help='Fração das requisições respondidas com 429')
+
+    def handle(self, *args, **options):
+        emulador = EmuladorGraph(
+            ArmazenamentoLocal(options['raiz']),
+            host=options['host'],
+            porta=options['porta'],
+            latencia_ms=options['latencia_ms'],
+            taxa_429=options['taxa_429'],
+        )
+        self.stdout.write(self.style.SUCCESS(f"Emulador do Graph em {emulador.url}"))
+        self.stdout.write(f"Raiz: {emulador.armazenamento.raiz}")
+        self.stdout.write(f"Use: DOCUMENTOS_BACKEND=emulador GRAPH_EMULADOR_URL={emulador.url}")
+        try:
+            emulador.servir()
+        except KeyboardInterrupt:
+            self.stdout.write("Encerrando o emulador...")
+        finally:
+            emulador.parar()
@@ -0,0 +1,34 @@
+# integrations/management/commands/emulador_n8n.py
+
+from django.core.management.base import BaseCommand
+
+from integrations.emulador_n8n import EmuladorN8n
+
+
+class Command(BaseCommand):
+    help = (
+        'Sobe um receptor local no lugar do webhook do n8n. '
+        'Aponte os workers para ele com N8N_WEBHOOK_URL.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--porta', type=int, default=8766)
+        parser.add_argument('--latencia-ms', type=float, default=0, help='Atraso artificial por chamada')
+        parser.add_argument('--taxa-erro', type=float, default=0.0, help='Fração das chamadas respondidas com 503')
+
+    def handle(self, *args, **options):
+        emulador = EmuladorN8n(
+            host=options['host'],
+            porta=options['porta'],
+            latencia_ms=options['latencia_ms'],
+            taxa_erro=options['taxa_erro'],
+        )
+        self.stdout.write(self.style.SUCCESS(f"Receptor do n8n em {emulador.url}"))
+        self.stdout.write(f"Use: N8N_WEBHOOK_URL={emulador.url}")
+        try:
+            emulador.servir()
+        except KeyboardInterrupt:
+            self.stdout.write(f"Encerrando... {len(emulador.recebidos)} chamada(s), {emulador.total_eventos} evento(s) recebido(s).")
+        finally:
+            emulador.parar()
@@ -0,0 +1,38 @@
+# integrations/management/commands/enviar_emails.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from integrations.emails import EnvioEmails, enfileirar_email, montar_resumos
+
+
+class Command(BaseCommand):
+    help = 'Envia a fila de e-mails pendentes (ou mede a vazão da fila com --benchmark).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--resumos', action='store_true', help='Fecha agora os resumos pendentes, sem esperar a janela')
+        parser.add_argument('--backend', help='Backend de e-mail (padrão: EMAIL_FILA_BACKEND)')
+        parser.add_argument('--benchmark', type=int, metavar='N',
+                            help='Enfileira N mensagens de teste e as envia pelo backend locmem, sem limite de taxa')
+
+    def handle(self, *args, **options):
+        if options['resumos']:
+            criados = montar_resumos(forcar=True)
+            self.stdout.write(f"{criados} resumo(s) montado(s)")
+
+        if options['benchmark']:
+            total = options['benchmark']
+            for i in range(total):
+                enfileirar_email(f'[benchmark] Mensagem {i + 1}', ['benchmark@example.com'], texto='Teste da fila de e-mails.')
+            envio = EnvioEmails(backend=options['backend'] or 'django.core.mail.backends.locmem.EmailBackend', max_por_minuto=0)
+        else:
+            envio = EnvioEmails(backend=options['backend'])
+
+        inicio = time.monotonic()
+        resultado = envio.enviar_pendentes()
+        duracao = time.monotonic() - inicio
+        taxa = resultado['enviados'] / duracao if duracao else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultado['enviados']} enviado(s), {resultado['falhas']} falha(s) em {duracao:.2f}s "
+            f"({taxa:.0f}/s, {envio.conexoes_abertas} conexão(ões))"
+        ))
@@ -0,0 +1,16 @@
+# integrations/management/commands/sincronizar_drive.py
+
+from django.core.management.base import BaseCommand
+
+from integrations.espelho import sincronizar_espelho
+
+
+class Command(BaseCommand):
+    help = 'Atualiza o espelho local (DriveItem) dos documentos dos casos a partir do /delta do drive.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--completo', action='store_true', help='Enumera o drive inteiro em vez de aplicar só o delta')
+
+    def handle(self, *args, **options):
+        alterados = sincronizar_espelho(completo=options['completo'])
+        self.stdout.write(self.style.SUCCESS(f"Espelho sincronizado: {alterados} item(ns) alterado(s)"))
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.7 on 2026-10-17 03:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('casos', '0016_despesa_comprovante'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SincronizacaoDrive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('drive_id', models.CharField(max_length=255, unique=True, verbose_name='ID do Drive')),
+                ('delta_link', models.TextField(verbose_name='Delta Link')),
+                ('atualizado_em', models.DateTimeField(auto_now=True, verbose_name='Atualizado em')),
+            ],
+            options={
+                'verbose_name': 'Sincronização do Drive',
+                'verbose_name_plural': 'Sincronizações do Drive',
+            },
+        ),
+        migrations.CreateModel(
+            name='DriveItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('item_id', models.CharField(max_length=255, unique=True, verbose_name='ID do Item')),
+                ('drive_id', models.CharField(max_length=255, verbose_name='ID do Drive')),
+                ('parent_id', models.CharField(blank=True, db_index=True, max_length=255, null=True, verbose_name='ID da Pasta Pai')),
+                ('nome', models.CharField(max_length=400, verbose_name='Nome')),
+                ('eh_pasta', models.BooleanField(default=False, verbose_name='É Pasta')),
+                ('tamanho', models.BigIntegerField(default=0, verbose_name='Tamanho (bytes)')),
+                ('mime_type', models.CharField(blank=True, max_length=255, verbose_name='Tipo MIME')),
+                ('ctag', models.CharField(blank=True, max_length=255, verbose_name='cTag')),
+                ('etag', models.CharField(blank=True, max_length=255, verbose_name='eTag')),
+                ('web_url', models.URLField(blank=True, max_length=2000, verbose_name='URL')),
+                ('modificado_em', models.DateTimeField(blank=True, null=True, verbose_name='Modificado em')),
+                ('sincronizado_em', models.DateTimeField(auto_now=True, verbose_name='Sincronizado em')),
+                ('caso', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='itens_drive', to='casos.caso', verbose_name='Caso')),
+            ],
+            options={
+                'verbose_name': 'Item do Drive',
+                'verbose_name_plural': 'Itens do Drive',
+                'ordering': ['nome'],
+                'indexes': [models.Index(fields=['caso', 'eh_pasta'], name='driveitem_caso_pasta_idx'), models.Index(fields=['nome'], name='driveitem_nome_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.7 on 2026-10-17 03:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('integrations', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmailPendente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chave', models.CharField(blank=True, max_length=255, null=True, unique=True, verbose_name='Chave de Idempotência')),
+                ('assunto', models.CharField(max_length=255, verbose_name='Assunto')),
+                ('remetente', models.CharField(blank=True, max_length=255, verbose_name='Remetente')),
+                ('destinatarios', models.JSONField(default=list, verbose_name='Destinatários')),
+                ('corpo_texto', models.TextField(blank=True, verbose_name='Corpo (Texto)')),
+                ('corpo_html', models.TextField(blank=True, verbose_name='Corpo (HTML)')),
+                ('resumo', models.CharField(blank=True, max_length=50, verbose_name='Tipo de Resumo')),
+                ('dados', models.JSONField(blank=True, default=dict, verbose_name='Dados do Resumo')),
+                ('status', models.CharField(choices=[('PENDENTE', 'Pendente'), ('ENVIADO', 'Enviado'), ('AGRUPADO', 'Incluído em Resumo'), ('FALHOU', 'Falhou')], default='PENDENTE', max_length=20)),
+                ('tentativas', models.PositiveIntegerField(default=0)),
+                ('proxima_tentativa_em', models.DateTimeField(blank=True, null=True, verbose_name='Próxima Tentativa')),
+                ('enviado_em', models.DateTimeField(blank=True, null=True, verbose_name='Enviado em')),
+                ('ultimo_erro', models.TextField(blank=True, verbose_name='Último Erro')),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'E-mail na Fila',
+                'verbose_name_plural': 'E-mails na Fila',
+                'ordering': ['-id'],
+                'indexes': [models.Index(fields=['status', 'proxima_tentativa_em'], name='email_fila_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 5.2.7 on 2026-10-17 03:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('integrations', '0002_emailpendente'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EntregaWebhook',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url', models.URLField(max_length=2000)),
+                ('total_eventos', models.PositiveIntegerField(default=0, verbose_name='Eventos no Lote')),
+                ('sucesso', models.BooleanField(default=False)),
+                ('status_http', models.PositiveIntegerField(blank=True, null=True, verbose_name='Status HTTP')),
+                ('latencia_ms', models.PositiveIntegerField(default=0, verbose_name='Latência (ms)')),
+                ('espera_fila_ms', models.PositiveIntegerField(default=0, verbose_name='Espera na Fila (ms)')),
+                ('erro', models.TextField(blank=True)),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Entrega do Webhook',
+                'verbose_name_plural': 'Entregas do Webhook',
+                'ordering': ['-id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='WebhookMorto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chave', models.CharField(max_length=255, verbose_name='Chave de Idempotência')),
+                ('tipo', models.CharField(max_length=50, verbose_name='Tipo')),
+                ('dados', models.JSONField(default=dict, verbose_name='Dados')),
+                ('tentativas', models.PositiveIntegerField(default=0)),
+                ('ultimo_erro', models.TextField(blank=True, verbose_name='Último Erro')),
+                ('evento_criado_em', models.DateTimeField(verbose_name='Evento Criado em')),
+                ('criado_em', models.DateTimeField(auto_now_add=True, verbose_name='Descartado em')),
+            ],
+            options={
+                'verbose_name': 'Webhook Não Entregue',
+                'verbose_name_plural': 'Webhooks Não Entregues',
+                'ordering': ['-id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='EventoWebhook',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chave', models.CharField(max_length=255, unique=True, verbose_name='Chave de Idempotência')),
+                ('tipo', models.CharField(max_length=50, verbose_name='Tipo')),
+                ('dados', models.JSONField(default=dict, verbose_name='Dados')),
+                ('status', models.CharField(choices=[('PENDENTE', 'Pendente'), ('ENTREGUE', 'Entregue')], default='PENDENTE', max_length=20)),
+                ('tentativas', models.PositiveIntegerField(default=0)),
+                ('proxima_tentativa_em', models.DateTimeField(blank=True, null=True, verbose_name='Próxima Tentativa')),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('entrega', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='eventos', to='integrations.entregawebhook', verbose_name='Entrega')),
+            ],
+            options={
+                'verbose_name': 'Evento do Webhook',
+                'verbose_name_plural': 'Eventos do Webhook',
+                'ordering': ['-id'],
+                'indexes': [models.Index(fields=['status', 'proxima_tentativa_em'], name='evento_webhook_fila_idx')],
+            },
+        ),
+    ]
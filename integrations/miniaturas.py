@@ -0,0 +1,190 @@
+# integrations/miniaturas.py
+import os
+import time
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+import fitz  # PyMuPDF
+from django.conf import settings
+from django.core.cache import cache
+
+from .blobs import CacheBlobs
+
+logger = logging.getLogger(__name__)
+
+
+class ServicoMiniaturas:
+    """
+    Miniaturas e URLs de preview dos anexos, buscadas uma vez por versão.
+
+    As miniaturas ficam num diretório sob MEDIA_ROOT, chaveadas por item e
+    cTag (o cTag muda quando o conteúdo muda, então uma versão nova nunca
+    reaproveita a imagem antiga). O diretório tem tamanho máximo: ao passar
+    do limite, as imagens usadas há mais tempo são removidas (LRU pela data
+    de modificação, renovada a cada leitura).
+
+    Quando o backend não gera miniatura para um PDF, renderizamos a primeira
+    página localmente com o PyMuPDF.
+    """
+
+    TAMANHO = 'medium'
+    LARGURA_PDF = 176  # Mesma largura da miniatura "medium" do SharePoint
+    # Itens sem miniatura são marcados para não tentarmos de novo a cada
+    # listagem. A marca vence após TTL_VAZIO: o Graph também responde 404
+    # enquanto ainda gera a miniatura de um upload novo.
+    SUFIXO_VAZIO = '.vazio'
+    TTL_VAZIO = int(os.getenv('MINIATURAS_TTL_VAZIO', str(60 * 60)))
+    # As URLs de preview do Graph expiram; guardamos por pouco tempo
+    TTL_PREVIEW = int(os.getenv('SHAREPOINT_PREVIEW_TTL', str(60 * 30)))
+
+    def __init__(self, sp, raiz: Optional[Path] = None, limite_bytes: Optional[int] = None):
+        self.sp = sp
+        self.raiz = Path(raiz or getattr(settings, 'MINIATURAS_RAIZ', None) or Path(settings.MEDIA_ROOT) / 'miniaturas')
+        self.limite_bytes = limite_bytes or getattr(settings, 'MINIATURAS_LIMITE_MB', 200) * 1024 * 1024
+        self.raiz.mkdir(parents=True, exist_ok=True)
+        self._lock_limpeza = threading.Lock()
+        # O PDF baixado para renderizar fica no cache de blobs (serve depois para download/análise)
+        self.blobs = CacheBlobs(sp)
+
+    # -------------------------------------------------------------------------
+    # Miniaturas
+    # -------------------------------------------------------------------------
+
+    def _caminho(self, item_id: str, ctag: str) -> Path:
+        chave = hashlib.sha1(f'{self.sp.drive_id}:{item_id}:{ctag}:{self.TAMANHO}'.encode()).hexdigest()
+        return self.raiz / chave[:2] / chave
+
+    def obter_miniatura(self, item_id: str, ctag: Optional[str] = None) -> Optional[Path]:
+        """
+        Caminho da miniatura do item na versão `ctag` (buscada/gerada se
+        preciso), ou None se o item não tiver miniatura.
+        """
+        detalhes = None
+        if not ctag:
+            detalhes = self.sp.cache_pastas.detalhes(item_id)
+            ctag = detalhes.get('cTag') or detalhes.get('eTag') or ''
+
+        caminho = self._caminho(item_id, ctag)
+        if caminho.exists():
+            os.utime(caminho)  # Marca como usada recentemente (LRU)
+            return caminho
+        vazio = caminho.with_suffix(self.SUFIXO_VAZIO)
+        try:
+            if time.time() - vazio.stat().st_mtime < self.TTL_VAZIO:
+                return None
+        except FileNotFoundError:
+            pass
+
+        sem_miniatura = False  # Só quando o backend responde que não há miniatura
+        try:
+            conteudo = self.sp.baixar_thumbnail(item_id, self.TAMANHO)
+            sem_miniatura = not conteudo
+        except Exception as e:
+            # Falha passageira (rede, 429/5xx): tenta de novo na próxima vez
+            logger.warning(f"⚠️ Não foi possível obter a miniatura de {item_id}: {e}")
+            conteudo = None
+
+        eh_pdf = False
+        if not conteudo:
+            detalhes = detalhes or self.sp.cache_pastas.detalhes(item_id)
+            eh_pdf = self._eh_pdf(detalhes)
+            if eh_pdf:
+                conteudo = self._renderizar_pdf(item_id)
+
+        caminho.parent.mkdir(exist_ok=True)
+        if not conteudo:
+            if sem_miniatura and not eh_pdf:
+                vazio.touch()
+            return None
+
+        temporario = caminho.with_suffix(f'.{threading.get_ident()}.parcial')
+        temporario.write_bytes(conteudo)
+        os.replace(temporario, caminho)
+        logger.debug(f"🖼️ Miniatura de {item_id} gravada ({len(conteudo)} bytes)")
+        self._aplicar_limite()
+        return caminho
+
+    @staticmethod
+    def _eh_pdf(detalhes: Dict) -> bool:
+        mime = (detalhes.get('file') or {}).get('mimeType', '')
+        return mime == 'application/pdf' or (detalhes.get('name') or '').lower().endswith('.pdf')
+
+    def _renderizar_pdf(self, item_id: str) -> Optional[bytes]:
+        """Renderiza a primeira página do PDF como PNG."""
+        try:
+            with self.blobs.abrir(item_id) as conteudo, fitz.open(stream=conteudo, filetype='pdf') as documento:
+                if not documento.page_count:
+                    return None
+                pagina = documento[0]
+                escala = self.LARGURA_PDF / pagina.rect.width
+                return pagina.get_pixmap(matrix=fitz.Matrix(escala, escala)).tobytes('png')
+        except Exception as e:
+            logger.warning(f"⚠️ Falha ao renderizar miniatura do PDF {item_id}: {e}")
+            return None
+
+    @staticmethod
+    def tipo_imagem(caminho: Path) -> str:
+        """Content-Type da miniatura (o SharePoint devolve JPEG; o PyMuPDF, PNG)."""
+        with open(caminho, 'rb') as arquivo:
+            return 'image/png' if arquivo.read(4) == b'\x89PNG' else 'image/jpeg'
+
+    def _aplicar_limite(self):
+        """Remove as miniaturas usadas há mais tempo até caber no limite."""
+        if not self._lock_limpeza.acquire(blocking=False):
+            return  # Outra thread já está limpando
+        try:
+            arquivos = []
+            total = 0
+            for caminho in self.raiz.glob('*/*'):
+                try:
+                    info = caminho.stat()
+                except FileNotFoundError:
+                    continue
+                arquivos.append((info.st_mtime, info.st_size, caminho))
+                total += info.st_size
+            if total <= self.limite_bytes:
+                return
+
+            removidos = 0
+            for _, tamanho, caminho in sorted(arquivos):
+                if total <= self.limite_bytes * 0.9:  # Folga para não limpar a cada gravação
+                    break
+                caminho.unlink(missing_ok=True)
+                total -= tamanho
+                removidos += 1
+            logger.info(f"🧹 {removidos} miniatura(s) antiga(s) removida(s) do cache em disco")
+        finally:
+            self._lock_limpeza.release()
+
+    # -------------------------------------------------------------------------
+    # Preview
+    # -------------------------------------------------------------------------
+
+    def obter_preview_url(self, item_id: str) -> Optional[str]:
+        """URL de preview do item, reaproveitada enquanto a versão for a mesma."""
+        detalhes = self.sp.cache_pastas.detalhes(item_id)
+        chave = f"sp:{self.sp.drive_id}:preview:{item_id}:{detalhes.get('cTag') or detalhes.get('eTag')}"
+        url = cache.get(chave)
+        if url is None:
+            url = self.sp.get_preview_url(item_id)
+            if url:
+                cache.set(chave, url, self.TTL_PREVIEW)
+        return url
+
+
+_servico = None
+_servico_lock = threading.Lock()
+
+
+def obter_servico_miniaturas() -> ServicoMiniaturas:
+    """Serviço de miniaturas compartilhado do processo (sobre o backend configurado)."""
+    global _servico
+    if _servico is None:
+        with _servico_lock:
+            if _servico is None:
+                from .sharepoint import obter_sharepoint
+                _servico = ServicoMiniaturas(obter_sharepoint())
+    return _servico
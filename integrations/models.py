@@ -1,3 +1,187 @@
 from django.db import models
 
-# Create your models here.
+
+class DriveItem(models.Model):
+    """
+    Espelho local de um item (arquivo ou pasta) do armazenamento de documentos.
+
+    Mantido pelo /delta (ver integrations/espelho.py), para que contagens e
+    listagens por caso sejam consultas ao banco em vez de chamadas ao Graph.
+    """
+    item_id = models.CharField(max_length=255, unique=True, verbose_name="ID do Item")
+    drive_id = models.CharField(max_length=255, verbose_name="ID do Drive")
+    parent_id = models.CharField(max_length=255, blank=True, null=True, db_index=True, verbose_name="ID da Pasta Pai")
+    caso = models.ForeignKey(
+        'casos.Caso',
+        on_delete=models.SET_NULL,
+        related_name='itens_drive',
+        blank=True,
+        null=True,
+        verbose_name="Caso"
+    )
+    nome = models.CharField(max_length=400, verbose_name="Nome")
+    eh_pasta = models.BooleanField(default=False, verbose_name="É Pasta")
+    tamanho = models.BigIntegerField(default=0, verbose_name="Tamanho (bytes)")
+    mime_type = models.CharField(max_length=255, blank=True, verbose_name="Tipo MIME")
+    ctag = models.CharField(max_length=255, blank=True, verbose_name="cTag")
+    etag = models.CharField(max_length=255, blank=True, verbose_name="eTag")
+    web_url = models.URLField(max_length=2000, blank=True, verbose_name="URL")
+    modificado_em = models.DateTimeField(blank=True, null=True, verbose_name="Modificado em")
+    sincronizado_em = models.DateTimeField(auto_now=True, verbose_name="Sincronizado em")
+
+    class Meta:
+        ordering = ['nome']
+        verbose_name = "Item do Drive"
+        verbose_name_plural = "Itens do Drive"
+        indexes = [
+            models.Index(fields=['caso', 'eh_pasta'], name='driveitem_caso_pasta_idx'),
+            models.Index(fields=['nome'], name='driveitem_nome_idx'),
+        ]
+
+    def __str__(self):
+        return self.nome
+
+    def como_item(self):
+        """Item no formato de `BackendDocumentos._processar_item` (usado pelos templates)."""
+        return {
+            'id': self.item_id,
+            'name': self.nome,
+            'file': {} if self.eh_pasta else {'mimeType': self.mime_type},
+            'folder': {'childCount': None} if self.eh_pasta else None,
+            'size': self.tamanho,
+            'createdDateTime': None,
+            'lastModifiedDateTime': self.modificado_em.isoformat() if self.modificado_em else None,
+            'webUrl': self.web_url,
+            'mimeType': 'folder' if self.eh_pasta else self.mime_type,
+            'parentId': self.parent_id,
+            'cTag': self.ctag,
+            'eTag': self.etag,
+        }
+
+
+class SincronizacaoDrive(models.Model):
+    """Posição (delta link) da última sincronização do espelho de cada drive."""
+    drive_id = models.CharField(max_length=255, unique=True, verbose_name="ID do Drive")
+    delta_link = models.TextField(verbose_name="Delta Link")
+    atualizado_em = models.DateTimeField(auto_now=True, verbose_name="Atualizado em")
+
+    class Meta:
+        verbose_name = "Sincronização do Drive"
+        verbose_name_plural = "Sincronizações do Drive"
+
+    def __str__(self):
+        return self.drive_id
+
+
+class EmailPendente(models.Model):
+    """
+    Mensagem na fila de e-mails (ver integrations/emails.py). Mensagens com
+    `resumo` não saem sozinhas: são juntadas num e-mail de resumo.
+    """
+    STATUS_CHOICES = [
+        ('PENDENTE', 'Pendente'),
+        ('ENVIADO', 'Enviado'),
+        ('AGRUPADO', 'Incluído em Resumo'),
+        ('FALHOU', 'Falhou'),
+    ]
+
+    chave = models.CharField(max_length=255, unique=True, null=True, blank=True, verbose_name="Chave de Idempotência")
+    assunto = models.CharField(max_length=255, verbose_name="Assunto")
+    remetente = models.CharField(max_length=255, blank=True, verbose_name="Remetente")
+    destinatarios = models.JSONField(default=list, verbose_name="Destinatários")
+    corpo_texto = models.TextField(blank=True, verbose_name="Corpo (Texto)")
+    corpo_html = models.TextField(blank=True, verbose_name="Corpo (HTML)")
+    resumo = models.CharField(max_length=50, blank=True, verbose_name="Tipo de Resumo")
+    dados = models.JSONField(default=dict, blank=True, verbose_name="Dados do Resumo")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDENTE')
+    tentativas = models.PositiveIntegerField(default=0)
+    proxima_tentativa_em = models.DateTimeField(blank=True, null=True, verbose_name="Próxima Tentativa")
+    enviado_em = models.DateTimeField(blank=True, null=True, verbose_name="Enviado em")
+    ultimo_erro = models.TextField(blank=True, verbose_name="Último Erro")
+    criado_em = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-id']
+        verbose_name = "E-mail na Fila"
+        verbose_name_plural = "E-mails na Fila"
+        indexes = [
+            models.Index(fields=['status', 'proxima_tentativa_em'], name='email_fila_idx'),
+        ]
+
+    def __str__(self):
+        return self.assunto
+
+
+class EventoWebhook(models.Model):
+    """Evento na fila do webhook do n8n (ver integrations/webhooks.py); sai em lote com outros eventos."""
+    STATUS_CHOICES = [
+        ('PENDENTE', 'Pendente'),
+        ('ENTREGUE', 'Entregue'),
+    ]
+
+    chave = models.CharField(max_length=255, unique=True, verbose_name="Chave de Idempotência")
+    tipo = models.CharField(max_length=50, verbose_name="Tipo")
+    dados = models.JSONField(default=dict, verbose_name="Dados")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDENTE')
+    tentativas = models.PositiveIntegerField(default=0)
+    proxima_tentativa_em = models.DateTimeField(blank=True, null=True, verbose_name="Próxima Tentativa")
+    entrega = models.ForeignKey(
+        'EntregaWebhook',
+        on_delete=models.SET_NULL,
+        related_name='eventos',
+        blank=True,
+        null=True,
+        verbose_name="Entrega"
+    )
+    criado_em = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-id']
+        verbose_name = "Evento do Webhook"
+        verbose_name_plural = "Eventos do Webhook"
+        indexes = [
+            models.Index(fields=['status', 'proxima_tentativa_em'], name='evento_webhook_fila_idx'),
+        ]
+
+    def __str__(self):
+        return self.chave
+
+
+class EntregaWebhook(models.Model):
+    """Uma chamada ao webhook (um lote de eventos), com o resultado e a latência."""
+    url = models.URLField(max_length=2000)
+    total_eventos = models.PositiveIntegerField(default=0, verbose_name="Eventos no Lote")
+    sucesso = models.BooleanField(default=False)
+    status_http = models.PositiveIntegerField(blank=True, null=True, verbose_name="Status HTTP")
+    latencia_ms = models.PositiveIntegerField(default=0, verbose_name="Latência (ms)")
+    # Tempo que o evento mais antigo do lote esperou na fila até esta chamada
+    espera_fila_ms = models.PositiveIntegerField(default=0, verbose_name="Espera na Fila (ms)")
+    erro = models.TextField(blank=True)
+    criado_em = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-id']
+        verbose_name = "Entrega do Webhook"
+        verbose_name_plural = "Entregas do Webhook"
+
+    def __str__(self):
+        return f"{self.total_eventos} evento(s) - {'OK' if self.sucesso else 'falha'} ({self.latencia_ms} ms)"
+
+
+class WebhookMorto(models.Model):
+    """Evento que esgotou as tentativas de entrega (dead letter). Pode ser reenfileirado pelo Admin."""
+    chave = models.CharField(max_length=255, verbose_name="Chave de Idempotência")
+    tipo = models.CharField(max_length=50, verbose_name="Tipo")
+    dados = models.JSONField(default=dict, verbose_name="Dados")
+    tentativas = models.PositiveIntegerField(default=0)
+    ultimo_erro = models.TextField(blank=True, verbose_name="Último Erro")
+    evento_criado_em = models.DateTimeField(verbose_name="Evento Criado em")
+    criado_em = models.DateTimeField(auto_now_add=True, verbose_name="Descartado em")
+
+    class Meta:
+        ordering = ['-id']
+        verbose_name = "Webhook Não Entregue"
+        verbose_name_plural = "Webhooks Não Entregues"
+
+    def __str__(self):
+        return self.chave
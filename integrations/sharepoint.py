@@ -4,18 +4,174 @@ import msal
 import requests
 import json
 import logging
+import threading
+import time
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional
+from urllib.parse import quote
+from typing import List, Dict, Iterator, Optional, Tuple
+
+from .graph_http import obter_http_graph, segundos_retry_after, STATUS_RETENTAVEIS
+from .backends import BackendDocumentos, etag_confere
+from .tokens_msal import CacheTokensMsal
+from .cache_pastas import CachePastas
 
 logger = logging.getLogger(__name__)
 
-class SharePoint:
+
+# ==============================================================================
+# REGISTRO POR PROCESSO (MSAL + IDs DE SITE/DRIVE)
+# ==============================================================================
+
+class _RegistroSharePoint:
+    """
+    Guarda, uma vez por processo, os recursos caros de montar do cliente:
+    a ConfidentialClientApplication do MSAL (com o cache de tokens
+    compartilhado entre processos), o token em uso, os IDs de site/drive já
+    resolvidos e o próprio cliente compartilhado.
+    """
+
+    # Os IDs de site/drive praticamente nunca mudam; revalidamos de tempos em tempos.
+    TTL_IDS = timedelta(hours=int(os.getenv('SHAREPOINT_IDS_TTL_HORAS', '12')))
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._apps_msal = {}
+        self._tokens = {}
+        self._locks_token = {}
+        self._ids = {}
+        self._cliente = None
+
+    def obter_app_msal(self, client_id, authority, client_secret):
+        """Retorna (criando se preciso) a aplicação MSAL para estas credenciais."""
+        chave = (client_id, authority)
+        app = self._apps_msal.get(chave)
+        if app is None:
+            with self._lock:
+                app = self._apps_msal.get(chave)
+                if app is None:
+                    app = msal.ConfidentialClientApplication(
+                        client_id,
+                        authority=authority,
+                        client_credential=client_secret,
+                        token_cache=CacheTokensMsal(client_id, authority)
+                    )
+                    self._apps_msal[chave] = app
+        return app
+
+    def obter_token(self, client_id, authority, client_secret, scopes) -> str:
+        """
+        Token de acesso do aplicativo. Fica em memória até perto de vencer;
+        depois é relido do cache compartilhado (ou renovado por um só processo).
+        """
+        chave = (client_id, authority, tuple(scopes))
+        registro = self._tokens.get(chave)
+        if registro and time.time() < registro[1] - CacheTokensMsal.MARGEM_SEGUNDOS:
+            logger.debug("🔑 Usando token em cache")
+            return registro[0]
+
+        # Uma renovação por vez para estas credenciais, numa trava própria: a
+        # trava do registro não fica presa durante a espera do cache
+        # compartilhado e a chamada ao MSAL (IDs e cliente seguem liberados)
+        with self._lock:
+            lock_token = self._locks_token.setdefault(chave, threading.Lock())
+        with lock_token:
+            registro = self._tokens.get(chave)
+            if registro and time.time() < registro[1] - CacheTokensMsal.MARGEM_SEGUNDOS:
+                return registro[0]
+            app = self.obter_app_msal(client_id, authority, client_secret)
+            registro = app.token_cache.obter_token(app, list(scopes))
+            with self._lock:
+                self._tokens[chave] = registro
+        return registro[0]
+
+    def obter_ids(self, chave) -> Optional[Tuple[str, str]]:
+        """Retorna (site_id, drive_id) em cache, ou None se ausente/expirado."""
+        registro = self._ids.get(chave)
+        if not registro:
+            return None
+        site_id, drive_id, resolvido_em = registro
+        if datetime.now() - resolvido_em > self.TTL_IDS:
+            return None
+        return site_id, drive_id
+
+    def salvar_ids(self, chave, site_id: str, drive_id: str):
+        with self._lock:
+            self._ids[chave] = (site_id, drive_id, datetime.now())
+
+    def invalidar_ids(self, chave=None):
+        """Descarta os IDs em cache (de uma chave ou de todas)."""
+        with self._lock:
+            if chave is None:
+                self._ids.clear()
+            else:
+                self._ids.pop(chave, None)
+
+    def obter_cliente(self) -> BackendDocumentos:
+        """Retorna o cliente compartilhado do processo, criando-o na primeira chamada."""
+        cliente = self._cliente
+        if cliente is None:
+            with self._lock:
+                if self._cliente is None:
+                    self._cliente = _criar_backend()
+                cliente = self._cliente
+        return cliente
+
+
+def _criar_backend() -> BackendDocumentos:
+    """
+    Monta o backend de documentos escolhido em settings.DOCUMENTOS_BACKEND:
+
+    - 'sharepoint' (padrão): SharePoint Online via Graph.
+    - 'local': pastas no disco (DOCUMENTOS_LOCAL_RAIZ), sem rede.
+    - 'emulador': o cliente Graph real, falando com o emulador local do Graph
+      (GRAPH_EMULADOR_URL, ou um emulador iniciado dentro do processo).
+    """
+    from django.conf import settings
+
+    tipo = getattr(settings, 'DOCUMENTOS_BACKEND', 'sharepoint')
+    if tipo == 'local':
+        from .armazenamento_local import ArmazenamentoLocal
+        return ArmazenamentoLocal()
+    if tipo == 'emulador':
+        url = getattr(settings, 'GRAPH_EMULADOR_URL', None)
+        if not url:
+            from .emulador_graph import iniciar_emulador
+            url = iniciar_emulador().url
+        logger.info(f"🧪 Usando o emulador do Graph em {url}")
+        return SharePoint(graph_url=url, autenticar=False)
+    return SharePoint()
+
+
+_registro = _RegistroSharePoint()
+
+
+def obter_sharepoint() -> BackendDocumentos:
+    """
+    Retorna o cliente SharePoint (ou o backend de documentos configurado)
+    compartilhado do processo.
+
+    Site/drive são resolvidos na primeira operação e reaproveitados depois;
+    use `invalidar_cache_sharepoint()` para forçar uma nova resolução.
+    """
+    return _registro.obter_cliente()
+
+
+def invalidar_cache_sharepoint():
+    """Descarta os IDs de site/drive em cache; serão resolvidos de novo sob demanda."""
+    _registro.invalidar_ids()
+    logger.info("♻️ Cache de IDs do SharePoint invalidado")
+
+
+class SharePoint(BackendDocumentos):
     """
     Cliente para integração com Microsoft SharePoint Online via Microsoft Graph API.
     Fornece métodos para listar, fazer upload, download e gerenciar arquivos.
+
+    `graph_url` e `autenticar` permitem apontar o cliente para o emulador
+    local do Graph (integrations/emulador_graph.py), que dispensa o token.
     """
     
-    def __init__(self):
+    def __init__(self, graph_url: Optional[str] = None, autenticar: bool = True):
         self.tenant_id = os.getenv('M365_TENANT_ID')
         self.client_id = os.getenv('M365_CLIENT_ID')
         self.client_secret = os.getenv('M365_CLIENT_SECRET')
@@ -24,39 +180,52 @@ class SharePoint:
         
         self.authority = f"https://login.microsoftonline.com/{self.tenant_id}"
         self.scope = ["https://graph.microsoft.com/.default"]
-        self.graph_url = "https://graph.microsoft.com/v1.0"
+        self.graph_url = graph_url or "https://graph.microsoft.com/v1.0"
+        self.autenticar = autenticar
+        # Sessão keep-alive compartilhada, com retentativas para 429/503 (Retry-After)
+        self.http = obter_http_graph()
 
-        self._access_token = None
-        self._token_expiry = None
-        self.site_id = self._get_site_id()
-        self.drive_id = self._get_drive_id()
-        
-        logger.info(f"✅ SharePoint inicializado - Site ID: {self.site_id}, Drive ID: {self.drive_id}")
+        self._chave_ids = (self.graph_url, self.tenant_id, self.client_id, self.sharepoint_host, self.sharepoint_site)
+        self.cache_pastas = CachePastas(self)
+
+    @property
+    def site_id(self) -> str:
+        """ID do site, resolvido sob demanda e compartilhado pelo processo."""
+        return self._resolver_ids()[0]
+
+    @property
+    def drive_id(self) -> str:
+        """ID do drive, resolvido sob demanda e compartilhado pelo processo."""
+        return self._resolver_ids()[1]
+
+    def _resolver_ids(self) -> Tuple[str, str]:
+        """Busca site/drive no registro do processo; consulta o Graph só se necessário."""
+        ids = _registro.obter_ids(self._chave_ids)
+        if ids:
+            return ids
+
+        with _registro._lock:
+            ids = _registro.obter_ids(self._chave_ids)
+            if ids:
+                return ids
+            site_id = self._get_site_id()
+            drive_id = self._get_drive_id(site_id)
+            _registro.salvar_ids(self._chave_ids, site_id, drive_id)
+
+        logger.info(f"✅ SharePoint inicializado - Site ID: {site_id}, Drive ID: {drive_id}")
+        return site_id, drive_id
+
+    def invalidar_cache(self):
+        """Descarta os IDs de site/drive deste cliente; a próxima chamada os resolve de novo."""
+        _registro.invalidar_ids(self._chave_ids)
 
     def _get_access_token(self):
         """Autentica e obtém um token de acesso com cache."""
-        if self._access_token and self._token_expiry and datetime.now() < self._token_expiry:
-            logger.debug("🔑 Usando token em cache")
-            return self._access_token
-        
-        logger.info("🔑 Obtendo novo token de acesso...")
-        app = msal.ConfidentialClientApplication(
-            self.client_id,
-            authority=self.authority,
-            client_credential=self.client_secret
-        )
-        
-        result = app.acquire_token_for_client(scopes=self.scope)
-        
-        if "access_token" in result:
-            self._access_token = result['access_token']
-            self._token_expiry = datetime.now() + timedelta(minutes=55)
-            logger.info("✅ Token obtido com sucesso")
-            return self._access_token
-        else:
-            error_msg = result.get("error_description", "Erro desconhecido")
-            logger.error(f"❌ Erro ao obter token: {error_msg}")
-            raise Exception(f"Não foi possível obter o token de acesso: {error_msg}")
+        if not self.autenticar:
+            return 'emulador'
+        # O token é do processo (e o cache do MSAL, de todos os processos):
+        # instâncias novas reaproveitam o token ainda válido.
+        return _registro.obter_token(self.client_id, self.authority, self.client_secret, self.scope)
 
     @property
     def access_token(self):
@@ -76,7 +245,7 @@ class SharePoint:
         url = f"{self.graph_url}/sites/{self.sharepoint_host}:/sites/{self.sharepoint_site}"
         
         try:
-            response = requests.get(url, headers=self._get_headers(), timeout=15)
+            response = self.http.get(url, headers=self._get_headers(), timeout=15)
             response.raise_for_status()
             site_id = response.json().get('id')
             logger.info(f"✅ Site ID encontrado: {site_id}")
@@ -85,13 +254,13 @@ class SharePoint:
             logger.error(f"❌ Erro ao buscar Site ID: {e}")
             raise
 
-    def _get_drive_id(self):
+    def _get_drive_id(self, site_id: str):
         """Busca o ID da biblioteca de documentos (Drive) principal do site."""
-        logger.info(f"🔍 Buscando Drive ID para o site {self.site_id}")
-        url = f"{self.graph_url}/sites/{self.site_id}/drive"
+        logger.info(f"🔍 Buscando Drive ID para o site {site_id}")
+        url = f"{self.graph_url}/sites/{site_id}/drive"
         
         try:
-            response = requests.get(url, headers=self._get_headers(), timeout=15)
+            response = self.http.get(url, headers=self._get_headers(), timeout=15)
             response.raise_for_status()
             drive_id = response.json().get('id')
             logger.info(f"✅ Drive ID encontrado: {drive_id}")
@@ -105,7 +274,7 @@ class SharePoint:
         logger.info("🧪 Testando conexão com SharePoint...")
         try:
             url = f"{self.graph_url}/sites/{self.site_id}"
-            response = requests.get(url, headers=self._get_headers(), timeout=15)
+            response = self.http.get(url, headers=self._get_headers(), timeout=15)
             response.raise_for_status()
             site_data = response.json()
             
@@ -119,57 +288,83 @@ class SharePoint:
             logger.error(f"❌ Erro na conexão: {e}")
             raise
     
-    def listar_arquivos_pasta_raiz(self) -> List[Dict]:
-        """Lista todos os arquivos e pastas da raiz da biblioteca de documentos."""
-        logger.info("📁 Listando arquivos e pastas da raiz...")
-        try:
-            return self.listar_conteudo_pasta('root')
-        except Exception as e:
-            logger.error(f"❌ Erro ao listar pasta raiz: {e}")
-            return []
-    
-    def listar_arquivos_pasta(self, folder_id: str) -> List[Dict]:
-        """Lista todos os arquivos e pastas de uma pasta específica."""
-        logger.info(f"📁 Listando arquivos da pasta: {folder_id}...")
-        try:
-            return self.listar_conteudo_pasta(folder_id)
-        except Exception as e:
-            logger.error(f"❌ Erro ao listar pasta {folder_id}: {e}")
-            return []
-    
-    def listar_conteudo_pasta(self, folder_id: str) -> List[Dict]:
-        """Lista os arquivos e subpastas de uma pasta específica."""
+    # Campos pedidos ao Graph nas listagens (sem thumbnails, que custam caro)
+    CAMPOS_LISTAGEM = [
+        'id', 'name', 'file', 'folder', 'size', 'createdDateTime',
+        'lastModifiedDateTime', 'webUrl', 'parentReference', 'cTag', 'eTag',
+    ]
+
+    def iterar_conteudo_pasta(self, folder_id: str, campos: Optional[List[str]] = None,
+                              expandir_thumbnails: bool = False, tamanho_pagina: int = 200) -> Iterator[Dict]:
+        """
+        Percorre os itens de uma pasta página a página, seguindo o @odata.nextLink.
+
+        Os itens são entregues conforme cada página chega, então pastas grandes
+        não são truncadas nem precisam caber inteiras na memória.
+
+        :param campos: Campos do $select (padrão: CAMPOS_LISTAGEM).
+        :param expandir_thumbnails: Inclui $expand=thumbnails (mais lento).
+        :param tamanho_pagina: Valor do $top de cada página.
+        """
         logger.debug(f"Listando conteúdo da pasta com ID: {folder_id}")
-        
-        url = f"{self.graph_url}/drives/{self.drive_id}/items/{folder_id}/children?$expand=thumbnails&$top=1000"
-        
+
+        params = {
+            '$top': tamanho_pagina,
+            '$select': ','.join(campos or self.CAMPOS_LISTAGEM),
+        }
+        if expandir_thumbnails:
+            params['$expand'] = 'thumbnails'
+
+        url = f"{self.graph_url}/drives/{self.drive_id}/items/{folder_id}/children"
+        total = 0
+        paginas = 0
+
         try:
-            response = requests.get(url, headers=self._get_headers(), timeout=30)
-            response.raise_for_status()
-            
-            itens = response.json().get('value', [])
-            
-            itens_processados = []
-            for item in itens:
-                item_processado = {
-                    'id': item.get('id'),
-                    'name': item.get('name'),
-                    'file': item.get('file', {}),
-                    'folder': item.get('folder'),
-                    'size': item.get('size', 0),
-                    'createdDateTime': item.get('createdDateTime'),
-                    'lastModifiedDateTime': item.get('lastModifiedDateTime'),
-                    'webUrl': item.get('webUrl'),
-                    'mimeType': item.get('file', {}).get('mimeType', 'folder') if item.get('folder') else item.get('file', {}).get('mimeType', 'application/octet-stream'),
-                }
-                itens_processados.append(item_processado)
-            
-            logger.info(f"✅ Encontrados {len(itens_processados)} itens na pasta")
-            return itens_processados
-            
+            while url:
+                response = self.http.get(url, headers=self._get_headers(), params=params, timeout=30)
+                response.raise_for_status()
+                dados = response.json()
+                paginas += 1
+
+                for item in dados.get('value', []):
+                    total += 1
+                    yield self._processar_item(item)
+
+                # O nextLink já traz todos os parâmetros da consulta
+                url = dados.get('@odata.nextLink')
+                params = None
+
         except requests.exceptions.RequestException as e:
             logger.error(f"❌ Erro ao listar conteúdo da pasta: {e}")
             raise
+
+        logger.info(f"✅ Encontrados {total} itens na pasta ({paginas} página(s))")
+
+    def consultar_delta(self, delta_link: Optional[str] = None, completo: bool = False) -> Tuple[List[Dict], str]:
+        """
+        Consulta as mudanças do drive desde `delta_link`.
+
+        Sem `delta_link`, pede apenas o token atual (token=latest), sem itens;
+        com `completo=True`, enumera todos os itens do drive.
+        :return: Tupla (itens_alterados_brutos, novo_delta_link)
+        """
+        if delta_link:
+            url, params = delta_link, None
+        else:
+            url = f"{self.graph_url}/drives/{self.drive_id}/root/delta"
+            params = None if completo else {'token': 'latest'}
+
+        itens = []
+        while True:
+            response = self.http.get(url, headers=self._get_headers(), params=params, timeout=30)
+            response.raise_for_status()
+            dados = response.json()
+            itens.extend(dados.get('value', []))
+
+            if dados.get('@odata.nextLink'):
+                url, params = dados['@odata.nextLink'], None
+                continue
+            return itens, dados.get('@odata.deltaLink')
     
     def criar_pasta_caso(self, nome_pasta_caso: str) -> str:
         """Cria uma pasta principal para o caso na raiz da biblioteca de documentos."""
@@ -184,11 +379,13 @@ class SharePoint:
         }
         
         try:
-            response = requests.post(url, headers=self._get_headers(), json=payload, timeout=15)
+            response = self.http.post(url, headers=self._get_headers(), json=payload, timeout=15)
             response.raise_for_status()
             
             folder_data = response.json()
             folder_id = folder_data.get('id')
+            self.cache_pastas.invalidar_pasta('root')
+            self.cache_pastas.registrar_nome('root', self._processar_item(folder_data))
             logger.info(f"✅ Pasta '{nome_pasta_caso}' criada com sucesso! ID: {folder_id}")
             return folder_id
             
@@ -209,15 +406,121 @@ class SharePoint:
         }
         
         try:
-            response = requests.post(url, headers=self._get_headers(), json=payload, timeout=15)
+            response = self.http.post(url, headers=self._get_headers(), json=payload, timeout=15)
             response.raise_for_status()
             
             logger.info(f"✅ Subpasta '{nome_subpasta}' criada com sucesso!")
+            self.cache_pastas.invalidar_pasta(id_pasta_pai)
+            self.cache_pastas.registrar_nome(id_pasta_pai, self._processar_item(response.json()))
             return response.json()
             
         except requests.exceptions.RequestException as e:
             logger.error(f"❌ Erro ao criar subpasta: {e}")
             raise
+
+    # Limite de sub-requisições por chamada ao endpoint $batch do Graph
+    LIMITE_LOTE = 20
+
+    def executar_lote(self, operacoes: List[Dict], max_tentativas: int = 4) -> List[Dict]:
+        """
+        Executa várias operações via JSON $batch do Graph (até 20 por requisição).
+
+        :param operacoes: Lista de dicts com 'method', 'url' (relativa a /v1.0, ex:
+                          "/drives/{id}/items/{id}/children") e, opcionalmente, 'body'.
+        :param max_tentativas: Tentativas para sub-requisições com 429/5xx.
+        :return: Lista na mesma ordem de `operacoes`, com 'status', 'body' e 'headers'.
+        """
+        resultados: Dict[str, Dict] = {}
+        pendentes = [str(i) for i in range(len(operacoes))]
+        tentativa = 0
+
+        while pendentes and tentativa < max_tentativas:
+            tentativa += 1
+            espera = 0.0
+            repetir = []
+
+            for inicio in range(0, len(pendentes), self.LIMITE_LOTE):
+                ids_lote = pendentes[inicio:inicio + self.LIMITE_LOTE]
+                requisicoes = []
+                for id_req in ids_lote:
+                    op = operacoes[int(id_req)]
+                    requisicao = {'id': id_req, 'method': op['method'].upper(), 'url': op['url']}
+                    if op.get('body') is not None:
+                        requisicao['body'] = op['body']
+                        requisicao['headers'] = {'Content-Type': 'application/json'}
+                    requisicoes.append(requisicao)
+
+                logger.info(f"📦 Enviando lote com {len(requisicoes)} operações (tentativa {tentativa})...")
+                response = self.http.post(
+                    f"{self.graph_url}/$batch",
+                    headers=self._get_headers(),
+                    json={'requests': requisicoes},
+                    timeout=60
+                )
+                response.raise_for_status()
+
+                for item in response.json().get('responses', []):
+                    status = int(item.get('status', 0))
+                    id_req = item.get('id')
+                    headers = item.get('headers') or {}
+                    if status in STATUS_RETENTAVEIS:
+                        repetir.append(id_req)
+                        espera = max(espera, segundos_retry_after(headers.get('Retry-After')) or 2 ** tentativa)
+                    resultados[id_req] = {'status': status, 'body': item.get('body') or {}, 'headers': headers}
+
+            pendentes = sorted(repetir, key=int)
+            if pendentes and tentativa < max_tentativas:
+                logger.warning(f"⏳ {len(pendentes)} operações do lote limitadas pelo Graph. Aguardando {espera:.1f}s...")
+                time.sleep(min(espera, self.http.backoff_max))
+
+        return [
+            resultados.get(str(i), {'status': 0, 'body': {}, 'headers': {}})
+            for i in range(len(operacoes))
+        ]
+
+    def criar_pastas_em_lote(self, pastas: List[Tuple[str, str]]) -> List[Dict]:
+        """
+        Cria várias pastas (cada uma na sua pasta pai) usando $batch.
+
+        :param pastas: Pares (id_pasta_pai, nome).
+        :return: Lista (na ordem de `pastas`) com 'pai', 'nome', 'ok', 'item' e 'erro'.
+        """
+        if not pastas:
+            return []
+        logger.info(f"📁 Criando {len(pastas)} pastas em lote...")
+
+        operacoes = [
+            {
+                'method': 'POST',
+                'url': f"/drives/{self.drive_id}/items/{id_pasta_pai}/children",
+                'body': {
+                    "name": nome,
+                    "folder": {},
+                    "@microsoft.graph.conflictBehavior": "fail"
+                },
+            }
+            for id_pasta_pai, nome in pastas
+        ]
+
+        resultados = []
+        for (id_pasta_pai, nome), resultado in zip(pastas, self.executar_lote(operacoes)):
+            ok = 200 <= resultado['status'] < 300
+            erro = None if ok else (resultado['body'].get('error', {}).get('message') or f"HTTP {resultado['status']}")
+            resultados.append({
+                'pai': id_pasta_pai,
+                'nome': nome,
+                'ok': ok,
+                'item': resultado['body'] if ok else None,
+                'erro': erro,
+            })
+            if ok:
+                self.cache_pastas.registrar_nome(id_pasta_pai, self._processar_item(resultado['body']))
+
+        for id_pasta_pai in {id_pasta_pai for id_pasta_pai, _ in pastas}:
+            self.cache_pastas.invalidar_pasta(id_pasta_pai)
+        criadas = sum(1 for r in resultados if r['ok'])
+        logger.info(f"✅ {criadas}/{len(pastas)} pastas criadas em lote")
+        return resultados
     
     def get_item_details(self, item_id: str) -> Dict:
         """Busca os metadados de um item (pasta ou arquivo) pelo seu ID."""
@@ -226,7 +529,7 @@ class SharePoint:
         url = f"{self.graph_url}/drives/{self.drive_id}/items/{item_id}"
         
         try:
-            response = requests.get(url, headers=self._get_headers(), timeout=15)
+            response = self.http.get(url, headers=self._get_headers(), timeout=15)
             response.raise_for_status()
             
             item_details = response.json()
@@ -238,10 +541,6 @@ class SharePoint:
             logger.error(f"❌ Erro ao buscar detalhes do item {item_id}: {e}")
             raise
     
-    def get_folder_details(self, folder_id: str) -> Dict:
-        """Alias para get_item_details para melhor legibilidade."""
-        return self.get_item_details(folder_id)
-    
     def get_preview_url(self, item_id: str) -> Optional[str]:
         """Obtém uma URL de preview para um arquivo."""
         logger.info(f"📄 Obtendo URL de preview para: {item_id}")
@@ -249,7 +548,7 @@ class SharePoint:
         
         try:
             headers = self._get_headers()
-            response = requests.post(url, headers=headers, timeout=15)
+            response = self.http.post(url, headers=headers, timeout=15)
             response.raise_for_status()
             
             preview_url = response.json().get('getUrl')
@@ -260,11 +559,38 @@ class SharePoint:
             logger.warning(f"⚠️ Não foi possível obter preview: {e}")
             return None
     
+    def obter_item_por_caminho(self, caminho: str, pasta_base: str = 'root') -> Optional[Dict]:
+        """Busca um item pelo caminho (/root:/caminho: ou /items/{id}:/caminho:) numa única chamada."""
+        base = 'root' if pasta_base == self.RAIZ else f'items/{pasta_base}'
+        url = f"{self.graph_url}/drives/{self.drive_id}/{base}:/{quote(caminho.strip('/'))}:"
+
+        response = self.http.get(url, headers=self._get_headers(),
+                                 params={'$select': ','.join(self.CAMPOS_LISTAGEM)}, timeout=15)
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return self._processar_item(response.json())
+
+    def baixar_thumbnail(self, item_id: str, tamanho: str = 'medium') -> Optional[bytes]:
+        """
+        Baixa a miniatura gerada pelo SharePoint (small/medium/large); None se
+        não houver (404, que também é a resposta enquanto o Graph ainda gera a
+        miniatura de um upload novo). Falhas de rede e demais erros HTTP
+        (429/5xx após as novas tentativas) são levantados.
+        """
+        url = f"{self.graph_url}/drives/{self.drive_id}/items/{item_id}/thumbnails/0/{tamanho}/content"
+
+        response = self.http.get(url, headers=self._get_headers(), timeout=15)
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return response.content or None
+
     def upload_arquivo(self, folder_id: str, file_name: str, file_content: bytes) -> Dict:
         """Faz o upload de um arquivo para uma pasta específica no SharePoint."""
         logger.info(f"📤 Iniciando upload de '{file_name}' para pasta {folder_id}...")
         
-        url = f"{self.graph_url}/drives/{self.drive_id}/items/{folder_id}:/{file_name}:/content"
+        url = f"{self.graph_url}/drives/{self.drive_id}/items/{folder_id}:/{quote(file_name)}:/content"
         
         headers = {
             'Authorization': f'Bearer {self.access_token}',
@@ -272,16 +598,93 @@ class SharePoint:
         }
         
         try:
-            response = requests.put(url, headers=headers, data=file_content, timeout=60)
+            response = self.http.put(url, headers=headers, data=file_content, timeout=60)
             response.raise_for_status()
             
             logger.info(f"✅ Arquivo '{file_name}' enviado com sucesso!")
-            return response.json()
+            item = response.json()
+            self.cache_pastas.invalidar_pasta(folder_id)
+            # Um arquivo substituído mantém o ID: os detalhes em cache passam a ser os da nova versão
+            self.cache_pastas.gravar_detalhes(item['id'], item)
+            return item
             
         except requests.exceptions.RequestException as e:
             logger.error(f"❌ Erro ao fazer upload: {e}")
             raise
     
+    # O PUT simples em /content só aceita arquivos de até 4 MB
+    LIMITE_UPLOAD_SIMPLES = 4 * 1024 * 1024
+    # Os pedaços de uma sessão de upload precisam ser múltiplos de 320 KiB
+    TAMANHO_PEDACO_UPLOAD = 320 * 1024 * int(os.getenv('SHAREPOINT_UPLOAD_PEDACOS_320K', '16'))
+
+    def criar_sessao_upload(self, folder_id: str, file_name: str) -> str:
+        """Cria uma sessão de upload (createUploadSession) e retorna a uploadUrl."""
+        url = f"{self.graph_url}/drives/{self.drive_id}/items/{folder_id}:/{quote(file_name)}:/createUploadSession"
+        payload = {"item": {"@microsoft.graph.conflictBehavior": "replace"}}
+
+        response = self.http.post(url, headers=self._get_headers(), json=payload, timeout=15)
+        response.raise_for_status()
+        return response.json()['uploadUrl']
+
+    def _proximo_offset_sessao(self, upload_url: str) -> int:
+        """Consulta a sessão para saber a partir de qual byte o Graph espera o envio."""
+        response = self.http.get(upload_url, timeout=15)
+        response.raise_for_status()
+        intervalos = response.json().get('nextExpectedRanges') or ['0-']
+        return int(intervalos[0].split('-')[0])
+
+    def upload_em_sessao(self, folder_id: str, file_name: str, arquivo, tamanho: int,
+                         tamanho_pedaco: Optional[int] = None, max_retomadas: int = 5) -> Dict:
+        """
+        Envia um arquivo grande por uma sessão de upload do Graph.
+
+        Lê `arquivo` (objeto com seek/read) um pedaço por vez, então o uso de
+        memória não depende do tamanho do arquivo. Se um pedaço falhar por erro
+        transitório, consulta a sessão e retoma do último byte confirmado.
+        """
+        tamanho_pedaco = tamanho_pedaco or self.TAMANHO_PEDACO_UPLOAD
+        logger.info(f"📤 Upload em sessão de '{file_name}' ({tamanho} bytes, pedaços de {tamanho_pedaco})...")
+
+        upload_url = self.criar_sessao_upload(folder_id, file_name)
+        offset = 0
+        retomadas = 0
+
+        while True:
+            arquivo.seek(offset)
+            pedaco = arquivo.read(min(tamanho_pedaco, tamanho - offset))
+            fim = offset + len(pedaco) - 1
+            # A uploadUrl já é pré-autenticada: não enviar o token do Graph
+            headers = {
+                'Content-Length': str(len(pedaco)),
+                'Content-Range': f'bytes {offset}-{fim}/{tamanho}',
+            }
+
+            try:
+                response = self.http.put(upload_url, headers=headers, data=pedaco, timeout=120)
+                if response.status_code in (200, 201):
+                    logger.info(f"✅ Arquivo '{file_name}' enviado com sucesso!")
+                    item = response.json()
+                    self.cache_pastas.invalidar_pasta(folder_id)
+                    self.cache_pastas.gravar_detalhes(item['id'], item)
+                    return item
+                response.raise_for_status()
+
+                # 202: pedaço aceito, o Graph informa o próximo intervalo esperado
+                intervalos = response.json().get('nextExpectedRanges') or [f'{fim + 1}-']
+                offset = int(intervalos[0].split('-')[0])
+
+            except requests.exceptions.RequestException as e:
+                retomadas += 1
+                if retomadas > max_retomadas:
+                    logger.error(f"❌ Upload de '{file_name}' abortado após {max_retomadas} retomadas: {e}")
+                    try:
+                        self.http.delete(upload_url, timeout=15)  # Descarta a sessão no Graph
+                    except requests.exceptions.RequestException:
+                        pass
+                    raise
+                logger.warning(f"🔁 Falha no pedaço {offset}-{fim} de '{file_name}' ({e}). Retomando...")
+                offset = self._proximo_offset_sessao(upload_url)
+
     def download_arquivo(self, item_id: str) -> bytes:
         """Faz o download de um arquivo do SharePoint."""
         logger.info(f"📥 Iniciando download do arquivo: {item_id}...")
@@ -289,7 +692,7 @@ class SharePoint:
         url = f"{self.graph_url}/drives/{self.drive_id}/items/{item_id}/content"
         
         try:
-            response = requests.get(url, headers=self._get_headers(), timeout=60)
+            response = self.http.get(url, headers=self._get_headers(), timeout=60)
             response.raise_for_status()
             
             logger.info(f"✅ Arquivo baixado com sucesso ({len(response.content)} bytes)")
@@ -298,7 +701,47 @@ class SharePoint:
         except requests.exceptions.RequestException as e:
             logger.error(f"❌ Erro ao fazer download: {e}")
             raise
-    
+
+    def abrir_download(self, item_id: str, range_header: Optional[str] = None,
+                       if_none_match: Optional[str] = None) -> Tuple[Dict, Optional[requests.Response]]:
+        """
+        Prepara o download em streaming de um arquivo.
+
+        Uma única chamada traz os metadados e a URL pré-autenticada
+        (@microsoft.graph.downloadUrl); o conteúdo é então pedido com
+        stream=True, repassando o cabeçalho Range. Retorna (metadados, resposta),
+        com resposta None quando o If-None-Match bate com o eTag (304).
+        Quem consome a resposta deve fechá-la ao final.
+        """
+        url = (f"{self.graph_url}/drives/{self.drive_id}/items/{item_id}"
+               f"?$select=id,name,size,eTag,cTag,file,lastModifiedDateTime,@microsoft.graph.downloadUrl")
+
+        try:
+            response = self.http.get(url, headers=self._get_headers(), timeout=15)
+            response.raise_for_status()
+            metadados = response.json()
+
+            if etag_confere(if_none_match, metadados.get('eTag')):
+                logger.debug(f"⚡ Download de {item_id} não modificado (304)")
+                return metadados, None
+
+            download_url = metadados.get('@microsoft.graph.downloadUrl')
+            if not download_url:
+                raise ValueError(f"Item {item_id} não possui downloadUrl (é uma pasta?)")
+
+            # A downloadUrl é pré-autenticada: não enviar o token do Graph
+            headers = {'Range': range_header} if range_header else {}
+            conteudo = self.http.get(download_url, headers=headers, stream=True, timeout=60)
+            if conteudo.status_code != 416:  # Range inválido é repassado ao cliente
+                conteudo.raise_for_status()
+
+            logger.info(f"📥 Download em streaming de '{metadados.get('name')}' (status {conteudo.status_code})")
+            return metadados, conteudo
+
+        except requests.exceptions.RequestException as e:
+            logger.error(f"❌ Erro ao abrir download de {item_id}: {e}")
+            raise
+
     def excluir_item(self, item_id: str) -> bool:
         """Exclui um item (arquivo ou pasta) do SharePoint pelo seu ID."""
         logger.warning(f"🗑️  Excluindo item com ID: {item_id}...")
@@ -306,97 +749,30 @@ class SharePoint:
         url = f"{self.graph_url}/drives/{self.drive_id}/items/{item_id}"
         
         try:
-            response = requests.delete(url, headers=self._get_headers(), timeout=15)
+            response = self.http.delete(url, headers=self._get_headers(), timeout=15)
             response.raise_for_status()
             
             logger.info(f"✅ Item {item_id} excluído com sucesso!")
+            self.cache_pastas.invalidar_item(item_id)
             return True
             
         except requests.exceptions.RequestException as e:
             logger.error(f"❌ Erro ao excluir item: {e}")
             raise
     
-    def buscar_arquivo_por_nome(self, nome: str, folder_id: str = 'root') -> Optional[Dict]:
-        """Busca um arquivo por nome em uma pasta específica."""
-        logger.info(f"🔍 Buscando arquivo: '{nome}' em pasta {folder_id}...")
-        
-        try:
-            itens = self.listar_conteudo_pasta(folder_id)
-            for item in itens:
-                if item['name'].lower() == nome.lower():
-                    logger.info(f"✅ Arquivo encontrado: {item['id']}")
-                    return item
-            
-            logger.info(f"⚠️ Arquivo '{nome}' não encontrado")
-            return None
-            
-        except Exception as e:
-            logger.error(f"❌ Erro ao buscar arquivo: {e}")
-            return None
-    
-    def obter_ou_criar_pasta_caso(self, nome_caso: str) -> str:
-        """
-        Obtém a pasta do caso ou a cria se não existir.
-        
-        :param nome_caso: Nome do caso (ex: "Caso #29")
-        :return: ID da pasta do caso
+    def fazer_upload(self, arquivo, pasta_id: str) -> Dict:
         """
-        logger.info(f"🔍 Buscando ou criando pasta do caso: '{nome_caso}'...")
-        
-        try:
-            # Tenta buscar a pasta existente
-            pasta = self.buscar_arquivo_por_nome(nome_caso, 'root')
-            if pasta and pasta.get('folder'):
-                logger.info(f"✅ Pasta do caso encontrada: {pasta['id']}")
-                return pasta['id']
-            
-            # Se não existe, cria
-            logger.info(f"📁 Criando nova pasta: '{nome_caso}'...")
-            folder_id = self.criar_pasta_caso(nome_caso)
-            return folder_id
-            
-        except Exception as e:
-            logger.error(f"❌ Erro ao obter/criar pasta do caso: {e}")
-            raise
-
-    # integrations/sharepoint.py (adicionar no final da classe)
-
-def criar_pasta(self, nome_pasta: str, pasta_pai_id: str) -> Dict:
-    """
-    Alias universal para criar pasta (detecta se é raiz ou subpasta).
-    """
-    if pasta_pai_id == 'root':
-        return {'id': self.criar_pasta_caso(nome_pasta)}
-    else:
-        return self.criar_subpasta(pasta_pai_id, nome_pasta)
+        Faz upload de um arquivo Django (InMemoryUploadedFile ou TemporaryUploadedFile).
 
-def listar_arquivos_pasta(self, folder_id: str) -> List[Dict]:
-    """
-    Alias para listar_conteudo_pasta (para compatibilidade).
-    """
-    return self.listar_conteudo_pasta(folder_id)
+        Arquivos pequenos vão num único PUT; acima de LIMITE_UPLOAD_SIMPLES usa
+        uma sessão de upload, lendo o arquivo em pedaços (memória limitada).
+        """
+        logger.info(f"📤 Upload: {arquivo.name} -> pasta {pasta_id}")
 
-def fazer_upload(self, arquivo, pasta_id: str) -> Dict:
-    """
-    Faz upload de um arquivo Django (InMemoryUploadedFile ou TemporaryUploadedFile).
-    """
-    logger.info(f"📤 Upload: {arquivo.name} -> pasta {pasta_id}")
-    
-    # Lê o conteúdo do arquivo
-    arquivo.seek(0)  # Garante que está no início
-    conteudo = arquivo.read()
-    
-    # Usa o método original upload_arquivo
-    return self.upload_arquivo(pasta_id, arquivo.name, conteudo)
+        tamanho = arquivo.size
+        arquivo.seek(0)  # Garante que está no início
 
-def baixar_arquivo(self, item_id: str) -> bytes:
-    """
-    Alias para download_arquivo (para compatibilidade).
-    """
-    return self.download_arquivo(item_id)
+        if tamanho <= self.LIMITE_UPLOAD_SIMPLES:
+            return self.upload_arquivo(pasta_id, arquivo.name, arquivo.read())
 
-def obter_info_arquivo(self, item_id: str) -> Dict:
-    """
-    Alias para get_item_details (para compatibilidade).
-    """
-    return self.get_item_details(item_id)
\ No newline at end of file
+        return self.upload_em_sessao(pasta_id, arquivo.name, arquivo, tamanho)
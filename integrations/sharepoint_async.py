@@ -0,0 +1,212 @@
+# integrations/sharepoint_async.py
+import os
+import time
+import random
+import asyncio
+import logging
+import weakref
+from typing import Dict, List, Optional
+
+import httpx
+from asgiref.sync import sync_to_async
+
+from .backends import BackendDocumentos
+from .graph_http import STATUS_RETENTAVEIS, normalizar_endpoint, obter_http_graph, segundos_retry_after
+from .sharepoint import SharePoint, obter_sharepoint
+
+logger = logging.getLogger(__name__)
+
+
+def _novo_cliente_http() -> httpx.AsyncClient:
+    limites = httpx.Limits(
+        max_connections=int(os.getenv('GRAPH_POOL_MAXSIZE', '32')),
+        max_keepalive_connections=int(os.getenv('GRAPH_POOL_CONNECTIONS', '10')),
+    )
+    return httpx.AsyncClient(limits=limites, timeout=httpx.Timeout(30.0, connect=10.0))
+
+
+# Sob ASGI o event loop vive o processo inteiro: um AsyncClient por loop,
+# reaproveitando as conexões entre requisições. Cada entrada guarda também o
+# "guardião" que fecha o cliente quando o loop encerra.
+_clientes: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, tuple]" = weakref.WeakKeyDictionary()
+
+
+async def _guardar_cliente(cliente: httpx.AsyncClient):
+    """Gerador que segura o cliente; o loop o finaliza em shutdown_asyncgens(), fechando o cliente."""
+    try:
+        yield cliente
+    finally:
+        await cliente.aclose()
+
+
+async def _cliente_compartilhado() -> httpx.AsyncClient:
+    loop = asyncio.get_running_loop()
+    registro = _clientes.get(loop)
+    if registro is None or registro[0].is_closed:
+        cliente = _novo_cliente_http()
+        guardiao = _guardar_cliente(cliente)
+        await guardiao.__anext__()
+        _clientes[loop] = (cliente, guardiao)
+        return cliente
+    return registro[0]
+
+
+class SharePointAsync:
+    """
+    Variante assíncrona (httpx) das leituras do SharePoint, para views ASGI.
+
+    Reaproveita o cliente síncrono compartilhado para o que já está em cache no
+    processo: token MSAL, IDs do site/drive e o cache de pastas. Só as chamadas
+    ao Graph em si são assíncronas, com as mesmas regras de retentativa
+    (Retry-After / backoff) e as mesmas métricas da sessão síncrona.
+
+    Usar como `async with`. Com `compartilhar_cliente` (ASGI), o AsyncClient
+    é o do event loop, mantido entre requisições. Sem ele (WSGI, onde cada
+    view assíncrona roda num loop novo), o cliente é aberto para esta
+    requisição e fechado na saída do bloco.
+    """
+
+    def __init__(self, sp: Optional[BackendDocumentos] = None, compartilhar_cliente: bool = False):
+        self.sp = sp or obter_sharepoint()
+        self.compartilhar_cliente = compartilhar_cliente
+        self._cliente: Optional[httpx.AsyncClient] = None
+        self._cliente_proprio = False
+        # Backends sem Graph (ex: armazenamento local) rodam em thread
+        self.remoto = isinstance(self.sp, SharePoint)
+        self.graph_url = getattr(self.sp, 'graph_url', None)
+        self._http_sync = obter_http_graph()
+
+    async def __aenter__(self) -> 'SharePointAsync':
+        if self.compartilhar_cliente:
+            self._cliente = await _cliente_compartilhado()
+        else:
+            self._cliente = _novo_cliente_http()
+            self._cliente_proprio = True
+        return self
+
+    async def __aexit__(self, *exc):
+        if self._cliente_proprio:
+            await self._cliente.aclose()
+        self._cliente = None
+        self._cliente_proprio = False
+
+    # -------------------------------------------------------------------------
+    # Infraestrutura
+    # -------------------------------------------------------------------------
+
+    async def _preparar(self) -> Dict:
+        """Resolve token e drive ID (chamadas síncronas, quase sempre em cache)."""
+        def preparar():
+            return self.sp._get_headers(), self.sp.drive_id
+
+        headers, self.drive_id = await sync_to_async(preparar, thread_sensitive=False)()
+        return headers
+
+    async def _get(self, url: str, headers: Dict, params: Optional[Dict] = None) -> httpx.Response:
+        """GET com as mesmas retentativas do GraphHTTP. Chama raise_for_status()."""
+        http = self._http_sync
+        endpoint = normalizar_endpoint('GET', url)
+        cliente = self._cliente
+        if cliente is None:
+            raise RuntimeError("SharePointAsync deve ser usado dentro de 'async with'")
+        inicio = time.monotonic()
+        retentativas = 0
+
+        while True:
+            try:
+                response = await cliente.get(url, headers=headers, params=params)
+            except httpx.TransportError as e:
+                if retentativas + 1 >= http.max_tentativas:
+                    http.metricas.registrar(endpoint, (time.monotonic() - inicio) * 1000, retentativas, None)
+                    raise
+                espera = random.uniform(0, min(http.backoff_max, http.backoff_base * (2 ** retentativas)))
+                logger.warning(f"🔁 Erro de rede em {endpoint} ({e}). Nova tentativa em {espera:.1f}s...")
+                retentativas += 1
+                await asyncio.sleep(espera)
+                continue
+
+            if response.status_code in STATUS_RETENTAVEIS and retentativas + 1 < http.max_tentativas:
+                espera = segundos_retry_after(response.headers.get('Retry-After'))
+                if espera is None:
+                    espera = random.uniform(0, min(http.backoff_max, http.backoff_base * (2 ** retentativas)))
+                espera = min(espera, http.backoff_max)
+                logger.warning(f"⏳ Graph respondeu {response.status_code} em {endpoint}. Aguardando {espera:.1f}s...")
+                retentativas += 1
+                await asyncio.sleep(espera)
+                continue
+
+            http.metricas.registrar(endpoint, (time.monotonic() - inicio) * 1000, retentativas, response.status_code)
+            response.raise_for_status()
+            return response
+
+    # -------------------------------------------------------------------------
+    # Chamadas ao Graph
+    # -------------------------------------------------------------------------
+
+    async def get_item_details(self, item_id: str) -> Dict:
+        """Busca os metadados de um item (pasta ou arquivo) pelo seu ID."""
+        headers = await self._preparar()
+        url = f"{self.graph_url}/drives/{self.drive_id}/items/{item_id}"
+        try:
+            response = await self._get(url, headers)
+            return response.json()
+        except httpx.HTTPError as e:
+            logger.error(f"❌ Erro ao buscar detalhes do item {item_id}: {e}")
+            raise
+
+    async def listar_conteudo_pasta(self, folder_id: str, tamanho_pagina: int = 200) -> List[Dict]:
+        """Lista todos os itens da pasta, seguindo o @odata.nextLink."""
+        headers = await self._preparar()
+        url = f"{self.graph_url}/drives/{self.drive_id}/items/{folder_id}/children"
+        params = {'$top': tamanho_pagina, '$select': ','.join(SharePoint.CAMPOS_LISTAGEM)}
+        itens = []
+        try:
+            while url:
+                dados = (await self._get(url, headers, params)).json()
+                itens.extend(SharePoint._processar_item(item) for item in dados.get('value', []))
+                url = dados.get('@odata.nextLink')
+                params = None
+        except httpx.HTTPError as e:
+            logger.error(f"❌ Erro ao listar conteúdo da pasta: {e}")
+            raise
+
+        logger.info(f"✅ Encontrados {len(itens)} itens na pasta")
+        return itens
+
+    # -------------------------------------------------------------------------
+    # Leituras com o cache de pastas
+    # -------------------------------------------------------------------------
+
+    async def detalhes(self, item_id: str) -> Dict:
+        """Equivalente assíncrono de CachePastas.detalhes."""
+        cache_pastas = self.sp.cache_pastas
+        if not self.remoto:
+            return await sync_to_async(cache_pastas.detalhes, thread_sensitive=False)(item_id)
+        detalhes = await sync_to_async(cache_pastas.obter_detalhes, thread_sensitive=False)(item_id)
+        if detalhes is None:
+            detalhes = await self.get_item_details(item_id)
+            await sync_to_async(cache_pastas.gravar_detalhes, thread_sensitive=False)(item_id, detalhes)
+        return detalhes
+
+    async def listar(self, folder_id: str) -> List[Dict]:
+        """Equivalente assíncrono de CachePastas.listar."""
+        cache_pastas = self.sp.cache_pastas
+        if not self.remoto:
+            return await sync_to_async(cache_pastas.listar, thread_sensitive=False)(folder_id)
+        itens = await sync_to_async(cache_pastas.obter_pasta, thread_sensitive=False)(folder_id)
+        if itens is None:
+            itens = await self.listar_conteudo_pasta(folder_id)
+            await sync_to_async(cache_pastas.gravar_pasta, thread_sensitive=False)(folder_id, itens)
+        return itens
+
+    async def detalhes_e_conteudo(self, folder_id: str):
+        """Busca os detalhes da pasta e seus itens em paralelo."""
+        return await asyncio.gather(self.detalhes(folder_id), self.listar(folder_id))
+
+
+def obter_sharepoint_async(compartilhar_cliente: bool = False) -> SharePointAsync:
+    """
+    Cliente assíncrono sobre o SharePoint compartilhado do processo (usar com
+    `async with`). Passe `compartilhar_cliente=True` só sob ASGI.
+    """
+    return SharePointAsync(obter_sharepoint(), compartilhar_cliente=compartilhar_cliente)
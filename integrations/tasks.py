@@ -0,0 +1,36 @@
+# integrations/tasks.py
+import logging
+
+from celery import shared_task
+from django.core.cache import cache
+
+from .espelho import sincronizar_espelho
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(ignore_result=True)
+def sincronizar_espelho_drive():
+    """Aplica o delta do drive no espelho DriveItem (agendada pelo Celery beat)."""
+    # Evita duas sincronizações simultâneas se uma execução atrasar
+    if not cache.add('espelho_drive:trava', 1, 60 * 10):
+        logger.info("⏭️ Sincronização do espelho já em andamento. Pulando.")
+        return
+    try:
+        sincronizar_espelho()
+    finally:
+        cache.delete('espelho_drive:trava')
+
+
+@shared_task(ignore_result=True)
+def enviar_emails_pendentes():
+    """Envia a fila de e-mails (agendada ao enfileirar e pelo Celery beat, para resumos e novas tentativas)."""
+    from .emails import enviar_emails_pendentes as enviar
+    enviar()
+
+
+@shared_task(ignore_result=True)
+def entregar_webhooks_pendentes():
+    """Entrega a fila do webhook do n8n (agendada ao enfileirar e pelo Celery beat, para novas tentativas)."""
+    from .webhooks import entregar_webhooks_pendentes as entregar
+    entregar()
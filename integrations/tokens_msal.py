@@ -0,0 +1,107 @@
+# integrations/tokens_msal.py
+import os
+import time
+import hashlib
+import logging
+from typing import List, Optional, Tuple
+
+import msal
+from django.core.cache import cache as cache_padrao
+
+logger = logging.getLogger(__name__)
+
+
+class CacheTokensMsal(msal.SerializableTokenCache):
+    """
+    Cache de tokens do MSAL guardado no cache do Django (Redis em produção),
+    compartilhado por todos os processos: web, ASGI e workers do Celery.
+
+    O estado serializado é relido antes de cada consulta e regravado quando o
+    MSAL obtém um token novo. A renovação é protegida por uma trava no próprio
+    cache, para que só um processo peça token ao Azure AD por vez.
+    """
+
+    # O MSAL considera vencido o token com menos de 5 minutos; usamos a mesma margem
+    MARGEM_SEGUNDOS = 5 * 60
+    TTL_TRAVA = 30
+    ESPERA_TRAVA = float(os.getenv('MSAL_ESPERA_TRAVA_SEGUNDOS', '10'))
+
+    def __init__(self, client_id: str, authority: str, cache=None):
+        super().__init__()
+        self.client_id = client_id
+        self.cache = cache or cache_padrao
+        sufixo = hashlib.sha1(f'{client_id}:{authority}'.encode()).hexdigest()[:16]
+        self._chave = f'msal:tokens:{sufixo}'
+        self._chave_trava = f'msal:trava:{sufixo}'
+        self._estado_carregado = None
+
+    def carregar(self):
+        """Traz para a memória o estado gravado por outro processo, se mudou."""
+        estado = self.cache.get(self._chave)
+        if estado and estado != self._estado_carregado:
+            self.deserialize(estado)
+            self._estado_carregado = estado
+
+    def salvar(self, ttl: int):
+        if self.has_state_changed:
+            estado = self.serialize()
+            self.cache.set(self._chave, estado, ttl)
+            self._estado_carregado = estado
+
+    def token_valido(self, scopes: List[str]) -> Optional[Tuple[str, float]]:
+        """(token, expira_em) de um token de aplicativo ainda utilizável, sem ir à rede."""
+        agora = time.time()
+        for entrada in self.search(self.CredentialType.ACCESS_TOKEN, target=scopes,
+                                   query={'client_id': self.client_id}):
+            expira_em = int(entrada['expires_on'])
+            if expira_em - agora > self.MARGEM_SEGUNDOS:
+                return entrada['secret'], expira_em
+        return None
+
+    def obter_token(self, app: msal.ConfidentialClientApplication, scopes: List[str]) -> Tuple[str, float]:
+        """
+        Token de aplicativo (client credentials) para `scopes`: do cache
+        compartilhado se houver um válido; senão pede um novo, com a trava.
+
+        :return: Tupla (access_token, expira_em em segundos desde a época)
+        """
+        self.carregar()
+        encontrado = self.token_valido(scopes)
+        if encontrado:
+            return encontrado
+
+        limite = time.monotonic() + self.ESPERA_TRAVA
+        tem_trava = True
+        while not self.cache.add(self._chave_trava, 1, self.TTL_TRAVA):
+            # Outro processo está renovando; aguarda o token aparecer no cache
+            time.sleep(0.2)
+            self.carregar()
+            encontrado = self.token_valido(scopes)
+            if encontrado:
+                return encontrado
+            if time.monotonic() > limite:
+                logger.warning("⚠️ Trava de renovação do token não foi liberada a tempo. Renovando mesmo assim.")
+                tem_trava = False
+                break
+
+        try:
+            self.carregar()
+            encontrado = self.token_valido(scopes)
+            if encontrado:
+                return encontrado
+
+            logger.info("🔑 Obtendo novo token de acesso...")
+            resultado = app.acquire_token_for_client(scopes=scopes)
+            if 'access_token' not in resultado:
+                error_msg = resultado.get("error_description", "Erro desconhecido")
+                logger.error(f"❌ Erro ao obter token: {error_msg}")
+                raise Exception(f"Não foi possível obter o token de acesso: {error_msg}")
+
+            expira_em = time.time() + int(resultado.get('expires_in', 3600))
+            # O estado guarda só tokens de aplicativo; vale até o token vencer
+            self.salvar(ttl=int(expira_em - time.time()))
+            logger.info(f"✅ Token obtido com sucesso (expira em {int(resultado.get('expires_in', 3600)) // 60} min)")
+            return resultado['access_token'], expira_em
+        finally:
+            if tem_trava:
+                self.cache.delete(self._chave_trava)
@@ -0,0 +1,9 @@
+# integrations/urls.py
+from django.urls import path
+from . import views
+
+app_name = 'integrations'
+
+urlpatterns = [
+    path('graph/metricas/', views.metricas_graph, name='metricas_graph'),
+]
@@ -1,3 +1,11 @@
-from django.shortcuts import render
+# integrations/views.py
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
 
-# Create your views here.
+from .graph_http import obter_metricas_graph
+
+
+@staff_member_required
+def metricas_graph(request):
+    """Latência e retentativas por endpoint do Graph neste processo (somente staff)."""
+    return JsonResponse({'endpoints': obter_metricas_graph()})
@@ -0,0 +1,265 @@
+# integrations/webhooks.py
+import time
+import random
+import hashlib
+import logging
+import threading
+from datetime import timedelta
+from typing import Dict, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .agendamento import agendar_proxima_rodada
+from .graph_http import segundos_retry_after
+from .models import EntregaWebhook, EventoWebhook, WebhookMorto
+
+logger = logging.getLogger(__name__)
+
+# Espera antes da 2ª tentativa; dobra a cada falha, até o teto
+ESPERA_BASE_SEGUNDOS = 10
+ESPERA_MAX_SEGUNDOS = 60 * 60
+# Respostas que indicam problema passageiro do lado do n8n
+STATUS_RETENTAVEIS = {408, 429, 500, 502, 503, 504}
+CHAVE_TRAVA_ENTREGA = 'webhooks:entregando'
+CHAVE_AGENDAMENTO = 'webhooks:agendado'
+# Horário da rodada já agendada para as novas tentativas
+CHAVE_NOVA_TENTATIVA = 'webhooks:nova_tentativa'
+
+_sessao = None
+_sessao_lock = threading.Lock()
+
+
+def _obter_sessao() -> requests.Session:
+    """Sessão HTTP do processo: mantém a conexão com o n8n aberta entre as entregas."""
+    global _sessao
+    if _sessao is None:
+        with _sessao_lock:
+            if _sessao is None:
+                sessao = requests.Session()
+                adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=4)
+                sessao.mount('https://', adaptador)
+                sessao.mount('http://', adaptador)
+                _sessao = sessao
+    return _sessao
+
+
+def enfileirar_evento_webhook(tipo: str, dados: Dict, chave: str) -> Optional[EventoWebhook]:
+    """
+    Coloca um evento na fila do webhook do n8n; a entrega é feita por um
+    worker depois do commit, junto com outros eventos próximos.
+
+    :param chave: Identifica o evento; enfileirar de novo com a mesma chave não duplica a entrega.
+    :return: O evento, ou None se N8N_WEBHOOK_URL não estiver configurada.
+    """
+    if not settings.N8N_WEBHOOK_URL:
+        logger.warning(f"⚠️ Evento '{chave}' descartado. N8N_WEBHOOK_URL não configurada.")
+        return None
+    evento, criado = EventoWebhook.objects.get_or_create(chave=chave, defaults={'tipo': tipo, 'dados': dados})
+    if criado:
+        transaction.on_commit(lambda: agendar_entrega(settings.N8N_LOTE_ESPERA_SEGUNDOS))
+    return evento
+
+
+def enfileirar_eventos_webhook(eventos: List[Tuple[str, Dict, str]]) -> int:
+    """
+    Versão em massa de `enfileirar_evento_webhook`: grava os eventos
+    (tipo, dados, chave) num INSERT só; a entrega segue em lotes como os demais.
+
+    :return: Quantidade de eventos enfileirados (0 se N8N_WEBHOOK_URL não estiver configurada).
+    """
+    if not settings.N8N_WEBHOOK_URL:
+        logger.warning(f"⚠️ {len(eventos)} evento(s) descartado(s). N8N_WEBHOOK_URL não configurada.")
+        return 0
+    EventoWebhook.objects.bulk_create(
+        [EventoWebhook(tipo=tipo, dados=dados, chave=chave) for tipo, dados, chave in eventos],
+        ignore_conflicts=True,
+    )
+    transaction.on_commit(lambda: agendar_entrega(settings.N8N_LOTE_ESPERA_SEGUNDOS))
+    return len(eventos)
+
+
+def agendar_entrega(atraso: float = 0):
+    """Agenda uma rodada de entrega (uma só para os eventos de uma mesma janela)."""
+    if not cache.add(CHAVE_AGENDAMENTO, 1, int(atraso) + 2):
+        return
+    from .tasks import entregar_webhooks_pendentes
+    try:
+        entregar_webhooks_pendentes.apply_async(countdown=atraso)
+    except Exception as e:
+        # Broker fora do ar: a tarefa periódica entrega depois
+        logger.warning(f"⚠️ Não foi possível agendar a entrega do webhook ({e}). Fica para a tarefa periódica.")
+
+
+def agendar_nova_tentativa():
+    """Agenda uma rodada de entrega para quando vencer a próxima nova tentativa."""
+    from .tasks import entregar_webhooks_pendentes
+    agendar_proxima_rodada(
+        entregar_webhooks_pendentes, CHAVE_NOVA_TENTATIVA,
+        EventoWebhook.objects.filter(status='PENDENTE', proxima_tentativa_em__isnull=False),
+    )
+
+
+class EntregadorWebhook:
+    """
+    Entrega a fila do webhook do n8n em lotes de até `lote_max` eventos,
+    numa sessão HTTP reaproveitada. Um lote incompleto espera até o evento
+    mais antigo completar `espera_max` segundos na fila.
+
+    Falhas passageiras (rede, 5xx, 429) voltam para a fila com espera
+    exponencial; eventos que esgotam `max_tentativas`, ou que o n8n recusa
+    (demais 4xx), vão para a tabela de não entregues (WebhookMorto).
+    Cada chamada fica registrada em EntregaWebhook, com a latência.
+    """
+
+    def __init__(self, url: Optional[str] = None, lote_max: Optional[int] = None, espera_max: Optional[float] = None,
+                 max_tentativas: Optional[int] = None, timeout: Optional[float] = None,
+                 sessao: Optional[requests.Session] = None):
+        self.url = url or settings.N8N_WEBHOOK_URL
+        self.lote_max = max(1, lote_max or settings.N8N_LOTE_MAX)
+        self.espera_max = settings.N8N_LOTE_ESPERA_SEGUNDOS if espera_max is None else espera_max
+        self.max_tentativas = max_tentativas or settings.N8N_MAX_TENTATIVAS
+        self.timeout = timeout or settings.N8N_TIMEOUT
+        self.sessao = sessao or _obter_sessao()
+
+    def _pendentes(self):
+        return EventoWebhook.objects.filter(status='PENDENTE').filter(
+            Q(proxima_tentativa_em__isnull=True) | Q(proxima_tentativa_em__lte=timezone.now())
+        ).order_by('id')
+
+    def entregar_pendentes(self, tempo_max: float = 240) -> Dict[str, int]:
+        """
+        Entrega os lotes prontos até a fila esvaziar, um lote falhar ou passar
+        de `tempo_max` segundos.
+
+        :return: Contagem {'entregues': n, 'falhas': n, 'descartados': n}
+        """
+        resultado = {'entregues': 0, 'falhas': 0, 'descartados': 0}
+        if not self.url:
+            logger.warning("⚠️ Entrega do webhook cancelada. N8N_WEBHOOK_URL não configurada.")
+            return resultado
+        if not cache.add(CHAVE_TRAVA_ENTREGA, 1, int(tempo_max + self.timeout) + 60):
+            logger.debug("⏭️ Entrega do webhook já em andamento em outro worker.")
+            return resultado
+        try:
+            limite = time.monotonic() + tempo_max
+            while time.monotonic() < limite:
+                eventos = list(self._pendentes()[:self.lote_max])
+                if not eventos:
+                    break
+                mais_antigo = min(evento.criado_em for evento in eventos)
+                falta = self.espera_max - (timezone.now() - mais_antigo).total_seconds()
+                if len(eventos) < self.lote_max and falta > 0 and all(e.tentativas == 0 for e in eventos):
+                    # Lote ainda pode crescer: volta quando a janela do mais antigo fechar
+                    cache.delete(CHAVE_AGENDAMENTO)
+                    agendar_entrega(falta)
+                    break
+                if not self._entregar_lote(eventos, resultado):
+                    break  # n8n com problema: não insiste nos próximos lotes agora
+        finally:
+            cache.delete(CHAVE_TRAVA_ENTREGA)
+        agendar_nova_tentativa()  # Eventos que falharam (agora ou antes) e esperam a vez
+        if any(resultado.values()):
+            logger.info(f"🔔 Webhook n8n: {resultado['entregues']} entregue(s), {resultado['falhas']} falha(s), "
+                        f"{resultado['descartados']} descartado(s)")
+        return resultado
+
+    def _payload(self, eventos: List[EventoWebhook]):
+        if self.lote_max == 1:
+            return eventos[0].dados  # Formato antigo: só os dados do evento
+        return {
+            'total': len(eventos),
+            'eventos': [
+                {'tipo': e.tipo, 'chave': e.chave, 'criado_em': e.criado_em.isoformat(), 'dados': e.dados}
+                for e in eventos
+            ],
+        }
+
+    def _entregar_lote(self, eventos: List[EventoWebhook], resultado: Dict[str, int]) -> bool:
+        chaves = [evento.chave for evento in eventos]
+        # Permite ao fluxo do n8n descartar reenvios do mesmo lote
+        idempotencia = chaves[0] if len(chaves) == 1 else hashlib.sha1('\n'.join(chaves).encode()).hexdigest()
+        espera_fila_ms = int((timezone.now() - min(e.criado_em for e in eventos)).total_seconds() * 1000)
+
+        resposta = None
+        erro = ''
+        inicio = time.monotonic()
+        try:
+            resposta = self.sessao.post(self.url, json=self._payload(eventos), timeout=self.timeout,
+                                        headers={'X-Idempotency-Key': idempotencia})
+            if resposta.status_code >= 400:
+                erro = f"HTTP {resposta.status_code}: {resposta.text[:500]}"
+        except requests.exceptions.RequestException as e:
+            erro = f"{type(e).__name__}: {e}"
+        latencia_ms = int((time.monotonic() - inicio) * 1000)
+
+        entrega = EntregaWebhook.objects.create(
+            url=self.url,
+            total_eventos=len(eventos),
+            sucesso=not erro,
+            status_http=resposta.status_code if resposta is not None else None,
+            latencia_ms=latencia_ms,
+            espera_fila_ms=espera_fila_ms,
+            erro=erro,
+        )
+
+        if not erro:
+            EventoWebhook.objects.filter(pk__in=[e.pk for e in eventos]).update(
+                status='ENTREGUE', entrega=entrega, tentativas=F('tentativas') + 1
+            )
+            resultado['entregues'] += len(eventos)
+            logger.debug(f"🔔 Lote de {len(eventos)} evento(s) entregue em {latencia_ms} ms")
+            return True
+
+        retentavel = resposta is None or resposta.status_code in STATUS_RETENTAVEIS
+        retry_after = segundos_retry_after(resposta.headers.get('Retry-After')) if resposta is not None else None
+        logger.warning(f"⚠️ Falha ao entregar lote de {len(eventos)} evento(s) ao n8n: {erro}")
+        for evento in eventos:
+            evento.tentativas += 1
+            if not retentavel or evento.tentativas >= self.max_tentativas:
+                self._descartar(evento, erro)
+                resultado['descartados'] += 1
+                continue
+            espera = min(ESPERA_BASE_SEGUNDOS * 2 ** (evento.tentativas - 1), ESPERA_MAX_SEGUNDOS)
+            espera = max(espera * random.uniform(0.8, 1.2), retry_after or 0)
+            evento.proxima_tentativa_em = timezone.now() + timedelta(seconds=espera)
+            evento.entrega = entrega
+            evento.save(update_fields=['tentativas', 'proxima_tentativa_em', 'entrega'])
+            resultado['falhas'] += 1
+        return False
+
+    def _descartar(self, evento: EventoWebhook, erro: str):
+        with transaction.atomic():
+            WebhookMorto.objects.create(
+                chave=evento.chave,
+                tipo=evento.tipo,
+                dados=evento.dados,
+                tentativas=evento.tentativas,
+                ultimo_erro=erro,
+                evento_criado_em=evento.criado_em,
+            )
+            evento.delete()
+        logger.error(f"❌ Evento '{evento.chave}' não entregue após {evento.tentativas} tentativa(s): {erro}")
+
+
+def reenfileirar_mortos(mortos) -> int:
+    """Devolve eventos não entregues para a fila (ex: depois de corrigir o fluxo no n8n)."""
+    total = 0
+    for morto in mortos:
+        with transaction.atomic():
+            EventoWebhook.objects.get_or_create(chave=morto.chave, defaults={'tipo': morto.tipo, 'dados': morto.dados})
+            morto.delete()
+        total += 1
+    if total:
+        transaction.on_commit(agendar_entrega)
+    return total
+
+
+def entregar_webhooks_pendentes(**opcoes) -> Dict[str, int]:
+    """Atalho para entregar a fila com as configurações do settings."""
+    return EntregadorWebhook(**opcoes).entregar_pendentes()
@@ -0,0 +1,156 @@
+# integrations/zip_pasta.py
+import io
+import os
+import queue
+import logging
+import threading
+import zipfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from django.utils.dateparse import parse_datetime
+
+from .backends import BackendDocumentos
+
+logger = logging.getLogger(__name__)
+
+TAMANHO_BLOCO = 256 * 1024
+# Blocos em espera por arquivo; limita a memória a paralelo x blocos x TAMANHO_BLOCO
+BLOCOS_POR_ARQUIVO = 8
+# Entradas perto do limite do ZIP clássico (4 GiB) são gravadas já em ZIP64
+LIMITE_ZIP64 = int(zipfile.ZIP64_LIMIT * 0.9)
+
+
+class _SaidaZip(io.RawIOBase):
+    """Destino do ZipFile que só acumula os bytes até o gerador repassá-los."""
+
+    def __init__(self):
+        super().__init__()
+        self._partes: List[bytes] = []
+        self._posicao = 0
+
+    def writable(self):
+        return True
+
+    def write(self, dados):
+        self._partes.append(bytes(dados))
+        self._posicao += len(dados)
+        return len(dados)
+
+    def tell(self):
+        return self._posicao
+
+    def pendente(self) -> int:
+        return sum(len(parte) for parte in self._partes)
+
+    def esvaziar(self) -> bytes:
+        dados = b''.join(self._partes)
+        self._partes.clear()
+        return dados
+
+
+def _colocar(fila: queue.Queue, mensagem: Tuple, cancelado: threading.Event) -> bool:
+    while not cancelado.is_set():
+        try:
+            fila.put(mensagem, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _baixar(sp: BackendDocumentos, item_id: str, fila: queue.Queue, cancelado: threading.Event):
+    """Baixa o arquivo em blocos para a fila (bloqueia quando a fila enche)."""
+    resposta = None
+    try:
+        _, resposta = sp.abrir_download(item_id)
+        for bloco in resposta.iter_content(chunk_size=TAMANHO_BLOCO):
+            if bloco and not _colocar(fila, ('bloco', bloco), cancelado):
+                return
+        _colocar(fila, ('fim', None), cancelado)
+    except Exception as e:
+        _colocar(fila, ('erro', e), cancelado)
+    finally:
+        if resposta is not None:
+            resposta.close()
+
+
+def _data_zip(item: Dict):
+    modificado = parse_datetime(item['lastModifiedDateTime']) if item.get('lastModifiedDateTime') else None
+    data = modificado or datetime.now()
+    return max(data.timetuple()[:6], (1980, 1, 1, 0, 0, 0))
+
+
+def gerar_zip(sp: BackendDocumentos, itens: List[Dict], extras: Iterable[Tuple[str, bytes]] = (),
+              max_paralelo: Optional[int] = None) -> Iterator[bytes]:
+    """
+    Gera, em blocos, um ZIP com os itens de uma árvore já varrida (cada item
+    com 'caminho', como em integrations.arvore).
+
+    Os arquivos são baixados em paralelo (no máximo `max_paralelo` por vez,
+    com fila limitada por arquivo) e escritos no ZIP na ordem da árvore, sem
+    cópias temporárias. `extras` são arquivos pequenos (nome, conteúdo)
+    gravados no início, como um manifesto. Arquivos que falharem ficam
+    listados em ERROS.txt no final do ZIP.
+    """
+    max_paralelo = max(1, max_paralelo or int(os.getenv('ZIP_DOWNLOADS_SIMULTANEOS', '3')))
+    arquivos = deque(item for item in itens if not item.get('folder'))
+    saida = _SaidaZip()
+    cancelado = threading.Event()
+    executor = ThreadPoolExecutor(max_workers=max_paralelo)
+    janela = deque()
+    erros = []
+
+    def agendar():
+        if arquivos:
+            item = arquivos.popleft()
+            fila = queue.Queue(maxsize=BLOCOS_POR_ARQUIVO)
+            executor.submit(_baixar, sp, item['id'], fila, cancelado)
+            janela.append((item, fila))
+
+    try:
+        with zipfile.ZipFile(saida, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=1) as destino_zip:
+            for nome, conteudo in extras:
+                destino_zip.writestr(nome, conteudo)
+            for item in itens:
+                if item.get('folder'):
+                    destino_zip.writestr(zipfile.ZipInfo(f"{item['caminho']}/", _data_zip(item)), b'')
+            yield saida.esvaziar()
+
+            for _ in range(max_paralelo):
+                agendar()
+
+            while janela:
+                item, fila = janela.popleft()
+                agendar()
+
+                tipo, dado = fila.get()
+                if tipo == 'erro':
+                    logger.warning(f"⚠️ ZIP: falha ao baixar '{item['caminho']}': {dado}")
+                    erros.append(f"{item['caminho']}: {dado}")
+                    continue
+
+                info = zipfile.ZipInfo(item['caminho'], _data_zip(item))
+                info.compress_type = zipfile.ZIP_DEFLATED
+                with destino_zip.open(info, 'w', force_zip64=(item.get('size') or 0) > LIMITE_ZIP64) as destino:
+                    while tipo == 'bloco':
+                        destino.write(dado)
+                        if saida.pendente() >= TAMANHO_BLOCO:
+                            yield saida.esvaziar()
+                        tipo, dado = fila.get()
+                if tipo == 'erro':
+                    # Já havia bytes no ZIP: a entrada fica incompleta e é apontada no relatório
+                    logger.warning(f"⚠️ ZIP: download de '{item['caminho']}' interrompido: {dado}")
+                    erros.append(f"{item['caminho']} (incompleto): {dado}")
+                yield saida.esvaziar()
+
+            if erros:
+                destino_zip.writestr('ERROS.txt', 'Arquivos que não puderam ser incluídos:\n\n' + '\n'.join(erros) + '\n')
+        yield saida.esvaziar()
+        logger.info(f"📦 ZIP gerado: {len(itens)} itens, {len(erros)} erro(s)")
+    finally:
+        # Cliente desconectou ou terminou: libera as threads que ainda esperam na fila
+        cancelado.set()
+        executor.shutdown(wait=False, cancel_futures=True)
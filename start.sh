@@ -10,10 +10,17 @@ python manage.py migrate
 
 # 2. Inicia o Celery Worker em segundo plano
 # O '&' no final é crucial para que o comando seja executado em background.
+# -Q: além da fila padrão, consome a fila 'analises' (CELERY_TASK_ROUTES),
+# senão as análises de documentos ficam paradas em "Na fila".
 echo "A iniciar o Celery Worker em segundo plano..."
-celery -A gestao_casos worker -l info &
+celery -A gestao_casos worker -l info -Q celery,analises &
 
-# 3. Inicia o Gunicorn Web Server em primeiro plano
+# 3. Inicia o Celery Beat em segundo plano (CELERY_BEAT_SCHEDULE): espelho do
+# drive, outbox dos casos, resumos de e-mail e novas tentativas do n8n.
+echo "A iniciar o Celery Beat em segundo plano..."
+celery -A gestao_casos beat -l info &
+
+# 4. Inicia o Gunicorn Web Server em primeiro plano
 # A alteração está nesta linha: adicionámos o --bind para usar a porta do Render.
 echo "A iniciar o Gunicorn Web Server na porta $PORT..."
 gunicorn gestao_casos.wsgi --bind 0.0.0.0:$PORT
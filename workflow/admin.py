@@ -3,8 +3,9 @@
 from django.contrib import admin
 from .models import (
     Workflow, Fase, Acao, Transicao,
-    HistoricoFase, InstanciaAcao, TipoPausa
+    HistoricoFase, InstanciaAcao, TipoPausa, EfeitoPosCriacao
 )
+from .outbox import reprocessar
 
 # ==============================================================================
 # TIPO DE PAUSA ADMIN (Sem alterações)
@@ -160,3 +161,23 @@ class HistoricoFaseAdmin(admin.ModelAdmin):
     def has_delete_permission(self, request, obj=None):
         return False
 
+
+# ==============================================================================
+# OUTBOX DE EFEITOS PÓS-CRIAÇÃO (Acompanhamento)
+# ==============================================================================
+
+@admin.register(EfeitoPosCriacao)
+class EfeitoPosCriacaoAdmin(admin.ModelAdmin):
+    list_display = ['caso', 'etapa', 'status', 'tentativas', 'duracao_ms', 'criado_em', 'concluido_em', 'proxima_tentativa_em']
+    list_filter = ['etapa', 'status']
+    search_fields = ['caso__id']
+    readonly_fields = [f.name for f in EfeitoPosCriacao._meta.fields]
+    actions = ['reprocessar_efeitos']
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.action(description="Reprocessar efeitos selecionados")
+    def reprocessar_efeitos(self, request, queryset):
+        total = reprocessar(queryset)
+        self.message_user(request, f"{total} efeito(s) voltaram para a fila.")
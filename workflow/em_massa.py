@@ -0,0 +1,274 @@
+# workflow/em_massa.py
+import os
+import time
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import timedelta
+from functools import reduce
+from operator import or_
+from typing import Dict, List
+
+from django.db import transaction
+from django.db.models import Prefetch, Q
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from casos.models import Caso, FluxoInterno
+from .models import EfeitoPosCriacao, Fase, HistoricoFase, InstanciaAcao, Workflow
+from .outbox import registrar_conclusao, registrar_falha
+
+logger = logging.getLogger('casos_app')
+
+_estado = threading.local()
+
+
+def em_massa_ativo() -> bool:
+    return getattr(_estado, 'casos', None) is not None
+
+
+def registrar_caso_em_massa(caso):
+    _estado.casos.append(caso.pk)
+
+
+@contextmanager
+def efeitos_em_massa():
+    """
+    Suspende os gatilhos de criação de Caso (workflow, FluxoInterno, pastas,
+    e-mail, webhook) para os casos criados dentro do bloco e, ao sair, executa
+    tudo em conjunto: o workflow inicial de todos os casos com poucas
+    consultas em lote e os efeitos externos numa única tarefa do Celery
+    (pastas via $batch, um e-mail de resumo e os eventos do webhook em lote).
+
+    Uso (ex: importações):
+        with efeitos_em_massa():
+            for linha in linhas:
+                Caso.objects.create(...)
+
+    Blocos aninhados fazem parte do bloco mais externo.
+    """
+    if em_massa_ativo():
+        yield
+        return
+
+    _estado.casos = []
+    try:
+        yield
+    finally:
+        caso_ids = _estado.casos
+        _estado.casos = None
+        if caso_ids:
+            # Mesmo se o bloco falhou no meio, os casos já gravados precisam dos seus efeitos
+            try:
+                with transaction.atomic():
+                    inicializar_casos_em_massa(caso_ids)
+            except Exception as e:
+                logger.error(f"[Em Massa] Erro ao inicializar {len(caso_ids)} caso(s): {e}", exc_info=True)
+
+
+# ==================================
+# Workflow e FluxoInterno (na transação)
+# ==================================
+
+def inicializar_casos_em_massa(caso_ids: List[int]):
+    """
+    Equivalente em lote do gatilho de criação: fase inicial do workflow,
+    FluxoInterno de criação e registro dos efeitos externos no outbox.
+    """
+    casos = list(Caso.objects.filter(pk__in=caso_ids).select_related('advogado_responsavel'))
+    if not casos:
+        return
+    log_prefix = f"[Em Massa - {len(casos)} caso(s)]"
+
+    combinacoes = {(caso.cliente_id, caso.produto_id) for caso in casos}
+    fases_iniciais: Dict[tuple, Fase] = {}
+    workflows = Workflow.objects.filter(
+        reduce(or_, (Q(cliente_id=cliente_id, produto_id=produto_id) for cliente_id, produto_id in combinacoes))
+    ).prefetch_related(
+        Prefetch('fases', queryset=Fase.objects.order_by('ordem').prefetch_related('acoes'))
+    )
+    for workflow in workflows:
+        fases = list(workflow.fases.all())
+        if fases:
+            fases_iniciais[(workflow.cliente_id, workflow.produto_id)] = fases[0]
+
+    historicos, instancias, fluxos = [], [], []
+    hoje = timezone.now().date()
+    casos_por_fase: Dict[int, List[int]] = {}
+    for caso in casos:
+        fase = fases_iniciais.get((caso.cliente_id, caso.produto_id))
+        if not fase or caso.fase_atual_wf_id == fase.pk:
+            continue
+        casos_por_fase.setdefault(fase.pk, []).append(caso.pk)
+        historicos.append(HistoricoFase(caso=caso, fase=fase))
+        for acao in fase.acoes.all():
+            instancia = InstanciaAcao(
+                caso=caso, acao=acao, status='PENDENTE',
+                responsavel=acao.responsavel_padrao or caso.advogado_responsavel,
+            )
+            if acao.prazo_dias > 0:
+                instancia.data_prazo = hoje + timedelta(days=acao.prazo_dias)
+            instancias.append(instancia)
+        fluxos.append(FluxoInterno(
+            caso=caso, tipo_evento='MUDANCA_FASE_WF',
+            descricao=f"Caso transitou de 'Nenhuma' para '{fase.nome}'.",
+            autor=None,
+        ))
+
+    for fase_id, ids in casos_por_fase.items():
+        Caso.objects.filter(pk__in=ids).update(fase_atual_wf_id=fase_id)
+    HistoricoFase.objects.bulk_create(historicos)
+    InstanciaAcao.objects.bulk_create(instancias)
+
+    ja_registrados = set(FluxoInterno.objects.filter(
+        caso_id__in=caso_ids, tipo_evento='CRIACAO_CASO'
+    ).values_list('caso_id', flat=True))
+    fluxos.extend(
+        FluxoInterno(
+            caso=caso, tipo_evento='CRIACAO_CASO',
+            descricao=f"Caso criado com status '{caso.get_status_display()}'.",
+            autor=caso.advogado_responsavel,
+        )
+        for caso in casos if caso.pk not in ja_registrados
+    )
+    FluxoInterno.objects.bulk_create(fluxos)
+    logger.info(f"{log_prefix} Workflow inicial em {len(historicos)} caso(s), {len(instancias)} ação(ões) criada(s).")
+
+    # Os efeitos já nascem reservados para a tarefa em massa; se ela não rodar,
+    # a varredura do outbox os retoma um a um quando a reserva expirar
+    agora = timezone.now()
+    EfeitoPosCriacao.objects.bulk_create(
+        [
+            EfeitoPosCriacao(caso=caso, etapa=etapa, status='PROCESSANDO', iniciado_em=agora)
+            for caso in casos for etapa, _ in EfeitoPosCriacao.ETAPA_CHOICES
+        ],
+        ignore_conflicts=True,
+    )
+    ids = [caso.pk for caso in casos]
+    transaction.on_commit(lambda: _agendar_efeitos_em_massa(ids))
+
+
+def _agendar_efeitos_em_massa(caso_ids: List[int]):
+    from .tasks import processar_efeitos_em_massa
+    try:
+        processar_efeitos_em_massa.delay(caso_ids)
+    except Exception as e:
+        # Sem broker: libera os efeitos para a varredura periódica do outbox
+        EfeitoPosCriacao.objects.filter(caso_id__in=caso_ids, status='PROCESSANDO').update(status='PENDENTE', iniciado_em=None)
+        logger.warning(f"[Em Massa] Não foi possível agendar no Celery ({e}). Efeitos ficam para a varredura do outbox.")
+
+
+# ==================================
+# Efeitos externos (no worker)
+# ==================================
+
+def _pastas_em_massa(casos: List[Caso]) -> Dict[int, str]:
+    """Pastas dos casos e subpastas da estrutura, em lotes $batch. Retorna {caso_id: erro} das falhas."""
+    from integrations.sharepoint import obter_sharepoint
+    from pastas.models import EstruturaPasta
+
+    combinacoes = {(caso.cliente_id, caso.produto_id) for caso in casos}
+    estruturas = {
+        (estrutura.cliente_id, estrutura.produto_id): sorted(pasta.nome for pasta in estrutura.pastas.all())
+        for estrutura in EstruturaPasta.objects.filter(
+            reduce(or_, (Q(cliente_id=c, produto_id=p) for c, p in combinacoes))
+        ).prefetch_related('pastas')
+    }
+    alvo = [caso for caso in casos if estruturas.get((caso.cliente_id, caso.produto_id))]
+    if not alvo:
+        return {}
+
+    sp = obter_sharepoint()
+    falhas: Dict[int, str] = {}
+
+    sem_pasta = [caso for caso in alvo if not caso.sharepoint_folder_id]
+    criadas = []
+    for caso, resultado in zip(sem_pasta, sp.criar_pastas_em_lote([(sp.RAIZ, str(caso.pk)) for caso in sem_pasta])):
+        if resultado['ok']:
+            caso.sharepoint_folder_id = resultado['item']['id']
+            criadas.append(caso)
+        else:
+            falhas[caso.pk] = f"Pasta do caso: {resultado['erro']}"
+    Caso.objects.bulk_update(criadas, ['sharepoint_folder_id'])
+
+    donos, subpastas = [], []
+    for caso in alvo:
+        if caso.pk in falhas:
+            continue
+        for nome in estruturas[(caso.cliente_id, caso.produto_id)]:
+            donos.append(caso.pk)
+            subpastas.append((caso.sharepoint_folder_id, nome))
+    for caso_id, resultado in zip(donos, sp.criar_pastas_em_lote(subpastas)):
+        if not resultado['ok']:
+            falhas[caso_id] = f"Subpasta '{resultado['nome']}': {resultado['erro']}"
+    return falhas
+
+
+def _email_em_massa(casos: List[Caso]) -> Dict[int, str]:
+    """Um e-mail de resumo com todos os casos."""
+    from integrations.emails import RESUMOS, enfileirar_email
+    from .signals import dados_resumo_caso
+
+    destinatario = os.environ.get('EMAIL_DESTINATARIO_NOVOS_CASOS')
+    if not destinatario:
+        logger.warning("[Em Massa] E-mail cancelado. Var 'EMAIL_DESTINATARIO_NOVOS_CASOS' não definida no .env.")
+        return {}
+    template, assunto = RESUMOS['novos_casos']
+    ids = sorted(caso.pk for caso in casos)
+    enfileirar_email(
+        assunto.format(total=len(casos)),
+        [destinatario],
+        html=render_to_string(template, {'itens': [dados_resumo_caso(caso) for caso in casos]}),
+        chave=f"novos-casos-em-massa-{hashlib.sha1(','.join(map(str, ids)).encode()).hexdigest()}",
+    )
+    return {}
+
+
+def _webhook_em_massa(casos: List[Caso]) -> Dict[int, str]:
+    """Eventos de criação de todos os casos num INSERT só; a fila os entrega em lotes."""
+    from integrations.webhooks import enfileirar_eventos_webhook
+    from .signals import dados_webhook_caso
+
+    enfileirar_eventos_webhook([
+        ('caso_criado', dados_webhook_caso(caso), f'caso-{caso.pk}-criacao') for caso in casos
+    ])
+    return {}
+
+
+ETAPAS_EM_MASSA = {
+    'SHAREPOINT': _pastas_em_massa,
+    'EMAIL': _email_em_massa,
+    'N8N': _webhook_em_massa,
+}
+
+
+def executar_efeitos_em_massa(caso_ids: List[int]):
+    """
+    Executa cada etapa uma vez para todos os casos. Casos que falharem numa
+    etapa voltam para o outbox e são repetidos um a um, como na criação normal.
+    """
+    for etapa, executar in ETAPAS_EM_MASSA.items():
+        efeitos = list(
+            EfeitoPosCriacao.objects.filter(caso_id__in=caso_ids, etapa=etapa, status='PROCESSANDO')
+            .select_related('caso__cliente', 'caso__produto', 'caso__advogado_responsavel')
+        )
+        if not efeitos:
+            continue
+
+        inicio = time.monotonic()
+        try:
+            falhas = executar([efeito.caso for efeito in efeitos])
+        except Exception as e:
+            logger.error(f"[Em Massa {etapa}] Erro na etapa para {len(efeitos)} caso(s): {e}", exc_info=True)
+            falhas = {efeito.caso_id: e for efeito in efeitos}
+        # A duração registrada em cada efeito é a da etapa inteira (uma execução para todos)
+        duracao_ms = int((time.monotonic() - inicio) * 1000)
+
+        with transaction.atomic():
+            for efeito in efeitos:
+                if efeito.caso_id in falhas:
+                    registrar_falha(efeito, falhas[efeito.caso_id], duracao_ms)
+                else:
+                    registrar_conclusao(efeito, duracao_ms)
+        logger.info(f"[Em Massa {etapa}] {len(efeitos) - len(falhas)}/{len(efeitos)} caso(s) em {duracao_ms} ms")
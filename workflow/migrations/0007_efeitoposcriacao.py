@@ -0,0 +1,38 @@
+# Generated by Django 5.2.7 on 2026-10-17 03:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('casos', '0016_despesa_comprovante'),
+        ('workflow', '0006_transicao_workflow'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EfeitoPosCriacao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('etapa', models.CharField(choices=[('SHAREPOINT', 'Pastas no SharePoint'), ('EMAIL', 'E-mail de Novo Caso'), ('N8N', 'Webhook n8n')], max_length=20)),
+                ('status', models.CharField(choices=[('PENDENTE', 'Pendente'), ('PROCESSANDO', 'Processando'), ('CONCLUIDO', 'Concluído'), ('FALHOU', 'Falhou')], default='PENDENTE', max_length=20)),
+                ('tentativas', models.PositiveIntegerField(default=0)),
+                ('proxima_tentativa_em', models.DateTimeField(blank=True, null=True, verbose_name='Próxima Tentativa')),
+                ('iniciado_em', models.DateTimeField(blank=True, null=True, verbose_name='Iniciado em')),
+                ('concluido_em', models.DateTimeField(blank=True, null=True, verbose_name='Concluído em')),
+                ('duracao_ms', models.PositiveIntegerField(blank=True, null=True, verbose_name='Duração da Última Execução (ms)')),
+                ('ultimo_erro', models.TextField(blank=True, verbose_name='Último Erro')),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('caso', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='efeitos_pos_criacao', to='casos.caso')),
+            ],
+            options={
+                'verbose_name': 'Efeito Pós-Criação',
+                'verbose_name_plural': '10. Efeitos Pós-Criação (Outbox)',
+                'ordering': ['-id'],
+                'indexes': [models.Index(fields=['status', 'proxima_tentativa_em'], name='efeito_fila_idx')],
+                'constraints': [models.UniqueConstraint(fields=('caso', 'etapa'), name='efeito_unico_por_caso_etapa')],
+            },
+        ),
+    ]
@@ -310,4 +310,59 @@ class InstanciaAcao(models.Model):
         ordering = ['-id']
     
     def __str__(self):
-        return f"{self.acao.titulo} - Caso #{self.caso_id}"
\ No newline at end of file
+        return f"{self.acao.titulo} - Caso #{self.caso_id}"
+
+# ==============================================================================
+# EFEITOS PÓS-CRIAÇÃO (Outbox)
+# ==============================================================================
+
+class EfeitoPosCriacao(models.Model):
+    """
+    Efeito externo de um caso novo (pastas, e-mail, webhook) a executar fora
+    da requisição. Gravado na mesma transação do caso e processado pelos
+    workers do Celery (ver workflow/outbox.py); cada etapa é repetida sozinha
+    até dar certo ou esgotar as tentativas.
+    """
+    ETAPA_CHOICES = [
+        ('SHAREPOINT', 'Pastas no SharePoint'),
+        ('EMAIL', 'E-mail de Novo Caso'),
+        ('N8N', 'Webhook n8n'),
+    ]
+    STATUS_CHOICES = [
+        ('PENDENTE', 'Pendente'),
+        ('PROCESSANDO', 'Processando'),
+        ('CONCLUIDO', 'Concluído'),
+        ('FALHOU', 'Falhou'),
+    ]
+
+    caso = models.ForeignKey('casos.Caso', on_delete=models.CASCADE, related_name='efeitos_pos_criacao')
+    etapa = models.CharField(max_length=20, choices=ETAPA_CHOICES)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDENTE')
+    tentativas = models.PositiveIntegerField(default=0)
+    proxima_tentativa_em = models.DateTimeField(null=True, blank=True, verbose_name="Próxima Tentativa")
+    iniciado_em = models.DateTimeField(null=True, blank=True, verbose_name="Iniciado em")
+    concluido_em = models.DateTimeField(null=True, blank=True, verbose_name="Concluído em")
+    duracao_ms = models.PositiveIntegerField(null=True, blank=True, verbose_name="Duração da Última Execução (ms)")
+    ultimo_erro = models.TextField(blank=True, verbose_name="Último Erro")
+    criado_em = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Efeito Pós-Criação"
+        verbose_name_plural = "10. Efeitos Pós-Criação (Outbox)"
+        ordering = ['-id']
+        constraints = [
+            models.UniqueConstraint(fields=['caso', 'etapa'], name='efeito_unico_por_caso_etapa'),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'proxima_tentativa_em'], name='efeito_fila_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_etapa_display()} - Caso #{self.caso_id} ({self.get_status_display()})"
+
+    @property
+    def latencia_total(self):
+        """Tempo entre o commit do caso e a conclusão do efeito."""
+        if self.concluido_em:
+            return self.concluido_em - self.criado_em
+        return None
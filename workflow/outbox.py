@@ -0,0 +1,160 @@
+# workflow/outbox.py
+import os
+import time
+import logging
+from datetime import timedelta
+from typing import Callable, Dict, Optional
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import EfeitoPosCriacao
+
+logger = logging.getLogger('casos_app')
+
+MAX_TENTATIVAS = int(os.getenv('OUTBOX_MAX_TENTATIVAS', '6'))
+# Espera antes da 2ª tentativa; dobra a cada falha, até o teto
+ESPERA_BASE_SEGUNDOS = int(os.getenv('OUTBOX_ESPERA_BASE_SEGUNDOS', '30'))
+ESPERA_MAX_SEGUNDOS = 60 * 60
+# Efeito "processando" há mais que isso é de um worker que morreu no meio
+TEMPO_MAX_PROCESSANDO = timedelta(minutes=15)
+# Horário da varredura já agendada para as novas tentativas
+CHAVE_NOVA_TENTATIVA = 'outbox:nova_tentativa'
+
+
+def _etapas() -> Dict[str, Callable]:
+    # Import tardio: workflow.signals importa este módulo
+    from .signals import criar_pastas_sharepoint_logica, enviar_email_novo_caso, enviar_sinal_para_n8n
+    return {
+        'SHAREPOINT': criar_pastas_sharepoint_logica,
+        'EMAIL': enviar_email_novo_caso,
+        'N8N': enviar_sinal_para_n8n,
+    }
+
+
+def registrar_efeitos_pos_criacao(caso):
+    """
+    Grava os efeitos do caso novo na transação corrente e agenda o
+    processamento para depois do commit. Se o caso for desfeito (rollback),
+    os efeitos somem junto e nada é disparado.
+    """
+    EfeitoPosCriacao.objects.bulk_create(
+        [EfeitoPosCriacao(caso=caso, etapa=etapa) for etapa, _ in EfeitoPosCriacao.ETAPA_CHOICES],
+        ignore_conflicts=True,
+    )
+    caso_id = caso.pk
+    transaction.on_commit(lambda: _agendar_processamento(caso_id))
+
+
+def _agendar_processamento(caso_id: int):
+    from .tasks import processar_efeitos_pos_criacao
+    try:
+        processar_efeitos_pos_criacao.delay(caso_id)
+    except Exception as e:
+        # Broker fora do ar: a varredura periódica pega os efeitos depois
+        logger.warning(f"[Outbox - Caso {caso_id}] Não foi possível agendar no Celery ({e}). Fica para a varredura periódica.")
+
+
+def agendar_nova_tentativa():
+    """Agenda a varredura para quando vencer a próxima nova tentativa de um efeito."""
+    from integrations.agendamento import agendar_proxima_rodada
+    from .tasks import drenar_outbox
+    agendar_proxima_rodada(
+        drenar_outbox, CHAVE_NOVA_TENTATIVA,
+        EfeitoPosCriacao.objects.filter(status='PENDENTE', proxima_tentativa_em__isnull=False),
+    )
+
+
+def _pendentes(caso_id: Optional[int] = None):
+    agora = timezone.now()
+    efeitos = EfeitoPosCriacao.objects.filter(
+        Q(status='PENDENTE', proxima_tentativa_em__isnull=True)
+        | Q(status='PENDENTE', proxima_tentativa_em__lte=agora)
+        | Q(status='PROCESSANDO', iniciado_em__lt=agora - TEMPO_MAX_PROCESSANDO)
+    )
+    if caso_id is not None:
+        efeitos = efeitos.filter(caso_id=caso_id)
+    return efeitos.order_by('id')
+
+
+def _reservar(efeito: EfeitoPosCriacao) -> bool:
+    """Marca o efeito como em processamento; False se outro worker o pegou antes."""
+    agora = timezone.now()
+    reservado = EfeitoPosCriacao.objects.filter(
+        pk=efeito.pk, status=efeito.status, iniciado_em=efeito.iniciado_em
+    ).update(status='PROCESSANDO', iniciado_em=agora)
+    if reservado:
+        efeito.status = 'PROCESSANDO'
+        efeito.iniciado_em = agora
+    return bool(reservado)
+
+
+def executar_efeito(efeito: EfeitoPosCriacao, etapas: Optional[Dict[str, Callable]] = None) -> bool:
+    """Executa um efeito já reservado e registra o resultado. Retorna True se concluiu."""
+    etapas = etapas or _etapas()
+    inicio = time.monotonic()
+    try:
+        etapas[efeito.etapa](efeito.caso)
+    except Exception as e:
+        registrar_falha(efeito, e, int((time.monotonic() - inicio) * 1000))
+        return False
+    registrar_conclusao(efeito, int((time.monotonic() - inicio) * 1000))
+    return True
+
+
+def registrar_conclusao(efeito: EfeitoPosCriacao, duracao_ms: int):
+    efeito.duracao_ms = duracao_ms
+    efeito.tentativas += 1
+    efeito.status = 'CONCLUIDO'
+    efeito.concluido_em = timezone.now()
+    efeito.ultimo_erro = ''
+    efeito.save(update_fields=['status', 'tentativas', 'ultimo_erro', 'concluido_em', 'duracao_ms'])
+    logger.info(f"[Outbox {efeito.etapa} - Caso {efeito.caso_id}] ✅ Concluído em {efeito.duracao_ms} ms "
+                f"({efeito.latencia_total.total_seconds():.1f}s desde a criação do caso)")
+
+
+def registrar_falha(efeito: EfeitoPosCriacao, erro, duracao_ms: int):
+    """Devolve o efeito para a fila com espera exponencial, ou o marca como falho de vez."""
+    log_prefix = f"[Outbox {efeito.etapa} - Caso {efeito.caso_id}]"
+    efeito.duracao_ms = duracao_ms
+    efeito.tentativas += 1
+    efeito.ultimo_erro = f"{type(erro).__name__}: {erro}" if isinstance(erro, Exception) else str(erro)
+    if efeito.tentativas >= MAX_TENTATIVAS:
+        efeito.status = 'FALHOU'
+        efeito.proxima_tentativa_em = None
+        logger.error(f"{log_prefix} ❌ Falhou após {efeito.tentativas} tentativas: {erro}")
+    else:
+        espera = min(ESPERA_BASE_SEGUNDOS * 2 ** (efeito.tentativas - 1), ESPERA_MAX_SEGUNDOS)
+        efeito.status = 'PENDENTE'
+        efeito.proxima_tentativa_em = timezone.now() + timedelta(seconds=espera)
+        logger.warning(f"{log_prefix} ⚠️ Tentativa {efeito.tentativas} falhou ({erro}). Nova tentativa em {espera}s.")
+    efeito.save(update_fields=['status', 'tentativas', 'ultimo_erro', 'proxima_tentativa_em', 'duracao_ms'])
+    if efeito.status == 'PENDENTE':
+        transaction.on_commit(agendar_nova_tentativa)
+
+
+def processar_pendentes(caso_id: Optional[int] = None, limite: int = 100) -> Dict[str, int]:
+    """
+    Executa os efeitos vencidos (de um caso ou de todos). Cada efeito é
+    reservado antes de rodar, então workers concorrentes não repetem o mesmo.
+
+    :return: Contagem {'concluidos': n, 'falhas': n}
+    """
+    etapas = _etapas()
+    resultado = {'concluidos': 0, 'falhas': 0}
+    for efeito in _pendentes(caso_id).select_related('caso')[:limite]:
+        if not _reservar(efeito):
+            continue
+        if executar_efeito(efeito, etapas):
+            resultado['concluidos'] += 1
+        else:
+            resultado['falhas'] += 1
+    return resultado
+
+
+def reprocessar(efeitos) -> int:
+    """Volta efeitos (ex: os que falharam) para a fila, zerando as tentativas."""
+    return efeitos.exclude(status='CONCLUIDO').update(
+        status='PENDENTE', tentativas=0, proxima_tentativa_em=None, iniciado_em=None
+    )
@@ -1,11 +1,7 @@
 # workflow/signals.py
 
 import os
-import requests
 import logging
-from django.db.models.signals import post_save
-from django.dispatch import receiver # Mantido caso você adicione outros signals com decorador
-from django.core.mail import send_mail
 from django.template.loader import render_to_string
 from django.conf import settings
 from django.urls import reverse
@@ -15,8 +11,12 @@ from django.urls import reverse
 try:
     from casos.models import Caso, FluxoInterno
     from pastas.models import EstruturaPasta
-    from integrations.sharepoint import SharePoint
+    from integrations.sharepoint import obter_sharepoint
+    from integrations.emails import enfileirar_email
+    from integrations.webhooks import enfileirar_evento_webhook
     from .models import Workflow, Fase
+    from .outbox import registrar_efeitos_pos_criacao
+    from .em_massa import em_massa_ativo, registrar_caso_em_massa
     # Tenta importar a view; se não existir, define como None
     try:
         from .views import transitar_fase
@@ -34,20 +34,14 @@ logger = logging.getLogger('casos_app') # Use o logger configurado
 
 
 # ==================================
-# Funções Auxiliares (Lógicas)
+# Efeitos Pós-Criação (executados pelo outbox, fora da requisição)
 # ==================================
+# Cada função levanta exceção em caso de falha para o outbox tentar de novo,
+# e pode rodar mais de uma vez para o mesmo caso sem duplicar o efeito.
 
-def enviar_sinal_para_n8n(instance):
-    """ Envia dados do novo caso para o Webhook n8n. """
-    log_prefix = f"[Signal n8n - Caso {instance.id}]"
-    logger.debug(f"{log_prefix} Preparando para enviar sinal...")
-
-    webhook_url = os.environ.get('N8N_WEBHOOK_URL')
-    if not webhook_url:
-        logger.warning(f"{log_prefix} Envio cancelado. Var N8N_WEBHOOK_URL não configurada.")
-        return
-
-    payload = {
+def dados_webhook_caso(instance):
+    """ Dados do caso enviados ao n8n no evento de criação. """
+    return {
         "id": instance.id,
         "titulo": instance.titulo,
         "status": instance.status,
@@ -62,68 +56,95 @@ def enviar_sinal_para_n8n(instance):
         "advogado_email": instance.advogado_responsavel.email if instance.advogado_responsavel else None,
     }
 
-    try:
-        logger.info(f"{log_prefix} Enviando dados para: {webhook_url}")
-        response = requests.post(webhook_url, json=payload, timeout=15) # Timeout um pouco maior
-        response.raise_for_status() # Levanta erro para status >= 400
-        logger.info(f"{log_prefix} Sinal enviado com sucesso! Status: {response.status_code}")
-    except requests.exceptions.RequestException as e:
-        logger.error(f"{log_prefix} ERRO ao enviar sinal: {e}", exc_info=True)
+
+def enviar_sinal_para_n8n(instance):
+    """ Coloca os dados do novo caso na fila do Webhook n8n (entregue em lote por um worker). """
+    log_prefix = f"[Signal n8n - Caso {instance.id}]"
+    logger.debug(f"{log_prefix} Preparando para enviar sinal...")
+
+    payload = dados_webhook_caso(instance)
+    # A chave evita entrega duplicada se o outbox repetir esta etapa
+    if enfileirar_evento_webhook('caso_criado', payload, chave=f'caso-{instance.id}-criacao'):
+        logger.info(f"{log_prefix} Sinal enfileirado para o n8n.")
 
 
 def criar_pastas_sharepoint_logica(instance):
-    """ Verifica estrutura e cria pastas no SharePoint. """
+    """
+    Cria (ou reaproveita) a pasta do caso no SharePoint e as subpastas da
+    estrutura Cliente/Produto, salvando o ID da pasta no caso.
+    """
     log_prefix = f"[Signal SP - Caso {instance.id}]"
     logger.debug(f"{log_prefix} Iniciando lógica de criação de pastas...")
 
     try:
         # Busca a estrutura de pastas para a combinação Cliente/Produto
         estrutura = EstruturaPasta.objects.get(cliente=instance.cliente, produto=instance.produto)
-        pastas_a_criar = estrutura.pastas.all().order_by('nome') # Ordena para consistência
+        pastas_a_criar = list(estrutura.pastas.all().order_by('nome')) # Ordena para consistência
     except EstruturaPasta.DoesNotExist:
         logger.warning(f"{log_prefix} Nenhuma estrutura de pastas encontrada.")
         return # Não há o que fazer
 
-    if not pastas_a_criar.exists():
+    if not pastas_a_criar:
         logger.warning(f"{log_prefix} Estrutura encontrada, mas sem pastas associadas.")
         return # Não há o que fazer
 
-    try:
+    sp = obter_sharepoint()
+    instance.refresh_from_db(fields=['sharepoint_folder_id'])
+    folder_id = instance.sharepoint_folder_id
+    if not folder_id:
         logger.info(f"{log_prefix} Estrutura encontrada. Iniciando criação no SharePoint...")
-        sp = SharePoint()
-        # Usa o ID do caso como nome da pasta principal para garantir unicidade
-        nome_pasta_caso = str(instance.id)
-        # Cria a pasta principal do caso
-        folder_id = sp.criar_pasta_caso(nome_pasta_caso)
-        if not folder_id:
-             logger.error(f"{log_prefix} Falha ao criar a pasta principal '{nome_pasta_caso}'. Abortando subpastas.")
-             return # Aborta se a pasta principal falhar
-
-        # Salva o ID no objeto 'instance' em memória (será salvo pelo chamador)
+        # Usa o ID do caso como nome da pasta; se uma tentativa anterior já a criou, reaproveita
+        folder_id = sp.obter_ou_criar_pasta_caso(str(instance.id))
         instance.sharepoint_folder_id = folder_id
-        logger.info(f"{log_prefix} Pasta principal '{nome_pasta_caso}' criada com ID: {folder_id}")
-
-        # Cria as subpastas definidas na estrutura
-        for pasta in pastas_a_criar:
-            try:
-                sp.criar_subpasta(folder_id, pasta.nome)
-                logger.debug(f"{log_prefix} Subpasta '{pasta.nome}' criada.")
-            except Exception as sub_e: # Captura erro ao criar subpasta específica
-                 logger.error(f"{log_prefix} ERRO ao criar subpasta '{pasta.nome}': {sub_e}", exc_info=True)
-                 # Decide se quer continuar com as outras ou parar (aqui continua)
-
-        logger.info(f"{log_prefix} Criação de pastas concluída.")
+        # Usa update() direto no banco para não disparar outro post_save
+        Caso.objects.filter(pk=instance.pk).update(sharepoint_folder_id=folder_id)
+        logger.info(f"{log_prefix} SharePoint Folder ID salvo no banco: {folder_id}")
+
+    # Só cria as subpastas que ainda não existem (numa nova tentativa, parte já pode ter sido criada)
+    existentes = {item.get('name') for item in sp.cache_pastas.listar(folder_id) if item.get('folder')}
+    faltando = [pasta.nome for pasta in pastas_a_criar if pasta.nome not in existentes]
+    if not faltando:
+        logger.info(f"{log_prefix} Pastas já existentes. Nada a criar.")
+        return
 
-    except Exception as e: # Captura erro geral (conexão SP, criar pasta principal)
-        logger.error(f"{log_prefix} ERRO GERAL ao criar pastas no SharePoint: {e}", exc_info=True)
-        # Limpa o folder_id se a criação falhou no meio
-        instance.sharepoint_folder_id = None
+    # Cria as subpastas definidas na estrutura em lote ($batch do Graph)
+    resultados = sp.criar_subpastas_em_lote(folder_id, faltando)
+    falhas = [resultado for resultado in resultados if not resultado['ok']]
+    for resultado in falhas:
+        logger.error(f"{log_prefix} ERRO ao criar subpasta '{resultado['nome']}': {resultado['erro']}")
+    if falhas:
+        raise RuntimeError(f"{len(falhas)} subpasta(s) não criada(s): {', '.join(r['nome'] for r in falhas)}")
+
+    logger.info(f"{log_prefix} Criação de pastas concluída.")
+
+
+def link_absoluto_caso(instance):
+    """ Link ABSOLUTO para o caso (necessário para e-mails). """
+    # Tenta obter o domínio do settings, senão usa um fallback
+    domain = getattr(settings, 'SITE_DOMAIN', 'localhost:8000') # Adicione SITE_DOMAIN ao seu settings.py
+    protocol = 'https://' if getattr(settings, 'USE_HTTPS', False) else 'http://' # Verifica se HTTPS está ativo
+    path = reverse('casos:detalhe_caso', kwargs={'pk': instance.id})
+    return f"{protocol}{domain}{path}"
+
+
+def dados_resumo_caso(instance):
+    """ Linha do caso no e-mail de resumo de novos casos. """
+    return {
+        'id': instance.id,
+        'titulo': instance.titulo,
+        'cliente': instance.cliente.nome if instance.cliente else '',
+        'produto': instance.produto.nome if instance.produto else '',
+        'link_caso': link_absoluto_caso(instance),
+    }
 
 
 def enviar_email_novo_caso(instance):
-    """ Prepara e envia e-mail de notificação para destinatário fixo. """
+    """
+    Coloca na fila de e-mails a notificação do novo caso para o destinatário
+    fixo (ou o item do resumo de novos casos, se EMAIL_RESUMO_NOVOS_CASOS).
+    """
     log_prefix = f"[Signal Email - Caso {instance.id}]"
-    logger.debug(f"{log_prefix} Preparando para enviar e-mail...")
+    logger.debug(f"{log_prefix} Preparando e-mail...")
 
     destinatario_fixo = os.environ.get('EMAIL_DESTINATARIO_NOVOS_CASOS')
     if not destinatario_fixo:
@@ -132,34 +153,25 @@ def enviar_email_novo_caso(instance):
 
     destinatarios = [destinatario_fixo]
 
-    try:
-        # Monta o link ABSOLUTO para o caso (necessário para e-mails)
-        # Tenta obter o domínio do settings, senão usa um fallback
-        domain = getattr(settings, 'SITE_DOMAIN', 'localhost:8000') # Adicione SITE_DOMAIN ao seu settings.py
-        protocol = 'https://' if getattr(settings, 'USE_HTTPS', False) else 'http://' # Verifica se HTTPS está ativo
-        path = reverse('casos:detalhe_caso', kwargs={'pk': instance.id})
-        link_caso_completo = f"{protocol}{domain}{path}"
-
-        context = {
-            'caso': instance,
-            'link_caso': link_caso_completo
-        }
-
-        # Renderiza o corpo HTML (garanta que o template existe)
-        html_message = render_to_string('emails/notificacao_novo_caso.html', context)
-
-        # Envio do E-mail
-        send_mail(
-            subject=f'Novo Caso Criado: #{instance.id} - {instance.titulo}',
-            message='', # Plain text opcional
-            from_email=settings.EMAIL_HOST_USER, # Garanta que está no settings/.env
-            recipient_list=destinatarios,
-            html_message=html_message,
-            fail_silently=False,
-        )
-        logger.info(f"{log_prefix} Notificação enviada com sucesso para {destinatarios[0]}.")
-    except Exception as e:
-        logger.error(f"{log_prefix} ERRO AO ENVIAR E-MAIL: {e}", exc_info=True)
+    link_caso_completo = link_absoluto_caso(instance)
+    assunto = f'Novo Caso Criado: #{instance.id} - {instance.titulo}'
+    # A chave evita e-mail duplicado se o outbox repetir esta etapa
+    chave = f'novo-caso-{instance.id}'
+
+    if settings.EMAIL_RESUMO_NOVOS_CASOS:
+        enfileirar_email(assunto, destinatarios, chave=chave, resumo='novos_casos', dados=dados_resumo_caso(instance))
+        logger.info(f"{log_prefix} Caso incluído no próximo resumo de novos casos.")
+        return
+
+    context = {
+        'caso': instance,
+        'link_caso': link_caso_completo
+    }
+
+    # Renderiza o corpo HTML (garanta que o template existe)
+    html_message = render_to_string('emails/notificacao_novo_caso.html', context)
+    enfileirar_email(assunto, destinatarios, html=html_message, chave=chave)
+    logger.info(f"{log_prefix} Notificação enfileirada para {destinatarios[0]}.")
 
 
 # ==================================
@@ -170,11 +182,16 @@ def enviar_email_novo_caso(instance):
 def gatilho_pos_criacao_caso(sender, instance, created, **kwargs):
     """
     Orquestrador principal disparado APENAS na criação (`created=True`) de um novo Caso.
-    Executa Workflow, cria FluxoInterno, pastas no SharePoint e envia E-mail/Webhook.
+    Executa Workflow e cria o FluxoInterno na própria transação; pastas no
+    SharePoint, E-mail e Webhook vão para o outbox e rodam nos workers depois do commit.
     """
     # Log inicial para TODAS as chamadas post_save
     logger.debug(f"[Signal Handler] Recebido post_save para Caso ID {instance.id}. Flag 'created'={created}")
-    print(f"!!! GATILHO DISPARADO para Caso ID {instance.id}, Created={created} !!!") # Print de confirmação
+
+    if created and em_massa_ativo():
+        # Criação em massa: workflow e efeitos rodam para todos os casos no fim do bloco
+        registrar_caso_em_massa(instance)
+        return
 
     if created:
         log_prefix = f"[Signal Handler - Caso {instance.id} - CREATED]"
@@ -202,7 +219,6 @@ def gatilho_pos_criacao_caso(sender, instance, created, **kwargs):
         try:
             # Verifica se já existe para evitar duplicação pelo signal duplo do runserver
             if not FluxoInterno.objects.filter(caso=instance, tipo_evento='CRIACAO_CASO').exists():
-                autor_evento = getattr(instance, '_criador', None) or instance.advogado_responsavel
                 FluxoInterno.objects.create(
                     caso=instance,
                     tipo_evento='CRIACAO_CASO',
@@ -215,51 +231,12 @@ def gatilho_pos_criacao_caso(sender, instance, created, **kwargs):
         except Exception as e:
             logger.error(f"{log_prefix} Erro ao criar/verificar FluxoInterno: {e}", exc_info=True)
 
-
-        # 3. LÓGICA DO SHAREPOINT (COM VERIFICAÇÃO DE IDEMPOTÊNCIA)
-        logger.debug(f"{log_prefix} Iniciando lógica do SharePoint...")
+        # 3. SHAREPOINT, E-MAIL E N8N: gravados no outbox, executados após o commit
         try:
-            # Recarrega a instância do banco para pegar o valor mais recente de sharepoint_folder_id
-            # Usa try-except caso o objeto ainda não esteja totalmente salvo (raro, mas possível)
-            try:
-                instance.refresh_from_db(fields=['sharepoint_folder_id'])
-            except Caso.DoesNotExist:
-                 logger.warning(f"{log_prefix} Não foi possível recarregar o Caso do banco antes de checar SharePoint ID.")
-
-            if instance.sharepoint_folder_id:
-                 logger.warning(f"{log_prefix} SharePoint Folder ID ('{instance.sharepoint_folder_id}') já existe. Pulando criação de pastas.")
-            else:
-                # Só executa a criação se o ID não existir
-                criar_pastas_sharepoint_logica(instance) # Esta função define instance.sharepoint_folder_id em memória
-                # Salva o ID IMEDIATAMENTE após a criação pela função
-                if instance.sharepoint_folder_id:
-                     # Usa update() direto no banco para evitar disparar outro post_save desnecessário
-                     Caso.objects.filter(pk=instance.pk).update(sharepoint_folder_id=instance.sharepoint_folder_id)
-                     logger.info(f"{log_prefix} SharePoint Folder ID salvo no banco: {instance.sharepoint_folder_id}")
-                else:
-                     logger.warning(f"{log_prefix} Função criar_pastas_sharepoint_logica não retornou/definiu um folder_id.")
-
-        except Exception as e:
-             logger.error(f"{log_prefix} Erro GERAL na lógica do SharePoint: {e}", exc_info=True)
-
-
-        # 4. LÓGICA DE E-MAIL
-        logger.debug(f"{log_prefix} Iniciando lógica de E-mail...")
-        try:
-            enviar_email_novo_caso(instance)
-            # Log de sucesso/falha já está dentro da função enviar_email_novo_caso
+            registrar_efeitos_pos_criacao(instance)
+            logger.info(f"{log_prefix} Efeitos externos registrados no outbox.")
         except Exception as e:
-             # O try/except dentro da função já loga o erro, mas podemos logar aqui também se quisermos
-             logger.error(f"{log_prefix} Erro não capturado ao chamar enviar_email_novo_caso: {e}", exc_info=True)
-
-        # 5. LÓGICA N8N (Webhook)
-        logger.debug(f"{log_prefix} Iniciando lógica do n8n...")
-        try:
-            enviar_sinal_para_n8n(instance)
-             # Log de sucesso/falha já está dentro da função enviar_sinal_para_n8n
-        except Exception as e:
-             logger.error(f"{log_prefix} Erro não capturado ao chamar enviar_sinal_para_n8n: {e}", exc_info=True)
-
+            logger.error(f"{log_prefix} Erro ao registrar efeitos no outbox: {e}", exc_info=True)
 
         logger.info(f"{log_prefix} --- FIM dos Gatilhos de CRIAÇÃO ---")
 
@@ -267,4 +244,4 @@ def gatilho_pos_criacao_caso(sender, instance, created, **kwargs):
         # Loga apenas se o nível for DEBUG para não poluir
         logger.debug(f"[Signal Handler] Sinal post_save para Caso ID {instance.id} ignorado (created=False).")
 
-# --- Fim do Arquivo ---
\ No newline at end of file
+# --- Fim do Arquivo ---
@@ -0,0 +1,33 @@
+# workflow/tasks.py
+import logging
+
+from celery import shared_task
+
+from .outbox import agendar_nova_tentativa, processar_pendentes
+
+logger = logging.getLogger('casos_app')
+
+
+@shared_task(ignore_result=True)
+def processar_efeitos_pos_criacao(caso_id):
+    """Executa os efeitos de um caso recém-criado (agendada no commit do caso)."""
+    processar_pendentes(caso_id=caso_id)
+
+
+@shared_task(ignore_result=True)
+def drenar_outbox():
+    """
+    Retoma efeitos com nova tentativa vencida (agendada por
+    `agendar_nova_tentativa`) ou que não chegaram a ser agendados (Celery beat).
+    """
+    resultado = processar_pendentes()
+    if resultado['concluidos'] or resultado['falhas']:
+        logger.info(f"[Outbox] Varredura: {resultado['concluidos']} concluído(s), {resultado['falhas']} falha(s).")
+    agendar_nova_tentativa()  # Efeitos que ainda esperam a vez
+
+
+@shared_task(ignore_result=True)
+def processar_efeitos_em_massa(caso_ids):
+    """Efeitos externos de um lote de casos criados em massa (ver workflow/em_massa.py)."""
+    from .em_massa import executar_efeitos_em_massa
+    executar_efeitos_em_massa(caso_ids)